@@ -1,8 +1,8 @@
 import pandas as pd
 import numpy as np
-import random
 import matplotlib.pyplot as plt
 import datetime
+from nsga2_core import fast_non_dominated_sort, select_survivors, make_offspring
 
 # --- 配置参数 ---
 
@@ -27,6 +27,8 @@ CROSSOVER_PROB = 0.7
 MUTATION_PROB = 0.3
 MUTATION_STRENGTH = 0.1
 NUM_BATCHES_TO_SELECT = 20
+# 随机种子: None 表示每次运行随机, 设为整数则结果可复现
+SEED = None
 
 # --- 新增功能：移除极端解 ---
 # True: 移除帕累托前沿两端的极端解
@@ -59,91 +61,9 @@ def evaluate(raw_proportions, df, ingredient_columns, similarity_column, target_
     return np.array([weighted_deviation, -blended_similarity])
 
 
-# ========== 核心算法函数（保持不变） ==========
-def fast_non_dominated_sort(values):
-    population_size = len(values)
-    fronts = []
-    S = [[] for _ in range(population_size)]
-    n = [0] * population_size
-    for p in range(population_size):
-        for q in range(population_size):
-            if p == q: continue
-            if all(values[p] <= values[q]) and any(values[p] < values[q]):
-                S[p].append(q)
-            elif all(values[q] <= values[p]) and any(values[q] < values[p]):
-                n[p] += 1
-    front_0 = [p for p in range(population_size) if n[p] == 0]
-    fronts.append(front_0)
-    i = 0
-    while i < len(fronts):
-        next_front = []
-        for p in fronts[i]:
-            for q in S[p]:
-                n[q] -= 1
-                if n[q] == 0:
-                    next_front.append(q)
-        if next_front:
-            fronts.append(next_front)
-        i += 1
-    return fronts
-
-
-def crowding_distance(values, front):
-    if not front: return {}
-    num_objectives = values.shape[1]
-    num_individuals = len(front)
-    distances = {i: 0 for i in front}
-    for m in range(num_objectives):
-        sorted_front = sorted(front, key=lambda i: values[i, m])
-        distances[sorted_front[0]] = float('inf')
-        distances[sorted_front[-1]] = float('inf')
-        if num_individuals > 2:
-            min_val = values[sorted_front[0], m]
-            max_val = values[sorted_front[-1], m]
-            range_val = max_val - min_val
-            if range_val == 0: continue
-            for i in range(1, num_individuals - 1):
-                distances[sorted_front[i]] += (values[sorted_front[i + 1], m] - values[
-                    sorted_front[i - 1], m]) / range_val
-    return distances
-
-
+# ========== 核心算法函数（非支配排序、拥挤距离、交叉与变异见 nsga2_core） ==========
 def selection(population, values, population_size):
-    fronts = fast_non_dominated_sort(values)
-    distances = {}
-    for front in fronts:
-        distances.update(crowding_distance(values, front))
-    new_population_indices = []
-    front_idx = 0
-    while front_idx < len(fronts) and len(new_population_indices) + len(fronts[front_idx]) <= population_size:
-        new_population_indices.extend(fronts[front_idx])
-        front_idx += 1
-    if len(new_population_indices) < population_size:
-        if front_idx < len(fronts):
-            last_front = fronts[front_idx]
-            sorted_last_front = sorted(last_front, key=lambda i: distances[i], reverse=True)
-            remaining_count = population_size - len(new_population_indices)
-            new_population_indices.extend(sorted_last_front[:remaining_count])
-    new_population = [population[i] for i in new_population_indices]
-    return new_population
-
-
-def crossover(parent1, parent2):
-    child1, child2 = parent1.copy(), parent2.copy()
-    if random.random() < CROSSOVER_PROB:
-        alpha = random.random()
-        child1 = alpha * parent1 + (1 - alpha) * parent2
-        child2 = (1 - alpha) * parent1 + alpha * parent2
-    return child1, child2
-
-
-def mutate(individual):
-    mutated_individual = individual.copy()
-    for i in range(len(mutated_individual)):
-        if random.random() < MUTATION_PROB:
-            mutated_individual[i] += np.random.normal(0, MUTATION_STRENGTH)
-            mutated_individual[i] = max(0, mutated_individual[i])
-    return mutated_individual
+    return population[select_survivors(values, population_size)]
 
 
 # ========== 绘图和结果记录 ==========
@@ -250,21 +170,16 @@ if __name__ == "__main__":
         print(f"  - {col}: {TARGET_INGREDIENTS[i]:.4f}")
 
     num_individuals = len(df)
-    population = [np.random.dirichlet(np.ones(num_individuals), size=1).flatten() for _ in range(POPULATION_SIZE)]
+    rng = np.random.default_rng(SEED)
+    population = rng.dirichlet(np.ones(num_individuals), size=POPULATION_SIZE)
 
     for gen in range(NUM_GENERATIONS):
         if (gen + 1) % 50 == 0 or gen == 0 or (gen + 1) == NUM_GENERATIONS:
             print(f"第 {gen + 1}/{NUM_GENERATIONS} 代...")
 
-        offspring = []
-        while len(offspring) < POPULATION_SIZE:
-            p1, p2 = random.sample(population, 2)
-            c1, c2 = crossover(p1, p2)
-            offspring.append(mutate(c1))
-            if len(offspring) < POPULATION_SIZE:
-                offspring.append(mutate(c2))
+        offspring = make_offspring(population, rng, CROSSOVER_PROB, MUTATION_PROB, MUTATION_STRENGTH)
 
-        combined_population = population + offspring
+        combined_population = np.vstack([population, offspring])
         combined_obj_values = np.array(
             [evaluate(ind, df, INGREDIENT_COLUMNS, SIMILARITY_COLUMN, TARGET_INGREDIENTS) for ind in
              combined_population])
@@ -0,0 +1,149 @@
+from dataclasses import replace
+
+import numpy as np
+
+from scipy.optimize import linprog
+
+from blend_solvers import max_achievable_values, max_fingerprint_similarity
+
+# ##############################################################################
+# --- 混批不可行诊断 ---
+# 约束集合 = 各项最低标准 + 库存上界 + 指纹相似度 (Σx = 1 为结构约束, 始终保留)
+# - 每项约束在其余约束下可达的最大值: 最低标准为其余线性约束下的一次 LP,
+#   指纹相似度为全部线性约束下的最大值 (Charnes-Cooper 变换后的最小范数点迭代);
+#   指纹与含量标准之间的冲突由 IIS 体现
+# - 不可约不可行子集 (IIS): 删除过滤法, 依次尝试去掉每项约束, 去掉后仍不可行则永久删除,
+#   剩下的约束两两缺一不可, 放宽其中任意一项即可能恢复可行
+# 全部计算都只是 HiGHS 线性规划序列, 不调用非线性求解器
+# ##############################################################################
+
+DIAGNOSIS_TOLERANCE = 1e-6
+INVENTORY_LABEL = '库存总量 (克)'
+FINGERPRINT_LABEL = '指纹图谱相似度'
+
+
+def _subproblem(problem, floor_rows, use_inventory=True, use_fingerprint=True):
+    """只保留 floor_rows 对应的最低标准及指定约束的子问题 (去掉目标引导项, 只判定可行性)"""
+    num_batches = problem.num_batches
+    floor_rows = list(floor_rows)
+    return replace(
+        problem,
+        upper_bounds=problem.upper_bounds if use_inventory else np.ones(num_batches),
+        fingerprint_matrix=problem.fingerprint_matrix if use_fingerprint else None,
+        constraint_keys=[problem.constraint_keys[i] for i in floor_rows],
+        constraint_columns=[problem.constraint_columns[i] for i in floor_rows],
+        constraint_matrix=problem.constraint_matrix[floor_rows].reshape(len(floor_rows), num_batches),
+        constraint_floors=problem.constraint_floors[floor_rows],
+        target_keys=[], target_columns=[], target_matrix=np.zeros((0, num_batches)), target_values=np.zeros(0)
+    )
+
+
+def _linear_program(problem, value_vector):
+    """线性约束 (最低标准、Σx = 1、库存上界) 下 max valueᵀx 的 HiGHS 结果"""
+    a_ub = -problem.constraint_matrix if len(problem.constraint_keys) else None
+    return linprog(-value_vector, A_ub=a_ub, b_ub=-problem.constraint_floors if a_ub is not None else None,
+                   A_eq=np.ones((1, problem.num_batches)), b_eq=[1.0],
+                   bounds=np.column_stack([np.zeros(problem.num_batches), problem.upper_bounds]), method='highs')
+
+
+def _is_feasible(problem):
+    """线性约束可行且 (启用指纹时) 可达的最大相似度不低于 min_similarity"""
+    if _linear_program(problem, np.zeros(problem.num_batches)).status != 0:
+        return False
+    if problem.fingerprint_matrix is None:
+        return True
+    best = max_fingerprint_similarity(problem, DIAGNOSIS_TOLERANCE, threshold=problem.min_similarity)[0]
+    return bool(best >= problem.min_similarity)
+
+
+def _max_floor_value(problem, row):
+    """第 row 项最低标准在其余线性约束 (其他最低标准、总量、库存) 下可达的最大混合值; 其余约束本身不可行时为 nan"""
+    others = _subproblem(problem, [i for i in range(len(problem.constraint_keys)) if i != row])
+    result = _linear_program(others, problem.constraint_matrix[row])
+    return float(-result.fun) if result.status == 0 else np.nan
+
+
+def irreducible_infeasible_subset(problem):
+    """
+    删除过滤法求不可约不可行子集
+    - 返回: 约束名称列表 (最低标准为列名, 另有 INVENTORY_LABEL / FINGERPRINT_LABEL); 问题可行时返回空列表
+    """
+    floor_rows = list(range(len(problem.constraint_keys)))
+    state = {'floors': floor_rows, 'inventory': True, 'fingerprint': problem.fingerprint_matrix is not None}
+
+    def feasible(candidate):
+        return _is_feasible(_subproblem(problem, candidate['floors'], candidate['inventory'],
+                                        candidate['fingerprint']))
+
+    if feasible(state):
+        return []
+    for row in floor_rows:
+        candidate = {**state, 'floors': [i for i in state['floors'] if i != row]}
+        if not feasible(candidate):
+            state = candidate
+    for name in ('fingerprint', 'inventory'):
+        if state[name] and not feasible({**state, name: False}):
+            state = {**state, name: False}
+
+    subset = [problem.constraint_columns[i] for i in state['floors']]
+    if state['fingerprint']:
+        subset.append(FINGERPRINT_LABEL)
+    if state['inventory']:
+        subset.append(INVENTORY_LABEL)
+    return subset
+
+
+def diagnose_infeasibility(problem):
+    """
+    不可行诊断
+    - 返回 dict:
+      feasible: 全部约束能否同时满足
+      constraint_analysis: 每项约束一条记录 {constraint, required, max_available (其余线性约束下可达的最大值),
+                           max_alone (只受总量与库存限制时的最大值), mean_available (各批次平均值), feasible, in_conflict}
+      conflict_set: 不可约不可行子集 (约束名称列表)
+    """
+    conflict_set = irreducible_infeasible_subset(problem)
+    analysis = []
+    max_alone = max_achievable_values(problem, problem.constraint_matrix) if len(problem.constraint_keys) \
+        else np.zeros(0)
+    for row, col_name in enumerate(problem.constraint_columns):
+        required = float(problem.constraint_floors[row])
+        max_available = _max_floor_value(problem, row)
+        analysis.append({
+            'constraint': col_name,
+            'required': required,
+            'max_available': max_available,
+            'max_alone': float(max_alone[row]),
+            'mean_available': float(problem.constraint_matrix[row].mean()),
+            'feasible': bool(max_available >= required - 1e-9),
+            'in_conflict': col_name in conflict_set
+        })
+
+    if problem.fingerprint_matrix is not None:
+        target_unit = problem.target_profile / np.linalg.norm(problem.target_profile)
+        batch_norms = np.linalg.norm(problem.fingerprint_matrix, axis=1)
+        batch_similarity = np.divide(problem.fingerprint_matrix @ target_unit, batch_norms,
+                                     out=np.zeros(problem.num_batches), where=batch_norms > 0)
+        max_available = max_fingerprint_similarity(problem, DIAGNOSIS_TOLERANCE)[0]
+        max_alone = max_fingerprint_similarity(_subproblem(problem, []), DIAGNOSIS_TOLERANCE)[0]
+        analysis.append({
+            'constraint': FINGERPRINT_LABEL,
+            'required': float(problem.min_similarity),
+            'max_available': float(max_available),
+            'max_alone': float(max_alone),
+            'mean_available': float(batch_similarity.mean()),
+            'feasible': bool(max_available >= problem.min_similarity - 1e-9),
+            'in_conflict': FINGERPRINT_LABEL in conflict_set
+        })
+
+    total_inventory = float(problem.inventory.sum())
+    analysis.append({
+        'constraint': INVENTORY_LABEL,
+        'required': float(problem.total_mix_amount),
+        'max_available': total_inventory,
+        'max_alone': total_inventory,
+        'mean_available': float(problem.inventory.mean()),
+        'feasible': total_inventory >= problem.total_mix_amount,
+        'in_conflict': INVENTORY_LABEL in conflict_set
+    })
+    return {'feasible': not conflict_set, 'constraint_analysis': analysis, 'conflict_set': conflict_set}
@@ -0,0 +1,411 @@
+import time
+from dataclasses import replace
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, OptimizeResult, milp
+
+from blend_solvers import solve_convex_blend
+
+# ##############################################################################
+# --- 限定批次数 / 称量网格的混批 (混合整数规划) ---
+# 每个批次一个 0/1 选择变量 z_i, 与比例通过 x_i ≤ u_i·z_i 关联, Σz ≤ K (或 = K):
+#     min cᵀx + a·Σ η_j   s.t.  Ax ≥ b, Σx = 1, 0 ≤ x ≤ u·z, Σz ≤ K, η_j ≥ (T_j x - t_j)², [cos(Fᵀx, p) ≥ s]
+# 称量网格模式下 x_i = m_i/N (m_i 为整数个称量单位, N = 总量/步长), 且选用的批次至少取 min_units 个单位
+# (半连续变量 m_i ∈ {0} ∪ [min_units, 库存单位数])
+# 非线性部分用外逼近 (outer approximation) 转成 HiGHS 可解的 MILP:
+# - 目标引导项按指标可分, η_j ≥ r_j² 用切线 η_j ≥ 2ρ r_j - ρ² 从下方逼近 (初始取一组均匀切点)
+# - 指纹锥约束 h(x) = p̂ᵀf - s‖f‖ 是一次齐次的凹函数, 其在任一点 y 处的切平面 ∇h(y)ᵀx ≥ 0 是有效割平面
+# 每轮 MILP 的最优值是原问题最优值的下界; 在其选定的批次上精确求解连续凸规划 (solve_convex_blend) 得到上界,
+# 并在 MILP 解与连续最优解处补充切线/割平面; 选定批次连指纹约束都无法满足时, 加入 "至少选用一个其他批次" 的割.
+# 网格模式下连续最优解不在网格上, 只用于生成割平面, 上界取满足全部约束的 MILP 解本身.
+# 上下界之差 (报告的最优性间隙) 小于容差即证明最优
+# ##############################################################################
+
+INITIAL_TANGENTS = 9  # 每项目标指标的初始切点数
+# 恰好使用 K 个批次时, 选中批次的比例下限 (连续模式; 网格模式为 1 个称量单位).
+# 没有下限时 MILP 可以选中 z_i = 1 而取 x_i = 0, 实际用到的批次少于 K
+EXACT_COUNT_MIN_PROPORTION = 1e-4
+CONE_MARGIN = 1e-6  # 锥割平面按 s + CONE_MARGIN 生成, 使外逼近收敛后的解严格满足 cos ≥ s
+SOLVER_NAME = 'HiGHS 混合整数规划'
+
+
+def _selection_constraints(problem, max_batches, exact_count, num_targets, scale, variable_bounds, min_amount):
+    """
+    变量排列为 [y (n), z (n), η (num_targets)], x = scale·y:
+    最低标准、Σx = 1、y ≤ 上界·z、y ≥ min_amount·z (min_amount > 0 时) 与 Σz ≤ K (或 = K, max_batches > 0 时)
+    """
+    num_batches = problem.num_batches
+    extra = sparse.csr_matrix((1, num_targets))
+    zero_block = sparse.csr_matrix((num_batches, num_targets))
+    rows = [
+        LinearConstraint(sparse.hstack([sparse.csr_matrix(problem.constraint_matrix * scale),
+                                        sparse.csr_matrix((len(problem.constraint_keys), num_batches + num_targets))]),
+                         lb=problem.constraint_floors, ub=np.inf),
+        LinearConstraint(sparse.hstack([np.ones((1, num_batches)), np.zeros((1, num_batches)), extra]),
+                         lb=1.0 / scale, ub=1.0 / scale),
+        LinearConstraint(sparse.hstack([sparse.identity(num_batches), sparse.diags(-variable_bounds), zero_block]),
+                         lb=-np.inf, ub=0)
+    ]
+    if min_amount > 0:
+        rows.append(LinearConstraint(sparse.hstack([sparse.identity(num_batches),
+                                                    sparse.diags(np.full(num_batches, -float(min_amount))),
+                                                    zero_block]), lb=0, ub=np.inf))
+    if max_batches > 0:
+        rows.append(LinearConstraint(sparse.hstack([np.zeros((1, num_batches)), np.ones((1, num_batches)), extra]),
+                                     lb=max_batches if exact_count else 0, ub=max_batches))
+    return rows
+
+
+def _tangent_rows(problem, target_row, points, num_variables, scale):
+    """η_j ≥ 2ρ(T_j x - t_j) - ρ² 的切线 (ρ 取 points), 写成 2ρ T_j x - η_j ≤ 2ρ t_j + ρ²"""
+    num_batches = problem.num_batches
+    points = np.asarray(points, dtype=float)
+    matrix = np.zeros((len(points), num_variables))
+    matrix[:, :num_batches] = 2 * points[:, None] * problem.target_matrix[target_row] * scale
+    matrix[:, 2 * num_batches + target_row] = -1.0
+    upper = 2 * points * problem.target_values[target_row] + points ** 2
+    return LinearConstraint(matrix, lb=-np.inf, ub=upper)
+
+
+def _cone_cut(problem, x, similarity, num_variables):
+    """指纹锥约束在 x 处的切平面 F(p̂ - s·f̂)ᵀx ≥ 0 (h 一次齐次, 切平面过原点, 对 y 同样成立)"""
+    target_unit = problem.target_profile / np.linalg.norm(problem.target_profile)
+    mix_profile = x @ problem.fingerprint_matrix
+    mix_unit = mix_profile / np.linalg.norm(mix_profile)
+    row = np.zeros((1, num_variables))
+    row[0, :problem.num_batches] = problem.fingerprint_matrix @ (target_unit - similarity * mix_unit)
+    return LinearConstraint(row, lb=0, ub=np.inf)
+
+
+def _cone_value(problem, x, similarity):
+    target_unit = problem.target_profile / np.linalg.norm(problem.target_profile)
+    mix_profile = x @ problem.fingerprint_matrix
+    return mix_profile @ target_unit - similarity * np.linalg.norm(mix_profile)
+
+
+def _objective_value(problem, objective_vector, penalty_coefficient, x):
+    residual = problem.target_matrix @ x - problem.target_values
+    return float(objective_vector @ x + penalty_coefficient * residual @ residual)
+
+
+def _integer_result(best, lower_bound, iteration, timed_out, tolerance, time_limit):
+    """把最好方案与下界整理成 OptimizeResult (mip_gap 为上下界之差, 超出容差时在 message 中注明未证明最优)"""
+    mip_gap = max(best.fun - lower_bound, 0.0)
+    solver = best.solver if best.solver.startswith(SOLVER_NAME) else f'{SOLVER_NAME} + {best.solver}'
+    selected = np.flatnonzero(best.x > 1e-12)
+    message = f'{len(selected)} 个批次, 最优性间隙 {mip_gap:.2e}'
+    if timed_out or mip_gap > tolerance * max(1.0, abs(best.fun)):
+        message += f' (未证明最优: 达到时间上限 {time_limit:g} 秒或迭代上限)'
+    return OptimizeResult(x=best.x, fun=best.fun, success=True, status=0, nit=iteration, message=message,
+                          solver=solver, mip_gap=mip_gap, selected=selected)
+
+
+def _solve_integer_blend(problem, objective_vector, penalty_coefficient, max_batches=0, exact_count=False,
+                         units=None, min_units=0, tolerance=1e-6, time_limit=30.0, max_iterations=50,
+                         incumbent=None, lower_bound=-np.inf):
+    """
+    外逼近 MILP 的主循环 (见模块说明); units 给出时为称量网格模式 (x = m/units, m 为整数)
+    - incumbent / lower_bound: 已知的可行方案 (OptimizeResult, 含 x / fun / solver) 与下界, 两者之差
+      已在容差内时不再求解 MILP
+    - 返回: OptimizeResult; 证明不可行时 success 为 False、status 为 2,
+      达到时间上限仍无可行方案时 success 为 False、status 为 1
+    """
+    start_time = time.perf_counter()
+    num_batches, num_targets = problem.num_batches, len(problem.target_keys)
+    num_variables = 2 * num_batches + num_targets
+    use_cone = problem.fingerprint_matrix is not None and problem.min_similarity > 0
+    similarity = problem.min_similarity + CONE_MARGIN if use_cone else None
+    on_grid = units is not None
+    scale = 1.0 / units if on_grid else 1.0
+    # 网格模式下 y 的上界是整数个称量单位 (problem.upper_bounds 已按网格取整)
+    variable_bounds = np.floor(problem.upper_bounds * units + 1e-9) if on_grid else problem.upper_bounds
+    exact = exact_count and max_batches > 0
+    min_amount = min_units
+    if exact:
+        min_amount = max(min_units, 1) if on_grid else EXACT_COUNT_MIN_PROPORTION
+
+    objective = np.r_[objective_vector * scale, np.zeros(num_batches), np.full(num_targets, penalty_coefficient)]
+    integrality = np.r_[np.full(num_batches, 1 if on_grid else 0), np.ones(num_batches), np.zeros(num_targets)]
+    bounds = Bounds(np.zeros(num_variables), np.r_[variable_bounds, np.ones(num_batches), np.full(num_targets, np.inf)])
+    constraints = _selection_constraints(problem, max_batches, exact_count, num_targets, scale, variable_bounds,
+                                         min_amount)
+    for row in range(num_targets):
+        residuals = problem.target_matrix[row] - problem.target_values[row]
+        constraints.append(_tangent_rows(problem, row, np.r_[np.linspace(residuals.min(), residuals.max(),
+                                                                            INITIAL_TANGENTS), 0.0],
+                                         num_variables, scale))
+
+    best = incumbent
+    if best is not None and best.fun - lower_bound <= tolerance * max(1.0, abs(best.fun)):
+        return _integer_result(best, lower_bound, 0, False, tolerance, time_limit)
+
+    # 连续松弛 (不限批次数、不取整) 的最优解附近最可能是整数最优解所在处, 预先在此处加切线与割平面
+    relaxed = solve_convex_blend(problem, objective_vector, penalty_coefficient) if num_targets or use_cone else None
+    if relaxed is not None and relaxed.success:
+        residuals = problem.target_matrix @ relaxed.x - problem.target_values
+        constraints += [_tangent_rows(problem, row, [residuals[row]], num_variables, scale)
+                        for row in range(num_targets)]
+        if use_cone:
+            constraints.append(_cone_cut(problem, relaxed.x, similarity, num_variables))
+
+    def restricted_solve(selected):
+        """选定批次上的精确连续问题 (其余批次上界置 0)"""
+        restricted = replace(problem, upper_bounds=np.where(np.isin(np.arange(num_batches), selected),
+                                                            problem.upper_bounds, 0.0))
+        return solve_convex_blend(restricted, objective_vector, penalty_coefficient)
+
+    def approximation_cuts(x, eta):
+        """x 处被违反 (或需要收紧) 的切线与割平面"""
+        cuts = []
+        residuals = problem.target_matrix @ x - problem.target_values
+        for row in np.flatnonzero(residuals ** 2 - eta > tolerance * (1 + residuals ** 2)):
+            cuts.append(_tangent_rows(problem, row, [residuals[row]], num_variables, scale))
+        if use_cone and _cone_value(problem, x, similarity) < 0:
+            cuts.append(_cone_cut(problem, x, similarity, num_variables))
+        return cuts
+
+    timed_out, iteration = False, 0
+    for iteration in range(1, max_iterations + 1):
+        remaining = time_limit - (time.perf_counter() - start_time)
+        if remaining <= 0:
+            timed_out = True
+            break
+        current = milp(objective, integrality=integrality, bounds=bounds, constraints=constraints,
+                       options={'time_limit': remaining, 'mip_rel_gap': tolerance})
+        if current.x is None:
+            timed_out = current.status == 1
+            break
+        timed_out = current.status == 1
+        # HiGHS 的对偶界才是严格下界 (current.fun 只在 mip_rel_gap 内最优)
+        lower_bound = max(lower_bound, current.mip_dual_bound) if current.status == 0 else lower_bound
+        y, eta = current.x[:num_batches], current.x[2 * num_batches:]
+        if on_grid:
+            y = np.round(y)
+        x = y * scale
+        selected = np.flatnonzero(current.x[num_batches:2 * num_batches] > 0.5)
+
+        cuts = approximation_cuts(x, eta)
+        candidates = []
+        if (on_grid or not cuts) and (not use_cone or _cone_value(problem, x, problem.min_similarity) >= 0):
+            # MILP 解满足全部原约束 (网格模式下只有它在网格上), 可直接作为候选方案
+            candidates.append(OptimizeResult(x=np.clip(x, 0, problem.upper_bounds), success=True,
+                                             fun=_objective_value(problem, objective_vector, penalty_coefficient, x),
+                                             solver=SOLVER_NAME))
+        polished = restricted_solve(selected) if cuts or use_cone else None
+        if polished is not None and polished.success:
+            # 选定批次上的连续最优解可能把某些批次取为 0, 恰好 K 个批次时不能作为候选方案
+            if not on_grid and not (exact and np.count_nonzero(polished.x > 1e-12) < max_batches):
+                candidates.append(polished)
+            # 在选定批次的连续最优解处补充切线与割平面 (该点在锥面上, 割平面最紧)
+            residuals = problem.target_matrix @ polished.x - problem.target_values
+            cuts += [_tangent_rows(problem, row, [residuals[row]], num_variables, scale) for row in range(num_targets)]
+            if use_cone:
+                cuts.append(_cone_cut(problem, polished.x, similarity, num_variables))
+        elif polished is not None:
+            # 选定批次 (及其任意子集) 无法满足指纹约束: 可行方案至少要用到一个其他批次
+            row = np.zeros((1, num_variables))
+            row[0, num_batches:2 * num_batches] = 1.0
+            row[0, num_batches + selected] = 0.0
+            cuts.append(LinearConstraint(row, lb=1, ub=np.inf))
+        for candidate in candidates:
+            if best is None or candidate.fun < best.fun:
+                best = candidate
+
+        if best is not None and best.fun - lower_bound <= tolerance * max(1.0, abs(best.fun)):
+            break
+        if not cuts or timed_out:
+            break
+        constraints.extend(cuts)
+
+    if best is None:
+        reason = '达到时间上限, 未找到可行方案' if timed_out else '约束不可行'
+        return OptimizeResult(x=None, fun=np.nan, success=False, status=1 if timed_out else 2, nit=iteration,
+                              message=reason, solver=SOLVER_NAME)
+    return _integer_result(best, lower_bound, iteration, timed_out, tolerance, time_limit)
+
+
+def solve_cardinality_blend(problem, objective_vector, penalty_coefficient, max_batches, exact_count=False,
+                            tolerance=1e-6, time_limit=30.0, max_iterations=50):
+    """
+    最多 (exact_count=True 时恰好) 使用 max_batches 个批次的全局最优配方, 目标同 solve_convex_blend
+    - 恰好使用时每个选中批次的比例至少为 EXACT_COUNT_MIN_PROPORTION
+    - 只有线性目标与最低标准时是一次 MILP; 有目标引导项或指纹约束时为外逼近的 MILP 序列
+    - 选定批次后在其上精确求解连续问题, 最终解严格满足全部约束
+    - 返回: OptimizeResult (solver、mip_gap 为上下界之差、selected 为选中批次的位置);
+      约束在 K 个批次内不可行时 success 为 False; 达到 time_limit 时返回已找到的最好方案并在 message 中注明
+    """
+    result = _solve_integer_blend(problem, objective_vector, penalty_coefficient, max_batches, exact_count,
+                                  tolerance=tolerance, time_limit=time_limit, max_iterations=max_iterations)
+    if not result.success:
+        result.message = f'{max_batches} 个批次内{result.message}'
+    return result
+
+
+def _grid_violation(problem, units):
+    """返回 violation(m): 各项最低标准的相对缺口之和 + 指纹余弦相似度的缺口 (0 表示全部满足)"""
+    floor_scales = np.maximum(np.abs(problem.constraint_floors), 1e-12)
+    use_cone = problem.fingerprint_matrix is not None and problem.min_similarity > 0
+
+    def violation(unit_counts):
+        x = unit_counts / units
+        total = np.sum(np.maximum(problem.constraint_floors - problem.constraint_values(x), 0.0) / floor_scales)
+        if use_cone:
+            total += max(-_cone_value(problem, x, problem.min_similarity), 0.0) / np.linalg.norm(
+                x @ problem.fingerprint_matrix)
+        return total
+    return violation
+
+
+def _initial_rounding(amounts, keep, capacity, units, min_units):
+    """保留 keep 中的批次 (至少 min_units 个单位), 向下取整后按最大余数法逐个单位补足 (或扣减) 到 Σm = units"""
+    amounts = np.where(keep, np.maximum(amounts, min_units), 0.0)
+    if np.any(amounts > capacity):
+        return None
+    unit_counts = np.floor(amounts)
+    for _ in range(int(abs(units - unit_counts.sum()))):
+        if unit_counts.sum() < units:
+            remainders = np.where(keep & (unit_counts < capacity), amounts - unit_counts, -np.inf)
+            chosen, step = np.argmax(remainders), 1
+        else:
+            remainders = np.where(unit_counts > max(min_units, 1), amounts - unit_counts, np.inf)
+            chosen, step = np.argmin(remainders), -1
+        if not np.isfinite(remainders[chosen]):
+            return None
+        unit_counts[chosen] += step
+    return unit_counts
+
+
+def _repair(problem, unit_counts, pool, capacity, units, min_units, max_batches, max_moves):
+    """
+    单位转移修复: 每步在 pool 中的批次之间转移一个单位 (转入未选用的批次时转入 min_units 个单位,
+    转出后剩余不足 min_units 时须整批转出), 取使最低标准相对缺口与相似度缺口之和下降最多的一步
+    - 返回: 满足全部约束的整数单位数组; 无改进的转移仍不可行时返回 None
+    """
+    violation = _grid_violation(problem, units)
+    current = violation(unit_counts)
+    lowest = max(min_units, 1)
+    for _ in range(max_moves):
+        if current <= 0:
+            return unit_counts
+        best_move, best_value = None, current
+        active = np.count_nonzero(unit_counts)
+        for target in pool[unit_counts[pool] < capacity[pool]]:
+            amount = 1 if unit_counts[target] > 0 else lowest
+            if unit_counts[target] + amount > capacity[target]:
+                continue
+            for source in pool[unit_counts[pool] > 0]:
+                remaining = unit_counts[source] - amount
+                if source == target or not (remaining >= lowest or remaining == 0):
+                    continue
+                if max_batches > 0 and active + (unit_counts[target] == 0) - (remaining == 0) > max_batches:
+                    continue
+                unit_counts[source] -= amount
+                unit_counts[target] += amount
+                value = violation(unit_counts)
+                unit_counts[source] += amount
+                unit_counts[target] -= amount
+                if value < best_value - 1e-15:
+                    best_move, best_value = (source, target, amount), value
+        if best_move is None:
+            return None
+        source, target, amount = best_move
+        unit_counts[source] -= amount
+        unit_counts[target] += amount
+        current = best_value
+    return unit_counts if current <= 0 else None
+
+
+def round_to_grid(problem, x, units, min_units=0, max_batches=0, max_moves=None):
+    """
+    取整修复: 把连续配方 x 化为称量网格上的整数单位 m (Σm = units), 再用单位转移修复约束
+    - 初始取整: 先舍去比例不足 min_units 一半的批次, 其余至少取 min_units 个单位 (按最大余数法补足总量);
+      修复失败时改为保留连续配方用到的全部批次再试一次. 限定批次数时只保留比例最大的 max_batches 个
+    - 修复只在连续配方用到的批次之间转移单位 (见 _repair)
+    - 返回: 整数单位数组; 无法得到满足全部约束的方案时返回 None
+    """
+    capacity = np.floor(problem.upper_bounds * units + 1e-9)
+    amounts = np.minimum(np.asarray(x, dtype=float) * units, capacity)
+    pool = np.flatnonzero(amounts > 1e-9)
+    for threshold in (max(min_units, 1) / 2, 1e-9):
+        keep = amounts >= threshold
+        if max_batches > 0 and keep.sum() > max_batches:
+            keep[np.argsort(-amounts)[max_batches:]] = False
+        unit_counts = _initial_rounding(amounts, keep, capacity, units, min_units)
+        if unit_counts is not None:
+            unit_counts = _repair(problem, unit_counts, pool, capacity, units, min_units, max_batches,
+                                  units if max_moves is None else max_moves)
+        if unit_counts is not None:
+            return unit_counts
+    return None
+
+
+def solve_dispensing_blend(problem, objective_vector, penalty_coefficient, grid_step, min_draw=0.0, max_batches=0,
+                           exact_count=False, tolerance=1e-4, time_limit=30.0, max_iterations=50):
+    """
+    称量网格上的配方: 每个批次的用量为 grid_step 克的整数倍, 选用的批次用量不少于 min_draw 克
+    - 总量按网格取整为 N·grid_step (N = round(总量/步长)), 库存按网格向下取整
+    - 网格本身的分辨率远大于连续模式的 1e-6, 默认最优性容差取 1e-4
+    - 分三步: 连续问题 (限定批次数时为 solve_cardinality_blend) 的最优值作为下界; 其最优配方取整修复
+      (round_to_grid) 与其支撑集上的网格 MILP 中较好者作为初始方案; 上下界之差未达容差时再解全部批次上的网格 MILP.
+      取整误差通常已在容差内, 此时不必求解大规模 MILP; MILP 达到时间上限时返回初始方案 (注明未证明最优)
+    - 返回: OptimizeResult, 另含 dispense_grams (各批次称量克数, 恰为步长整数倍)、grid_step、
+      total_grams (网格取整后的总量); 网格上不可行时 success 为 False
+    """
+    start_time = time.perf_counter()
+    units = max(int(round(problem.total_mix_amount / grid_step)), 1)
+    min_units = int(np.ceil(min_draw / grid_step - 1e-9)) if min_draw > 0 else 0
+    total_grams = units * grid_step
+    grid_problem = replace(problem, total_mix_amount=total_grams,
+                           upper_bounds=np.minimum(units, np.floor(problem.inventory / grid_step + 1e-9)) / units)
+
+    def failure(result):
+        result.message = f'称量网格 (步长 {grid_step:g} 克, 最小取用量 {min_draw:g} 克) 上{result.message}'
+        return result
+
+    def remaining_time():
+        return max(time_limit - (time.perf_counter() - start_time), 0.0)
+
+    # 1. 连续问题: 网格方案都是它的可行解, 最优值即下界
+    if max_batches > 0:
+        relaxed = solve_cardinality_blend(grid_problem, objective_vector, penalty_coefficient, max_batches,
+                                          exact_count, time_limit=time_limit, max_iterations=max_iterations)
+        lower_bound = relaxed.fun - relaxed.mip_gap if relaxed.success else -np.inf
+    else:
+        relaxed = solve_convex_blend(grid_problem, objective_vector, penalty_coefficient)
+        lower_bound = relaxed.fun - relaxed.get('duality_gap', 0.0) if relaxed is not None and relaxed.success \
+            else -np.inf
+    if relaxed is not None and not relaxed.success and relaxed.status == 2:
+        return failure(OptimizeResult(x=None, fun=np.nan, success=False, status=2, nit=0, message='约束不可行',
+                                      solver=SOLVER_NAME))
+
+    # 2. 初始方案: 连续最优配方取整修复, 及其支撑集上的网格 MILP
+    incumbent = None
+    if relaxed is not None and relaxed.success:
+        unit_counts = round_to_grid(grid_problem, relaxed.x, units, min_units, max_batches)
+        if unit_counts is not None and (not exact_count or np.count_nonzero(unit_counts) == max_batches):
+            x = unit_counts / units
+            incumbent = OptimizeResult(x=x, success=True, solver='取整修复',
+                                       fun=_objective_value(grid_problem, objective_vector, penalty_coefficient, x))
+        support = relaxed.x > 1e-12
+        if support.sum() < problem.num_batches:
+            restricted = _solve_integer_blend(
+                replace(grid_problem, upper_bounds=np.where(support, grid_problem.upper_bounds, 0.0)),
+                objective_vector, penalty_coefficient, max_batches, exact_count, units=units, min_units=min_units,
+                tolerance=tolerance, time_limit=remaining_time(), max_iterations=max_iterations, incumbent=incumbent,
+                lower_bound=lower_bound)
+            if restricted.success and (incumbent is None or restricted.fun < incumbent.fun):
+                incumbent = restricted
+
+    # 3. 全部批次上的网格 MILP (初始方案与下界之差已在容差内时直接返回)
+    result = _solve_integer_blend(grid_problem, objective_vector, penalty_coefficient, max_batches, exact_count,
+                                  units=units, min_units=min_units, tolerance=tolerance, time_limit=remaining_time(),
+                                  max_iterations=max_iterations, incumbent=incumbent, lower_bound=lower_bound)
+    if not result.success and incumbent is not None:
+        result = _integer_result(incumbent, lower_bound, result.nit, True, tolerance, time_limit)
+    if not result.success:
+        return failure(result)
+
+    result.dispense_grams = np.round(result.x * units) * grid_step
+    result.grid_step, result.total_grams = grid_step, total_grams
+    return result
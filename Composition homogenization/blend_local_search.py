@@ -0,0 +1,381 @@
+import time
+from dataclasses import replace
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+from blend_solvers import solve_convex_blend
+
+# ##############################################################################
+# --- 限定批次数混批的局部搜索 (大规模批次库) ---
+# 问题同 solve_cardinality_blend: min cᵀx + a·‖Tx - t‖²  s.t. Ax ≥ b, Σx = 1, 0 ≤ x ≤ u, [cos(Fᵀx, p) ≥ s],
+# 至多 (或恰好) K 个批次; 批次数上万时 MILP 太慢, 这里只求满足全部约束的局部最优方案:
+# - 初始方案: 按单一批次的 (约束缺口, 目标值) 排序取前 K 个, 在库存上界内均分
+# - 移动: 从选用批次 i 转移 δ 到批次 j (δ 取 x_i 的 1, 1/2, 1/4, ...; δ = x_i 且 j 未选用时即为换批)
+#   混合后的指标向量 v = Ax、目标含量 Tx、指纹 f = Fᵀx 都只随移动增量更新 (v += δ(A_j - A_i)),
+#   评估一个候选移动是 O(d) (d = 指标数 + 目标数 + 指纹维数), 每轮对全部候选 j 向量化求值;
+#   指纹余弦由 ‖f + δ(F_j - F_i)‖² 的展开式计算, 每轮只需 F·f 与 F·F_i 两次矩阵向量乘
+# - 接受规则为字典序: 不可行时先降低约束缺口, 可行后只接受仍可行且目标值下降的移动
+# - 无改进移动 (局部最优) 时在选定批次上精确求解连续凸规划 (solve_convex_blend, 只有 K 列) 调整比例;
+#   比例已是最优时用其对偶值给全部批次定价 (检验数 = ∇L_j - λᵀA_j - μ, 同样由增量向量 O(d) 求得),
+#   取检验数最负的几个批次逐一替换选定批次并重新求解比例 (单步转移无法离开线性规划的顶点最优解)
+#   有改进则从新方案继续搜索, 直到再无改进 (局部最优)
+# - 迭代局部搜索: 局部最优后随机换出几个批次 (换入检验数小的批次) 再重新下降, 保留最好方案, 直到达到时间预算
+# ##############################################################################
+
+SOLVER_NAME = '局部搜索'
+TRANSFER_LEVELS = 8  # 转移量 δ = x_i / 2^l, l = 0..TRANSFER_LEVELS-1
+EXCHANGE_CANDIDATES = 3  # 按对偶价格换批时尝试的候选批次数
+PERTURBATION_SIZE = 2  # 每轮扰动换出的批次数
+PERTURBATION_POOL = 4  # 扰动换入的候选为检验数最小的 PERTURBATION_POOL·K 个未选用批次
+VIOLATION_TOLERANCE = 1e-9
+
+
+def _subset_problem(problem, columns):
+    """只含 columns 批次的子问题 (按批次的数组全部切片, 供选定批次上的连续求解)"""
+    def take(values, axis=0):
+        return None if values is None else np.take(values, columns, axis=axis)
+    return replace(
+        problem,
+        batch_index=[problem.batch_index[i] for i in columns],
+        inventory=take(problem.inventory),
+        upper_bounds=take(problem.upper_bounds),
+        ingredient_matrix=take(problem.ingredient_matrix),
+        similarity_vector=take(problem.similarity_vector),
+        cost_vector=take(problem.cost_vector),
+        rubric_vector=take(problem.rubric_vector),
+        fingerprint_matrix=take(problem.fingerprint_matrix),
+        constraint_matrix=take(problem.constraint_matrix, axis=1),
+        target_matrix=take(problem.target_matrix, axis=1)
+    )
+
+
+class _BlendState:
+    """
+    当前配方及其混合后的各项向量 (v = Ax, τ = Tx, f = Fᵀx, cᵀx), 移动时增量更新;
+    evaluate 对从 source 转出 amount 到一组批次 targets 的候选移动向量化求 (约束缺口, 目标值)
+    """
+
+    def __init__(self, problem, objective_vector, penalty_coefficient, x):
+        self.problem = problem
+        self.objective_vector = objective_vector
+        self.penalty_coefficient = penalty_coefficient
+        self.floor_scales = np.maximum(np.abs(problem.constraint_floors), 1e-12)
+        self.use_cone = problem.fingerprint_matrix is not None and problem.min_similarity > 0
+        if self.use_cone:
+            fingerprint_matrix = problem.fingerprint_matrix
+            self.target_unit = problem.target_profile / np.linalg.norm(problem.target_profile)
+            self.projections = fingerprint_matrix @ self.target_unit
+            self.squared_norms = np.einsum('ij,ij->i', fingerprint_matrix, fingerprint_matrix)
+        self.reset(x)
+
+    def reset(self, x):
+        """由 x 重新计算全部混合向量 (只用到选用批次的列)"""
+        problem = self.problem
+        self.x = x
+        columns = np.flatnonzero(x > 0)
+        self.constraint_values = problem.constraint_matrix[:, columns] @ x[columns]
+        self.target_values = problem.target_matrix[:, columns] @ x[columns]
+        self.linear = self.objective_vector[columns] @ x[columns]
+        if self.use_cone:
+            self.fingerprint = x[columns] @ problem.fingerprint_matrix[columns]
+            self.fingerprint_products = None
+
+    def violation(self):
+        return self.violations(self.constraint_values[:, None], self._cone_parts(0.0, None, None))[0]
+
+    def objective(self):
+        return self.objectives(self.linear, self.target_values[:, None])[0]
+
+    def objectives(self, linear, target_values):
+        residuals = target_values - self.problem.target_values[:, None]
+        return linear + self.penalty_coefficient * np.sum(residuals ** 2, axis=0)
+
+    def _cone_parts(self, amount, source, targets):
+        """移动后的 (p̂ᵀf, ‖f‖²); 未启用指纹约束时为 None"""
+        if not self.use_cone:
+            return None
+        projection = self.fingerprint @ self.target_unit
+        squared_norm = self.fingerprint @ self.fingerprint
+        if source is None:
+            return np.atleast_1d(projection), np.atleast_1d(squared_norm)
+        if self.fingerprint_products is None:
+            # F·f: 当前指纹与每个批次指纹的内积, 在下一次接受移动前对所有 source 共用
+            self.fingerprint_products = self.problem.fingerprint_matrix @ self.fingerprint
+        cross = self.problem.fingerprint_matrix[targets] @ self.problem.fingerprint_matrix[source]
+        projection = projection + amount * (self.projections[targets] - self.projections[source])
+        squared_norm = squared_norm + 2 * amount * (self.fingerprint_products[targets] -
+                                                    self.fingerprint_products[source]) + \
+            amount ** 2 * (self.squared_norms[targets] - 2 * cross + self.squared_norms[source])
+        return projection, squared_norm
+
+    def violations(self, constraint_values, cone_parts):
+        shortfall = np.maximum(self.problem.constraint_floors[:, None] - constraint_values, 0.0)
+        total = np.sum(shortfall / self.floor_scales[:, None], axis=0)
+        if cone_parts is not None:
+            projection, squared_norm = cone_parts
+            similarity = projection / np.sqrt(np.maximum(squared_norm, 1e-300))
+            total = total + np.maximum(self.problem.min_similarity - similarity, 0.0)
+        return total
+
+    def reduced_costs(self, duals):
+        """
+        选定批次上连续最优解的对偶值 (solve_convex_blend 的 duals) 给出的各批次检验数 ∇L_j - λᵀA_j - μ,
+        ∇L = c + 2a(Tx - t)ᵀT - κ∇h (κ 为指纹锥约束的乘子); 为负的批次加入配方可以降低目标值
+        """
+        problem = self.problem
+        gradient = self.objective_vector + 2 * self.penalty_coefficient * (
+            self.target_values - problem.target_values) @ problem.target_matrix
+        if self.use_cone and duals.get('fingerprint'):
+            if self.fingerprint_products is None:
+                self.fingerprint_products = problem.fingerprint_matrix @ self.fingerprint
+            norm = np.linalg.norm(self.fingerprint)
+            # h = p̂ᵀf - s‖f‖ 对 x_j 的偏导为 p̂ᵀF_j - s·fᵀF_j/‖f‖, solve_convex_blend 报告的是 κ‖f‖
+            gradient = gradient - duals['fingerprint'] / norm * (
+                self.projections - problem.min_similarity * self.fingerprint_products / norm)
+        return gradient - duals['floors'] @ problem.constraint_matrix - duals['sum']
+
+    def evaluate(self, source, amount, targets):
+        problem = self.problem
+        constraint_values = self.constraint_values[:, None] + amount * (
+            problem.constraint_matrix[:, targets] - problem.constraint_matrix[:, [source]])
+        target_values = self.target_values[:, None] + amount * (
+            problem.target_matrix[:, targets] - problem.target_matrix[:, [source]])
+        linear = self.linear + amount * (self.objective_vector[targets] - self.objective_vector[source])
+        return (self.violations(constraint_values, self._cone_parts(amount, source, targets)),
+                self.objectives(linear, target_values))
+
+    def move(self, source, target, amount):
+        """把 amount 从 source 转到 target: 各混合向量减去 source 的贡献、加上 target 的贡献"""
+        problem = self.problem
+        self.x[source] = 0.0 if amount >= self.x[source] else self.x[source] - amount
+        self.x[target] += amount
+        self.constraint_values += amount * (problem.constraint_matrix[:, target] - problem.constraint_matrix[:, source])
+        self.target_values += amount * (problem.target_matrix[:, target] - problem.target_matrix[:, source])
+        self.linear += amount * (self.objective_vector[target] - self.objective_vector[source])
+        if self.use_cone:
+            self.fingerprint += amount * (problem.fingerprint_matrix[target] - problem.fingerprint_matrix[source])
+            self.fingerprint_products = None
+
+
+def _initial_recipe(state, max_batches, exact_count):
+    """
+    贪心初始方案: 按单一批次的 (是否可行, 约束缺口, 目标值) 排序取前 K 个批次, 在库存上界内尽量均分;
+    这 K 个批次的库存不够总量时改取库存最大的 K 个
+    - 返回: 比例数组; 任意 K 个批次的库存都不够总量时返回 None
+    """
+    problem = state.problem
+    num_batches = problem.num_batches
+    cone_parts = (state.projections, state.squared_norms) if state.use_cone else None
+    violation = state.violations(problem.constraint_matrix, cone_parts)
+    objective = state.objectives(state.objective_vector, problem.target_matrix)
+    order = np.lexsort((objective, violation, violation > VIOLATION_TOLERANCE))
+    chosen = order[:max_batches]
+    if problem.upper_bounds[chosen].sum() < 1.0 - 1e-12:
+        chosen = np.argsort(-problem.upper_bounds)[:max_batches]
+        if problem.upper_bounds[chosen].sum() < 1.0 - 1e-12:
+            return None
+
+    # 注水法均分: 上界不足均分份额的批次取满, 其余批次平分剩余量
+    x = np.zeros(num_batches)
+    remaining, open_batches = 1.0, list(chosen[np.argsort(problem.upper_bounds[chosen])])
+    while open_batches:
+        share = remaining / len(open_batches)
+        batch = open_batches.pop(0)
+        x[batch] = min(problem.upper_bounds[batch], share)
+        remaining -= x[batch]
+    if not exact_count:
+        x[x < 1e-12] = 0.0
+    return x
+
+
+def _best_move(state, max_batches, exact_count):
+    """
+    全部候选移动中最好的一个 (字典序: 先约束缺口, 可行后目标值); 没有改进移动时返回 None
+    - 转移量 δ = x_i / 2^l; δ = x_i 时 i 不再选用, 可以转入任意批次 (转入未选用批次即换批),
+      δ < x_i 时只有选用批次数未满 K 才能转入未选用批次
+    - exact_count 时不允许选用批次数减少
+    """
+    problem, x = state.problem, state.x
+    capacity = problem.upper_bounds - x
+    active = np.flatnonzero(x > 0)
+    inactive = np.flatnonzero(x == 0)
+    current_violation = state.violation()
+    current = (current_violation if current_violation > VIOLATION_TOLERANCE else 0.0, state.objective())
+    best, best_key = None, current
+    for source in active:
+        for level in range(TRANSFER_LEVELS):
+            amount = x[source] / 2 ** level
+            if amount < 1e-9:
+                break
+            candidates = [active[(active != source) & (capacity[active] >= amount - 1e-15)]]
+            if level == 0 and exact_count:
+                candidates = []
+            if level == 0 or len(active) < max_batches:
+                candidates.append(inactive[capacity[inactive] >= amount - 1e-15])
+            targets = np.concatenate(candidates) if candidates else np.zeros(0, dtype=int)
+            if len(targets) == 0:
+                continue
+            violation, objective = state.evaluate(source, amount, targets)
+            violation = np.where(violation > VIOLATION_TOLERANCE, violation, 0.0)
+            lowest = violation.min()
+            index = np.argmin(np.where(violation <= lowest, objective, np.inf))
+            key = (lowest, objective[index])
+            if key[0] < best_key[0] - 1e-15 or \
+                    (key[0] <= best_key[0] and key[1] < best_key[1] - 1e-12 * max(1.0, abs(best_key[1]))):
+                best, best_key = (source, targets[index], amount), key
+    return best
+
+
+def _polish(problem, objective_vector, penalty_coefficient, columns):
+    """columns 批次上的连续最优比例: 返回 (全体批次上的 x, solve_convex_blend 结果); 不可行或未收敛时返回 None"""
+    result = solve_convex_blend(_subset_problem(problem, columns), objective_vector[columns], penalty_coefficient)
+    if result is None or not result.success:
+        return None
+    x = np.zeros(problem.num_batches)
+    x[columns] = np.where(result.x > 1e-12, result.x, 0.0)
+    return x, result
+
+
+def _priced_exchange(state, duals, max_batches, exact_count, deadline):
+    """
+    按检验数换批: 检验数最负的 EXCHANGE_CANDIDATES 个未选用批次依次尝试, 选用批次数未满 K 时直接加入,
+    否则逐一替换每个选用批次, 每次都重新求解比例
+    - 返回: 目标值下降最多的 (x, 结果); 没有改进或超过 deadline 时返回已找到的最好者 (可能为 None)
+    """
+    problem = state.problem
+    support = np.flatnonzero(state.x > 0)
+    reduced = state.reduced_costs(duals)
+    reduced[support] = np.inf
+    reduced[problem.upper_bounds <= 0] = np.inf
+    best, best_value = None, state.objective() - 1e-12 * max(1.0, abs(state.objective()))
+    for entering in np.argsort(reduced)[:EXCHANGE_CANDIDATES]:
+        if reduced[entering] >= -1e-12:
+            break
+        if len(support) < max_batches:
+            trials = [np.append(support, entering)]
+        else:
+            trials = [np.where(support == leaving, entering, support) for leaving in support]
+        for columns in trials:
+            if time.perf_counter() > deadline:
+                return best
+            polished = _polish(problem, state.objective_vector, state.penalty_coefficient, columns)
+            if polished is None or (exact_count and np.count_nonzero(polished[0]) < max_batches):
+                continue
+            if polished[1].fun < best_value:
+                best, best_value = polished, polished[1].fun
+        if best is not None:
+            return best
+    return best
+
+
+def _descend(state, max_batches, exact_count, deadline, max_moves):
+    """
+    从 state 出发交替执行 转移/换批移动 → 选定批次上求解比例 → 按检验数换批, 直到都没有改进 (局部最优) 或超过 deadline
+    - 返回: (接受的移动数, 最后一次求解比例的结果 (没有时为 None), 是否超时)
+    """
+    problem = state.problem
+    moves, last = 0, None
+    while True:
+        while moves < max_moves:
+            if time.perf_counter() > deadline:
+                return moves, last, True
+            move = _best_move(state, max_batches, exact_count)
+            if move is None:
+                break
+            state.move(*move)
+            moves += 1
+        if moves >= max_moves:
+            return moves, last, False
+
+        # 局部最优: 在选定批次上精确求解连续问题调整比例, 有改进则从新方案继续搜索
+        support = np.flatnonzero(state.x > 0)
+        polished = _polish(problem, state.objective_vector, state.penalty_coefficient, support)
+        if polished is None or (exact_count and np.count_nonzero(polished[0]) < len(support)):
+            return moves, last, False
+        x, result = polished
+        current = state.objective() if state.violation() <= VIOLATION_TOLERANCE else np.inf
+        if result.fun > current + 1e-12 * max(1.0, abs(result.fun)):
+            return moves, last, False
+        state.reset(x)
+        last = result
+        if result.fun < current - 1e-12 * max(1.0, abs(result.fun)):
+            continue
+
+        # 比例已是最优: 按对偶价格换批
+        exchanged = _priced_exchange(state, result.duals, max_batches, exact_count, deadline)
+        if exchanged is None:
+            return moves, last, time.perf_counter() > deadline
+        state.reset(exchanged[0])
+        last = exchanged[1]
+        moves += 1
+
+
+def _perturb(state, duals, rng):
+    """
+    扰动: 随机换出 PERTURBATION_SIZE 个选用批次, 换入检验数为负 (或最小) 的未选用批次中随机的几个,
+    换入批次接过换出批次的全部用量 (库存不够的候选跳过)
+    """
+    problem, x = state.problem, state.x.copy()
+    support = np.flatnonzero(x > 0)
+    reduced = state.reduced_costs(duals)
+    reduced[support] = np.inf
+    pool = list(np.argsort(reduced)[:PERTURBATION_POOL * len(support)])
+    for leaving in rng.permutation(support)[:PERTURBATION_SIZE]:
+        eligible = [batch for batch in pool if problem.upper_bounds[batch] >= x[leaving]]
+        if not eligible:
+            continue
+        entering = eligible[rng.integers(len(eligible))]
+        pool.remove(entering)
+        x[entering], x[leaving] = x[leaving], 0.0
+    state.reset(x)
+
+
+def solve_local_search_blend(problem, objective_vector, penalty_coefficient, max_batches, exact_count=False,
+                             time_limit=0.8, max_moves=100000, seed=0):
+    """
+    最多 (exact_count=True 时恰好) 使用 max_batches 个批次的局部最优配方, 目标同 solve_convex_blend
+    - 贪心初始方案 + 增量评估的转移/换批移动 + 选定批次上的连续凸规划 (见模块说明);
+      到达局部最优后在剩余时间内反复扰动最好方案再重新下降 (迭代局部搜索), 总时长受 time_limit 限制
+    - 不证明全局最优 (需要证明时用 blend_integer.solve_cardinality_blend), 适合上万个批次的快速出方
+    - seed: 扰动的随机数种子, 同一输入的结果可复现
+    - 返回: OptimizeResult (solver、selected 为选中批次的位置); 任意 K 个批次的库存都不够总量时 success 为 False、
+      status 为 2; 搜索结束时仍未满足全部约束时 success 为 False、status 为 1
+    """
+    deadline = time.perf_counter() + time_limit
+    state = _BlendState(problem, objective_vector, penalty_coefficient, np.zeros(problem.num_batches))
+    x = _initial_recipe(state, max_batches, exact_count)
+    if x is None:
+        return OptimizeResult(x=None, fun=np.nan, success=False, status=2, nit=0, solver=SOLVER_NAME,
+                              message=f'任意 {max_batches} 个批次的库存之和都不够总量')
+    state.reset(x)
+
+    def key():
+        violation = state.violation()
+        return (violation, np.inf) if violation > VIOLATION_TOLERANCE else (0.0, state.objective())
+
+    rng = np.random.default_rng(seed)
+    moves, last, timed_out = _descend(state, max_batches, exact_count, deadline, max_moves)
+    best_x, best_key, best_last, rounds = state.x.copy(), key(), last, 0
+    while not timed_out and moves < max_moves and best_last is not None:
+        _perturb(state, best_last.duals, rng)
+        rounds += 1
+        round_moves, last, timed_out = _descend(state, max_batches, exact_count, deadline, max_moves - moves)
+        moves += round_moves
+        if key() < best_key:
+            best_x, best_key, best_last = state.x.copy(), key(), last
+        state.reset(best_x.copy())
+    solver = SOLVER_NAME if best_last is None else f'{SOLVER_NAME} + {best_last.solver}'
+
+    # 增量更新累积的舍入误差在此消除: 最终结果由 x 重新计算
+    state.reset(best_x)
+    violation = state.violation()
+    if violation > VIOLATION_TOLERANCE:
+        return OptimizeResult(x=state.x, fun=np.nan, success=False, status=1, nit=moves, solver=solver,
+                              message=f'{max_batches} 个批次内局部搜索未找到满足全部约束的方案 '
+                                      f'(约束缺口 {violation:.2e})')
+    selected = np.flatnonzero(state.x > 0)
+    message = f'{len(selected)} 个批次, {moves} 次移动, {rounds} 轮扰动' + \
+        (f', 达到时间预算 {time_limit:g} 秒' if timed_out else '')
+    return OptimizeResult(x=state.x, fun=state.objective(), success=True, status=0, nit=moves, message=message,
+                          solver=solver, selected=selected)
@@ -0,0 +1,128 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# ##############################################################################
+# --- 混批问题的数值表示 ---
+# 每次计算开始时由 pandas 数据构建一次, 之后 SLSQP、NSGA-II、结果报告与失败诊断
+# 都只读取其中的 float64 连续数组, 求值热路径中不再出现 pandas 索引
+# ##############################################################################
+
+
+@dataclass
+class BlendProblem:
+    """
+    混批优化问题 (n 个批次)
+    - inventory / upper_bounds: 库存量 (克) 与比例上界 min(1, 库存/总量)
+    - ingredient_matrix: (n, 2) 甘草苷/甘草酸含量, 未映射这两列时为 None
+    - similarity_vector / cost_vector / rubric_vector: 相似度、单位成本、质量评分, 缺失时为 None
+    - fingerprint_matrix / target_profile / min_similarity: 指纹图谱约束, 未启用时为 None
+    - constraint_matrix / constraint_floors: 最低标准约束 A·x ≥ b, 第 i 行对应 constraint_keys[i]
+    - target_matrix / target_values: 含量目标引导, 第 i 行对应 target_keys[i]
+    """
+    batch_index: list
+    total_mix_amount: float
+    inventory: np.ndarray
+    upper_bounds: np.ndarray
+    ingredient_matrix: np.ndarray = None
+    similarity_vector: np.ndarray = None
+    cost_vector: np.ndarray = None
+    rubric_vector: np.ndarray = None
+    fingerprint_matrix: np.ndarray = None
+    target_profile: np.ndarray = None
+    min_similarity: float = None
+    constraint_keys: list = field(default_factory=list)
+    constraint_columns: list = field(default_factory=list)
+    constraint_matrix: np.ndarray = None
+    constraint_floors: np.ndarray = None
+    target_keys: list = field(default_factory=list)
+    target_columns: list = field(default_factory=list)
+    target_matrix: np.ndarray = None
+    target_values: np.ndarray = None
+
+    @property
+    def num_batches(self):
+        return len(self.inventory)
+
+    def constraint_values(self, proportions):
+        """混合后各项最低标准指标的实际值 A·x"""
+        return self.constraint_matrix @ proportions
+
+    def target_actuals(self, proportions):
+        """混合后各项目标含量的实际值"""
+        return self.target_matrix @ proportions
+
+
+def _column(selected_data, col_name):
+    return np.ascontiguousarray(selected_data[col_name].to_numpy(dtype=float))
+
+
+def _rows(selected_data, col_map, values_by_key):
+    """按 col_map 把 {key: 数值} 转换为 (keys, 列名, (k, n) 矩阵, (k,) 数值); 未映射或不存在的列被跳过"""
+    keys, columns = [], []
+    for key in values_by_key:
+        col_name = col_map.get(key)
+        if col_name and col_name in selected_data.columns:
+            keys.append(key)
+            columns.append(col_name)
+    matrix = np.array([_column(selected_data, col_name) for col_name in columns], dtype=float)
+    values = np.array([values_by_key[key] for key in keys], dtype=float)
+    return keys, columns, matrix.reshape(len(keys), len(selected_data)), values
+
+
+def build_blend_problem(selected_data, col_map, total_mix_amount, constraints_dict=None, fingerprint_options=None,
+                        target_contents=None):
+    """
+    由所选批次数据构建 BlendProblem
+    - 库存缺失的批次视为库存充足 (总量 × 批次数 × 10), 与各优化引擎原有处理一致
+    - constraints_dict / target_contents 的键经 col_map 映射到列名
+    - fingerprint_options 启用且给出 target_profile 时提取指纹矩阵
+    """
+    num_batches = len(selected_data)
+    inventory = np.ascontiguousarray(
+        selected_data['库存量 (克)'].fillna(total_mix_amount * num_batches * 10).to_numpy(dtype=float))
+    upper_bounds = np.minimum(1.0, inventory / total_mix_amount) if total_mix_amount > 0 else np.zeros(num_batches)
+
+    def optional_column(key):
+        col_name = col_map.get(key)
+        if col_name and col_name in selected_data.columns:
+            return _column(selected_data, col_name)
+        return None
+
+    ingredient_matrix = None
+    if all(col_map.get(key) in selected_data.columns for key in ('gg_g', 'ga_g')):
+        ingredient_matrix = np.column_stack([_column(selected_data, col_map['gg_g']),
+                                             _column(selected_data, col_map['ga_g'])])
+
+    fingerprint_matrix = target_profile = min_similarity = None
+    if fingerprint_options and fingerprint_options.get('enabled') and \
+            fingerprint_options.get('target_profile') is not None:
+        fingerprint_matrix = np.ascontiguousarray(selected_data[fingerprint_options['f_cols']].to_numpy(dtype=float))
+        target_profile = np.asarray(fingerprint_options['target_profile'], dtype=float)
+        min_similarity = fingerprint_options['min_similarity']
+
+    constraint_keys, constraint_columns, constraint_matrix, constraint_floors = _rows(
+        selected_data, col_map, constraints_dict or {})
+    target_keys, target_columns, target_matrix, target_values = _rows(selected_data, col_map, target_contents or {})
+
+    return BlendProblem(
+        batch_index=list(selected_data.index),
+        total_mix_amount=total_mix_amount,
+        inventory=inventory,
+        upper_bounds=upper_bounds,
+        ingredient_matrix=ingredient_matrix,
+        similarity_vector=optional_column('sim'),
+        cost_vector=optional_column('cost'),
+        rubric_vector=_column(selected_data, 'Rubric_Score') if 'Rubric_Score' in selected_data.columns else None,
+        fingerprint_matrix=fingerprint_matrix,
+        target_profile=target_profile,
+        min_similarity=min_similarity,
+        constraint_keys=constraint_keys,
+        constraint_columns=constraint_columns,
+        constraint_matrix=constraint_matrix,
+        constraint_floors=constraint_floors,
+        target_keys=target_keys,
+        target_columns=target_columns,
+        target_matrix=target_matrix,
+        target_values=target_values
+    )
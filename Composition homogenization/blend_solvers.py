@@ -0,0 +1,457 @@
+from dataclasses import replace
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, OptimizeResult, linprog, minimize, nnls
+
+# ##############################################################################
+# --- 单目标混批的凸规划快速通道 ---
+# 成本最优 / 规则评分最优 (非 ML) 模式的问题为:
+#     min cᵀx + a·‖Tx - t‖²   s.t.  Ax ≥ b, Σx = 1, 0 ≤ x ≤ 库存/总量, [p̂ᵀf ≥ s‖f‖, f = Fᵀx]
+# 没有目标引导项与指纹约束时是一个线性规划, 直接交给 HiGHS; 否则为凸规划:
+# 二次项的秩只有 k (k = 目标指标数), 指纹约束 cos(f, p) ≥ s (s > 0) 等价于二阶锥约束 p̂ᵀf - s‖f‖ ≥ 0,
+# 最优解只用到少数批次, 因此用列生成求解:
+# 在当前支撑集上解小规模凸规划 (SLSQP, 解析梯度, 锥约束以 h(x) = p̂ᵀf - s‖f‖ 的闭式形式给出),
+# 再以部分拉格朗日函数 L = f - μh 的梯度在全体批次上解线性规划 (Frank-Wolfe 方向) 检验最优性,
+# 对偶间隙 ∇Lᵀ(x - s) 给出全局最优性的证明, 不为零时把 s 的批次加入支撑集
+# 启用指纹约束时先做阶段一 (同样的列生成, 目标为 max h) 找到锥内严格可行点, 或证明不可行
+# 影子价格: 最优点处 ∇L 的线性规划 (即最后一次定价) 的对偶值就是原问题线性约束的 KKT 乘子
+# ##############################################################################
+
+COST_PENALTY_COEFFICIENT = 0.1  # 与 SLSQP 成本模式的目标引导系数一致
+QUALITY_PENALTY_COEFFICIENT = 0.05  # 与 SLSQP 质量模式的目标引导系数一致
+
+
+def _blend_lp_data(problem):
+    """线性规划的公共部分: A_ub·x ≤ b_ub (最低标准取负号), Σx = 1, 0 ≤ x ≤ 上界"""
+    num_batches = problem.num_batches
+    return {
+        'A_ub': -problem.constraint_matrix,
+        'b_ub': -problem.constraint_floors,
+        'A_eq': np.ones((1, num_batches)),
+        'b_eq': [1.0],
+        'bounds': np.column_stack([np.zeros(num_batches), problem.upper_bounds])
+    }
+
+
+def max_achievable_values(problem, value_matrix):
+    """
+    value_matrix 每一行 (各批次的某项指标) 在 Σx = 1, 0 ≤ x ≤ 库存上界 下可达到的最大混合值
+    分数背包: 按指标从高到低依次取满各批次的库存上界, 无需求解线性规划
+    库存总量不足 (Σ上界 < 1) 时按全部库存计算
+    """
+    value_matrix = np.atleast_2d(value_matrix)
+    order = np.argsort(-value_matrix, axis=1)
+    sorted_bounds = problem.upper_bounds[order]
+    taken_before = np.cumsum(sorted_bounds, axis=1) - sorted_bounds
+    amounts = np.clip(1.0 - taken_before, 0, sorted_bounds)
+    return np.sum(np.take_along_axis(value_matrix, order, axis=1) * amounts, axis=1)
+
+
+def check_linear_feasibility(problem):
+    """
+    阶段一可行性检查: 只看线性约束 (最低标准、Σx = 1、库存上界), 在任何非线性求解之前运行, 毫秒级
+    - 返回 dict:
+      feasible: 线性约束能否同时满足 (HiGHS 零目标线性规划)
+      inventory_sufficient: 库存总量是否够配出 total_mix_amount
+      max_achievable: 各项最低标准在库存限制下单独可达的最大混合值, 顺序同 constraint_keys
+    """
+    inventory_sufficient = bool(problem.upper_bounds.sum() >= 1.0 - 1e-12)
+    max_achievable = max_achievable_values(problem, problem.constraint_matrix) if len(problem.constraint_keys) \
+        else np.zeros(0)
+    feasible = inventory_sufficient and bool(np.all(max_achievable >= problem.constraint_floors - 1e-12))
+    if feasible:
+        lp_data = _blend_lp_data(problem)
+        feasible = linprog(np.zeros(problem.num_batches), method='highs', **lp_data).status == 0
+    return {'feasible': feasible, 'inventory_sufficient': inventory_sufficient, 'max_achievable': max_achievable}
+
+
+def _lp_duals(result):
+    """
+    HiGHS 线性规划 (_blend_lp_data 形式) 的对偶值, 统一为 "右端项增加 1 时最优目标值的变化":
+    floors: 各项最低标准 b_i (≥ 0), sum: Σx = 1 的右端项, upper: 各批次比例上界 (≤ 0)
+    """
+    return {'floors': -result.ineqlin.marginals, 'sum': float(result.eqlin.marginals[0]),
+            'upper': result.upper.marginals}
+
+
+def constraint_duals(problem, gradient):
+    """
+    给定最优点处拉格朗日函数的梯度 ∇L (无指纹约束时即目标函数梯度; 有指纹约束时已减去 μ∇h),
+    求线性约束的 KKT 乘子: 解 min ∇Lᵀs (s 在线性约束多面体内), 取其对偶值 (格式同 _lp_duals)
+    x 为精确最优解时 x 本身就是该线性规划的最优解, 线性规划的任一对偶最优解都与 x 满足互补松弛;
+    对 SLSQP 等近似解给出的是近似乘子. 线性规划失败时返回 None
+    """
+    result = linprog(gradient, method='highs', **_blend_lp_data(problem))
+    return _lp_duals(result) if result.status == 0 else None
+
+
+def _lp_result(result, problem, solver):
+    """把 HiGHS 结果整理成与 SLSQP 一致的 OptimizeResult (x 裁剪回边界内, 消除 1e-9 级的越界)"""
+    x = np.clip(result.x, 0, problem.upper_bounds) if result.x is not None else None
+    return OptimizeResult(x=x, fun=result.fun, success=result.status == 0, status=result.status,
+                          message=result.message, nit=result.nit, solver=solver, lp_result=result,
+                          duals=_lp_duals(result) if result.status == 0 else None)
+
+
+def _blend_objective(problem, objective_vector, penalty_coefficient):
+    """目标 cᵀx + a‖Tx - t‖²: 返回 make(columns) → (fun, jac), 函数的输入为 columns 上的子向量"""
+    def make(columns):
+        linear = objective_vector[columns]
+        target_matrix = problem.target_matrix[:, columns]
+        target_values = problem.target_values
+
+        def fun(x):
+            residual = target_matrix @ x - target_values
+            return linear @ x + penalty_coefficient * residual @ residual
+
+        def jac(x):
+            return linear + 2 * penalty_coefficient * (target_matrix @ x - target_values) @ target_matrix
+
+        return fun, jac
+    return make
+
+
+def _cone_function(problem, similarity):
+    """指纹锥约束 h(x) = p̂ᵀf - s‖f‖ (凹函数, h ≥ 0 ⇔ 余弦相似度 ≥ s): 返回 make(columns) → (h, jac)"""
+    target_unit = problem.target_profile / np.linalg.norm(problem.target_profile)
+
+    def make(columns):
+        fingerprint_matrix = problem.fingerprint_matrix[columns]
+
+        def fun(x):
+            mix_profile = x @ fingerprint_matrix
+            return mix_profile @ target_unit - similarity * np.linalg.norm(mix_profile)
+
+        def jac(x):
+            mix_profile = x @ fingerprint_matrix
+            norm = np.linalg.norm(mix_profile)
+            mix_unit = mix_profile / norm if norm > 0 else np.zeros_like(mix_profile)
+            return fingerprint_matrix @ (target_unit - similarity * mix_unit)
+
+        return fun, jac
+    return make
+
+
+def _negated(make):
+    """把 make(columns) → (fun, jac) 取负号, 用于阶段一的 max h"""
+    def make_negated(columns):
+        fun, jac = make(columns)
+        return (lambda x: -fun(x)), (lambda x: -jac(x))
+    return make_negated
+
+
+def blend_objective(problem, objective_vector, penalty_coefficient):
+    """全体批次上的目标 cᵀx + a‖Tx - t‖² 及其解析梯度 (fun, jac), 供主程序的 SLSQP 回退路径使用"""
+    return _blend_objective(problem, objective_vector, penalty_coefficient)(np.arange(problem.num_batches))
+
+
+def fingerprint_constraint(problem):
+    """
+    指纹余弦相似度约束 cos(f, p) - s ≥ 0 (f = Fᵀx 为混合指纹) 及其解析雅可比 (fun, jac), 供 SLSQP 回退路径使用
+    ∂cos/∂x = F·(p̂ - cos·f̂) / ‖f‖, p̂ / f̂ 为单位向量; jac 返回 (1, n) 矩阵
+    """
+    fingerprint_matrix, min_similarity = problem.fingerprint_matrix, problem.min_similarity
+    target_unit = problem.target_profile / np.linalg.norm(problem.target_profile)
+
+    def fun(x):
+        mix_profile = x @ fingerprint_matrix
+        norm = np.linalg.norm(mix_profile)
+        return (mix_profile @ target_unit / norm if norm > 0 else 0.0) - min_similarity
+
+    def jac(x):
+        mix_profile = x @ fingerprint_matrix
+        norm = np.linalg.norm(mix_profile)
+        if norm == 0:
+            return np.zeros((1, problem.num_batches))
+        mix_unit = mix_profile / norm
+        return (fingerprint_matrix @ (target_unit - (mix_unit @ target_unit) * mix_unit) / norm)[None, :]
+
+    return fun, jac
+
+
+def _restricted_solve(problem, support, x0, make_objective, make_cone):
+    """支撑集 support 上的凸规划 (其余批次比例固定为 0), 规模很小, SLSQP 配合解析梯度可解到全局最优"""
+    fun, jac = make_objective(support)
+    # 约束顺序固定为 [Σx = 1, 锥约束, 最低标准], SLSQP 的 multipliers 按等式在前、不等式依次排列
+    constraints = [LinearConstraint(np.ones(len(support)), lb=1, ub=1)]
+    if make_cone is not None:
+        cone_fun, cone_jac = make_cone(support)
+        constraints.append({'type': 'ineq', 'fun': cone_fun, 'jac': cone_jac})
+    if len(problem.constraint_floors):
+        constraints.append(LinearConstraint(problem.constraint_matrix[:, support], lb=problem.constraint_floors,
+                                            ub=np.inf))
+    return minimize(fun, x0, method='SLSQP', jac=jac,
+                    bounds=Bounds(np.zeros(len(support)), problem.upper_bounds[support]), constraints=constraints,
+                    options={'disp': False, 'ftol': 1e-10, 'maxiter': 500})
+
+
+def _cone_multiplier(problem, support, restricted, make_objective, make_cone, tolerance=1e-8):
+    """
+    限制问题中锥约束 h ≥ 0 的乘子 μ ≥ 0
+    SciPy ≥ 1.15 的 SLSQP 结果带有 multipliers; 更早的版本没有该属性, 改由 KKT 平稳条件估计:
+    在严格处于上下界之间的批次上 ∇f = μ∇h + λ·1 + A_activeᵀν, 对 (μ, λ, ν) 做最小二乘
+    """
+    multipliers = getattr(restricted, 'multipliers', None)
+    if multipliers is not None:
+        return max(float(multipliers[1]), 0.0)
+
+    x = restricted.x
+    cone_fun, cone_jac = make_cone(support)
+    if cone_fun(x) > tolerance * max(1.0, np.linalg.norm(cone_jac(x))):
+        return 0.0  # 锥约束不起作用
+    columns = [cone_jac(x), np.ones(len(support))]
+    if len(problem.constraint_floors):
+        floor_matrix = problem.constraint_matrix[:, support]
+        active = floor_matrix @ x - problem.constraint_floors <= tolerance * np.maximum(1.0, problem.constraint_floors)
+        columns.extend(floor_matrix[active])
+    free = (x > tolerance) & (x < problem.upper_bounds[support] - tolerance)
+    if np.count_nonzero(free) < len(columns):
+        return 0.0  # 自由批次不足以确定乘子, 按锥约束不起作用处理 (只影响定价方向, 不影响可行性)
+    gradient = make_objective(support)[1](x)
+    solution = np.linalg.lstsq(np.column_stack(columns)[free], gradient[free], rcond=None)[0]
+    return max(float(solution[0]), 0.0)
+
+
+def _column_generation(problem, lp_data, x, make_objective, make_cone=None, support=None, stop=None,
+                       gap_tolerance=1e-6, max_iterations=50):
+    """
+    凸规划 min f(x) s.t. 多面体 ∩ {h(x) ≥ 0} 的列生成
+    - x: 初始可行解 (全体批次上的比例); support: 初始支撑集, 缺省为 x 的非零批次
+    - 对偶间隙 ∇Lᵀx - min ∇Lᵀs 是 f(x) - f* 的上界, 相对值小于 gap_tolerance 即视为全局最优
+    - stop(value, gap): 返回 True 时提前结束 (阶段一已能判定可行性)
+    - 返回: (x, value, gap, iterations, converged, duals); 支撑集不再扩大或达到 max_iterations 而间隙仍未闭合时
+      converged 为 False, x 为已找到的最好可行解; duals 为最后一次定价线性规划的对偶值 (见 _lp_duals),
+      有锥约束时另含 cone_multiplier (锥约束 h ≥ 0 的乘子 μ)
+    """
+    all_columns = np.arange(problem.num_batches)
+    full_fun, full_jac = make_objective(all_columns)
+    full_cone_jac = make_cone(all_columns)[1] if make_cone is not None else None
+    support = np.flatnonzero(x > 1e-12) if support is None else support
+    retried = False
+    for iteration in range(1, max_iterations + 1):
+        restricted = _restricted_solve(problem, support, x[support], make_objective, make_cone)
+        multiplier = 0.0
+        if restricted.success:
+            x = np.zeros(problem.num_batches)
+            x[support] = np.clip(restricted.x, 0, problem.upper_bounds[support])
+            if make_cone is not None:
+                multiplier = _cone_multiplier(problem, support, restricted, make_objective, make_cone)
+
+        value = full_fun(x)
+        gradient = full_jac(x)
+        if multiplier:
+            gradient = gradient - multiplier * full_cone_jac(x)
+        direction = linprog(gradient, method='highs', **lp_data)
+        gap = gradient @ x - direction.fun
+        converged = gap <= gap_tolerance * max(1.0, abs(value))
+        if converged or (stop is not None and stop(value, gap)):
+            return x, value, gap, iteration, converged, {**_lp_duals(direction), 'cone_multiplier': multiplier}
+
+        new_support = np.union1d(support, np.flatnonzero(direction.x > 1e-12))
+        if len(new_support) == len(support):
+            # 支撑集不再扩大而间隙仍未闭合, 说明受限子问题未解准: 从当前解热启动重解一次, 仍不行则放弃
+            if retried:
+                break
+            retried = True
+        support = new_support
+    return x, value, gap, iteration, False, None
+
+
+def _cone_phase_one(problem, lp_data, x, make_cone, gap_tolerance=1e-6, max_iterations=50):
+    """
+    阶段一: 从多面体内的点 x 出发做 max h(x) 的列生成, 找到 h > 0 的点即停止
+    - 返回: (feasible, x, max_cone_value); feasible 为 True (找到严格可行点 x) / False (间隙证明 max h ≤
+      max_cone_value < 0) / None (未能判定)
+    """
+    x, negated_value, gap, _, converged, _ = _column_generation(
+        problem, lp_data, x, _negated(make_cone), stop=lambda value, gap: value < 0 or value - gap > 0,
+        gap_tolerance=gap_tolerance, max_iterations=max_iterations)
+    if negated_value < 0:
+        return True, x, -negated_value
+    if negated_value - gap > 0:
+        return False, x, gap - negated_value
+    return (False if converged else None), x, gap - negated_value
+
+
+def solve_convex_blend(problem, objective_vector, penalty_coefficient, gap_tolerance=1e-6, cone_margin=1e-9,
+                       max_iterations=50):
+    """
+    线性目标 (成本或负的规则评分) 加目标引导项的全局最优配方
+    - 无目标含量且未启用指纹约束时为一次 HiGHS 线性规划, 否则为列生成凸规划
+    - 指纹约束按二阶锥 p̂ᵀf ≥ (s + cone_margin)‖f‖ 求解, 最终解严格满足 cos ≥ s
+    - 返回: OptimizeResult (solver 字段注明所用求解器, duality_gap 为最优性间隙, duals 为影子价格: 见 _lp_duals,
+      启用指纹约束时另含 fingerprint, 即 min_similarity 提高 1 时最优目标值的变化); 约束不可行时 success 为 False;
+      列生成未收敛、或 min_similarity ≤ 0 (此时约束非凸) 时返回 None, 由调用方回退到 SLSQP
+    """
+    lp_data = _blend_lp_data(problem)
+    result = linprog(objective_vector, method='highs', **lp_data)
+    use_cone = problem.fingerprint_matrix is not None
+    if result.status != 0 or (len(problem.target_keys) == 0 and not use_cone):
+        return _lp_result(result, problem, 'HiGHS 线性规划')
+    if use_cone and problem.min_similarity <= 0:
+        return None
+
+    x = np.clip(result.x, 0, problem.upper_bounds)
+    support = None
+    make_objective = _blend_objective(problem, objective_vector, penalty_coefficient)
+    make_cone, solver = None, '列生成二次规划'
+    if use_cone:
+        make_cone, solver = _cone_function(problem, problem.min_similarity + cone_margin), '列生成二阶锥规划'
+        if make_cone(np.arange(problem.num_batches))[0](x) < 0:
+            feasible, feasible_x, max_cone_value = _cone_phase_one(problem, lp_data, x, make_cone, gap_tolerance,
+                                                                   max_iterations)
+            if feasible is None:
+                return None
+            if not feasible:
+                return OptimizeResult(x=feasible_x, fun=np.nan, success=False, status=2, nit=0,
+                                      message=f'指纹相似度约束不可行: 锥约束 h 的最大值 ≤ {max_cone_value:.3e}',
+                                      solver=solver)
+            # 阶段二从严格可行点出发, 支撑集并入线性规划最优解的批次
+            support = np.union1d(np.flatnonzero(feasible_x > 1e-12), np.flatnonzero(x > 1e-12))
+            x = feasible_x
+
+    x, value, gap, iterations, converged, duals = _column_generation(
+        problem, lp_data, x, make_objective, make_cone, support=support, gap_tolerance=gap_tolerance,
+        max_iterations=max_iterations)
+    if not converged:
+        return None
+    if use_cone:
+        # h = p̂ᵀf - s‖f‖, 拉格朗日函数 L = f - μh 对 s 的偏导为 μ‖f‖
+        duals['fingerprint'] = duals.pop('cone_multiplier') * np.linalg.norm(x @ problem.fingerprint_matrix)
+    else:
+        duals.pop('cone_multiplier')
+    return OptimizeResult(x=x, fun=value, success=True, status=0, message=f'列生成收敛, 对偶间隙 {gap:.2e}',
+                          nit=iterations, solver=solver, duality_gap=gap, duals=duals)
+
+
+def solve_elastic_blend(problem, objective_vector=None, penalty_coefficient=0.0, weights=None):
+    """
+    弹性模式: 最低标准无法同时满足时, 给每项最低标准加松弛变量 σ ≥ 0, 求总缺口最小的混合方案
+        min Σ w_i σ_i   s.t.  Ax + σ ≥ b, Σx = 1, 0 ≤ x ≤ 库存/总量
+    - weights: 各项缺口的权重, 缺省为 1/|b_i| (按相对缺口计), 各指标量纲不同也可直接相加
+    - 给出 objective_vector 时按字典序再优化一次: 各项指标不低于第一步达到的值, 求 cᵀx + a‖Tx - t‖²
+      最小的方案 (即 solve_convex_blend, 启用指纹约束时同样按二阶锥处理)
+    - 指纹相似度不设松弛变量: 放宽后的含量标准下指纹约束仍不可行时, 取该条件下相似度最高的方案并报告其缺口
+    - 返回: OptimizeResult, 另含 shortfall (各项最低标准的缺口, 顺序同 constraint_keys)、total_shortfall
+      (加权总缺口)、fingerprint_similarity / fingerprint_shortfall (未启用指纹约束时为 None);
+      库存总量不足以配出总量时 success 为 False
+    """
+    num_batches, num_floors = problem.num_batches, len(problem.constraint_keys)
+    floors = problem.constraint_floors
+    if weights is None:
+        weights = 1.0 / np.maximum(np.abs(floors), 1e-12)
+    lp_data = _blend_lp_data(problem)
+    result = linprog(np.r_[np.zeros(num_batches), weights],
+                     A_ub=np.hstack([lp_data['A_ub'], -np.eye(num_floors)]), b_ub=lp_data['b_ub'],
+                     A_eq=np.hstack([lp_data['A_eq'], np.zeros((1, num_floors))]), b_eq=lp_data['b_eq'],
+                     bounds=np.vstack([lp_data['bounds'], np.column_stack([np.zeros(num_floors),
+                                                                            np.full(num_floors, np.inf)])]),
+                     method='highs')
+    if result.status != 0:
+        return OptimizeResult(x=None, fun=np.nan, success=False, status=result.status, nit=result.nit,
+                              message=f'弹性模式无解 (库存总量不足以配出总量): {result.message}',
+                              solver='弹性线性规划')
+
+    x = np.clip(result.x[:num_batches], 0, problem.upper_bounds)
+    solver = '弹性线性规划'
+    if objective_vector is not None:
+        # 放宽后的标准取 min(b, Ax*), 第一步的解仍可行, 第二步不会增大任何一项缺口
+        relaxed = replace(problem, constraint_floors=np.minimum(floors, problem.constraint_values(x)))
+        refined = solve_convex_blend(relaxed, objective_vector, penalty_coefficient)
+        if refined is not None and refined.success:
+            x, solver = refined.x, f'{solver} + {refined.solver}'
+        elif refined is not None and problem.fingerprint_matrix is not None:
+            best_x = max_fingerprint_similarity(relaxed)[1]
+            if best_x is not None:
+                x, solver = best_x, f'{solver} + 最大指纹相似度'
+
+    fingerprint_similarity = fingerprint_shortfall = None
+    if problem.fingerprint_matrix is not None:
+        mix_profile = x @ problem.fingerprint_matrix
+        norm = np.linalg.norm(mix_profile) * np.linalg.norm(problem.target_profile)
+        fingerprint_similarity = float(mix_profile @ problem.target_profile / norm) if norm > 0 else 0.0
+        fingerprint_shortfall = max(problem.min_similarity - fingerprint_similarity, 0.0)
+
+    shortfall = floors - problem.constraint_values(x)
+    shortfall[shortfall <= 1e-9 * np.maximum(np.abs(floors), 1.0)] = 0.0  # 舍去数值误差级的缺口
+    fun = _blend_objective(problem, objective_vector, penalty_coefficient)(np.arange(num_batches))[0](x) \
+        if objective_vector is not None else float(weights @ shortfall)
+    return OptimizeResult(x=x, fun=fun, success=True, status=0, nit=result.nit,
+                          message=f'弹性模式: 加权总缺口 {weights @ shortfall:.4g}', solver=solver,
+                          shortfall=shortfall, total_shortfall=float(weights @ shortfall),
+                          fingerprint_similarity=fingerprint_similarity, fingerprint_shortfall=fingerprint_shortfall)
+
+
+def _similarity_lp(problem):
+    """
+    Charnes-Cooper 变换后的支撑线性规划: 变量 (y, τ), x = y/τ, 约束 Σy = τ, p̂ᵀFᵀy = 1, 0 ≤ y ≤ τ·上界, Ay ≥ τ·b
+    在此变换下混合指纹 g = Fᵀy 满足 p̂ᵀg = 1, 余弦相似度 = 1/‖g‖
+    - 返回: support(d) → (g, y, τ), 即 g = Fᵀy 在可行域上使 dᵀg 最小的点; 可行域为空时返回 None
+    """
+    num_batches = problem.num_batches
+    fingerprint_matrix = problem.fingerprint_matrix
+    target_unit = problem.target_profile / np.linalg.norm(problem.target_profile)
+    a_ub = sparse.vstack([
+        sparse.hstack([sparse.identity(num_batches), -problem.upper_bounds[:, None]]),
+        sparse.hstack([sparse.csr_matrix(-problem.constraint_matrix), problem.constraint_floors[:, None]])
+    ]).tocsr()
+    a_eq = np.vstack([np.r_[np.ones(num_batches), -1.0], np.r_[fingerprint_matrix @ target_unit, 0.0]])
+
+    def support(direction):
+        result = linprog(np.r_[fingerprint_matrix @ direction, 0.0], A_ub=a_ub, b_ub=np.zeros(a_ub.shape[0]),
+                         A_eq=a_eq, b_eq=[0.0, 1.0], bounds=(0, None), method='highs')
+        if result.status != 0 or result.x[-1] <= 0:
+            return None
+        y = result.x[:-1]
+        return y @ fingerprint_matrix, y, result.x[-1]
+    return support
+
+
+def min_norm_weights(points):
+    """
+    凸包 conv(points) 中范数最小点的重心坐标: 把 Σλ = 1 作为大权重的附加行交给 NNLS
+    (罚项只改变 λ 的总和, 不改变其方向, 归一化后即为精确解); 最小范数点迭代 (本模块与 exact_pareto) 共用
+    """
+    weight = 1e4 * max(1.0, np.abs(points).max())
+    system = np.vstack([points.T, np.full((1, len(points)), weight)])
+    weights = nnls(system, np.r_[np.zeros(points.shape[1]), weight])[0]
+    return weights / weights.sum()
+
+
+def max_fingerprint_similarity(problem, tolerance=1e-6, max_iterations=200, threshold=None):
+    """
+    线性约束 (最低标准、Σx = 1、库存上界) 下混合指纹与目标指纹可达到的最大余弦相似度 (忽略 min_similarity)
+    Charnes-Cooper 变换后问题化为 min ‖g‖ (g 在一个多面体中, 维数 = 指纹峰数), 用最小范数点迭代 (Wolfe/GJK)
+    求解, 每步一次 HiGHS 线性规划; 当前点给出下界 1/‖g‖, 支撑点给出上界 ‖g‖/(gᵀs)
+    - threshold: 只需判断最大值是否达到 threshold 时, 上下界一旦分出结果即提前停止
+    - 返回: (最大相似度, 对应的混合比例); 线性约束不可行时返回 (nan, None)
+    """
+    support = _similarity_lp(problem)
+    first = support(problem.target_profile)
+    if first is None:
+        return np.nan, None
+
+    points, scaled_blends = [first[0]], [first[1:]]
+    weights = np.ones(1)
+    for _ in range(max_iterations):
+        weights = min_norm_weights(np.array(points))
+        closest = weights @ np.array(points)
+        candidate = support(closest)
+        if candidate is None or closest @ closest - closest @ candidate[0] <= tolerance * (closest @ closest):
+            break
+        if threshold is not None and (1.0 / np.linalg.norm(closest) >= threshold or
+                                      np.linalg.norm(closest) / (closest @ candidate[0]) < threshold):
+            break
+        kept = np.flatnonzero(weights > 1e-12)
+        points = [points[i] for i in kept] + [candidate[0]]
+        scaled_blends = [scaled_blends[i] for i in kept] + [candidate[1:]]
+
+    # 达到 max_iterations 时 points 已加入新的支撑点, 重心坐标须对最终的点集重新计算
+    weights = min_norm_weights(np.array(points))
+    closest = weights @ np.array(points)
+    # (y, τ) 的凸组合仍满足变换后的约束, 对应的混合比例为 Σλy / Στλ
+    blend = sum(weight * y for weight, (y, _) in zip(weights, scaled_blends))
+    blend = np.clip(blend / sum(weight * scale for weight, (_, scale) in zip(weights, scaled_blends)), 0,
+                    problem.upper_bounds)
+    return float(1.0 / np.linalg.norm(closest)), blend
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from blend_problem import BlendProblem
+
+
+def random_problem(num_batches=60, seed=0, floors=(5.0, 19.0, 0.88), targets=None, min_similarity=None,
+                   total_mix_amount=1000.0, inventory_range=(20.0, 200.0)):
+    """
+    随机混批问题: 三项最低标准 (两种含量与相似度), 可选两项目标含量 targets 与 10 峰指纹约束 min_similarity;
+    另返回成本向量 (含量越高越贵, 使成本与最低标准互相制约)
+    """
+    rng = np.random.default_rng(seed)
+    constraint_matrix = np.vstack([rng.uniform(2, 7, num_batches), rng.uniform(10, 25, num_batches),
+                                   rng.uniform(0.7, 1, num_batches)])
+    fingerprint_matrix = rng.gamma(2, 1, (num_batches, 10))
+    target_profile = fingerprint_matrix.mean(axis=0) * rng.uniform(0.5, 1.5, 10)
+    inventory = rng.uniform(*inventory_range, num_batches)
+    cost = rng.uniform(0.1, 1, num_batches) + 0.03 * constraint_matrix[1]
+    num_targets = 0 if targets is None else len(targets)
+    problem = BlendProblem(
+        batch_index=list(range(num_batches)),
+        total_mix_amount=total_mix_amount,
+        inventory=inventory,
+        upper_bounds=np.minimum(1.0, inventory / total_mix_amount),
+        rubric_vector=rng.uniform(3, 9, num_batches),
+        cost_vector=cost,
+        fingerprint_matrix=fingerprint_matrix if min_similarity is not None else None,
+        target_profile=target_profile if min_similarity is not None else None,
+        min_similarity=min_similarity,
+        constraint_keys=['gg_g', 'ga_g', 'sim'],
+        constraint_columns=['甘草苷', '甘草酸', '相似度'],
+        constraint_matrix=constraint_matrix,
+        constraint_floors=np.array(floors, dtype=float),
+        target_keys=['gg_g', 'ga_g'][:num_targets],
+        target_columns=['甘草苷', '甘草酸'][:num_targets],
+        target_matrix=constraint_matrix[:num_targets],
+        target_values=np.zeros(0) if targets is None else np.array(targets, dtype=float)
+    )
+    return problem, cost
+
+
+def cosine(problem, x):
+    blend = x @ problem.fingerprint_matrix
+    return blend @ problem.target_profile / np.linalg.norm(blend) / np.linalg.norm(problem.target_profile)
+
+
+def assert_feasible(problem, x, tolerance=1e-9):
+    """x 满足 Σx = 1、库存上界、最低标准及 (启用时) 指纹相似度"""
+    assert abs(x.sum() - 1.0) <= tolerance
+    assert np.all(x >= -tolerance) and np.all(x <= problem.upper_bounds + tolerance)
+    assert np.all(problem.constraint_values(x) >= problem.constraint_floors - tolerance)
+    if problem.fingerprint_matrix is not None:
+        assert cosine(problem, x) >= problem.min_similarity - tolerance
+
+
+@pytest.fixture
+def make_problem():
+    return random_problem
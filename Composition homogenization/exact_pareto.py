@@ -0,0 +1,149 @@
+import time
+from itertools import repeat
+
+import numpy as np
+from scipy.optimize import linprog
+
+from blend_solvers import min_norm_weights
+from nsga2_core import (CONTENT_WEIGHTS, MIN_CONTENTS, fast_non_dominated_sort, hypervolume_2d,
+                        hypervolume_reference_point, objective_values, process_pool)
+
+# ##############################################################################
+# --- 精确帕累托前沿 (ε-约束法) ---
+# 不限制批次数时, 两个目标 (VIP 加权含量偏离度、混合相似度) 在混合比例 x 上都是凸的,
+# 帕累托前沿可以由一组 ε-约束凸二次规划逐点精确求出:
+#     min Σ w_j (m_jᵀx - t_j)²   s.t.  sᵀx ≥ ε, Σx = 1, 0 ≤ x ≤ 库存/总量, Mᵀx ≥ 最低含量
+# 目标只依赖二维的混合含量 y = Mᵀx, 因此每个二次规划等价于: 在可行含量多边形 Y_ε 中求离目标含量
+# (加权范数下) 最近的点. 用最小范数点迭代 (GJK) 求解, 每步只需一次线性规划 (HiGHS),
+# 对上千个候选批次也只需数十毫秒, 最优解为若干线性规划顶点的凸组合, 严格满足全部约束.
+# ##############################################################################
+
+
+def _support_blend(direction, problem, min_similarity):
+    """线性规划: 在可行域 (相似度 ≥ min_similarity, None 表示不限制) 中使 directionᵀ·z(x) 最小的混合比例"""
+    ingredient_matrix, similarity_vector = problem['ingredient_matrix'], problem['similarity_vector']
+    a_ub, b_ub = -ingredient_matrix.T, -problem['min_contents']
+    if min_similarity is not None:
+        a_ub = np.vstack([a_ub, -similarity_vector])
+        b_ub = np.r_[b_ub, -min_similarity]
+
+    result = linprog(ingredient_matrix @ (np.sqrt(CONTENT_WEIGHTS) * direction), A_ub=a_ub, b_ub=b_ub,
+                     A_eq=np.ones((1, len(similarity_vector))), b_eq=[1.0],
+                     bounds=np.column_stack([np.zeros(len(similarity_vector)), problem['upper_bounds']]),
+                     method='highs')
+    return result.x if result.status == 0 else None
+
+
+def closest_blend(problem, min_similarity=None, tolerance=1e-10, max_iterations=100):
+    """
+    在相似度 ≥ min_similarity 的可行域中求加权含量偏离度最小的混合比例 (即该 ε 点的精确最优解)
+    z(x) = √w ⊙ (Mᵀx - t) 把加权范数化为欧氏范数, 最小范数点迭代每步向当前最近点的反方向取一个支撑顶点
+    - 返回: 混合比例; 可行域为空时返回 None
+    """
+    sqrt_weights = np.sqrt(CONTENT_WEIGHTS)
+
+    def to_z(x):
+        return sqrt_weights * (x @ problem['ingredient_matrix'] - problem['target_values'])
+
+    first = _support_blend(np.ones(2), problem, min_similarity)
+    if first is None:
+        return None
+    blends, weights = [first], np.ones(1)
+
+    for _ in range(max_iterations):
+        points = np.array([to_z(x) for x in blends])
+        weights = min_norm_weights(points)
+        closest = weights @ points
+        gap_scale = closest @ closest
+        if gap_scale <= tolerance ** 2:
+            break  # 目标含量本身可以达到
+
+        candidate = _support_blend(closest, problem, min_similarity)
+        if candidate is None or gap_scale - closest @ to_z(candidate) <= tolerance * max(gap_scale, 1.0):
+            break
+
+        kept = weights > 0
+        blends = [x for x, keep in zip(blends, kept) if keep] + [candidate]
+        weights = np.r_[weights[kept], 0.0]
+
+    return np.clip(np.asarray(weights) @ np.array(blends), 0, problem['upper_bounds'])
+
+
+def max_similarity_blend(problem, ingredient_target=None, tolerance=1e-9):
+    """
+    线性规划: 满足全部约束时相似度最高的混合比例; 约束不可行时返回 None
+    给出 ingredient_target 时另要求混合含量 (在 tolerance 的相对误差内) 等于该值,
+    用于在偏离度最小的方案中挑选相似度最高者 (加权偏离度对 y 严格凸, 所有最优解的 y 相同)
+    """
+    ingredient_matrix, similarity_vector = problem['ingredient_matrix'], problem['similarity_vector']
+    a_ub, b_ub = -ingredient_matrix.T, -problem['min_contents']
+    if ingredient_target is not None:
+        slack = tolerance * (np.abs(ingredient_target) + 1.0)
+        a_ub = np.vstack([a_ub, ingredient_matrix.T, -ingredient_matrix.T])
+        b_ub = np.r_[b_ub, ingredient_target + slack, -(ingredient_target - slack)]
+
+    result = linprog(-similarity_vector, A_ub=a_ub, b_ub=b_ub, A_eq=np.ones((1, len(similarity_vector))),
+                     b_eq=[1.0], bounds=np.column_stack([np.zeros(len(similarity_vector)), problem['upper_bounds']]),
+                     method='highs')
+    return result.x if result.status == 0 else None
+
+
+def _solve_epsilon_point(epsilon, problem):
+    """进程池任务: 求解单个 ε 点"""
+    return closest_blend(problem, epsilon)
+
+
+def exact_pareto_front(ingredient_matrix, similarity_vector, inventory, params, num_points=20, max_workers=None):
+    """
+    ε-约束法求精确帕累托前沿 (不限制批次数)
+    - 两个端点: 偏离度最小 (其中相似度最高) 的方案与相似度最高的方案
+    - 在两端点的相似度之间均匀取 num_points 个 ε, 各 ε 点在进程池中并行求解
+    - params: 需包含 target_values / total_mix_amount
+    - 返回: (solutions, values, run_info), 格式与 NSGA-II 结果一致
+      values 为 [加权偏离度, -相似度], 约束不可行时 solutions 为空列表
+    """
+    start_time = time.perf_counter()
+    problem = {
+        'ingredient_matrix': np.asarray(ingredient_matrix, dtype=float),
+        'similarity_vector': np.asarray(similarity_vector, dtype=float),
+        'upper_bounds': np.minimum(1.0, np.asarray(inventory, dtype=float) / params['total_mix_amount']),
+        'target_values': np.asarray(params['target_values'], dtype=float),
+        'min_contents': MIN_CONTENTS
+    }
+    ingredient_matrix, similarity_vector = problem['ingredient_matrix'], problem['similarity_vector']
+    run_info = {'engine': 'epsilon_constraint', 'num_points': num_points, 'epsilon_values': [],
+                'failed_points': 0, 'hypervolume': 0.0, 'elapsed': 0.0}
+
+    peak = max_similarity_blend(problem)
+    anchor = closest_blend(problem) if peak is not None else None
+    if anchor is None:
+        run_info['elapsed'] = time.perf_counter() - start_time
+        return [], [], run_info
+    # 偏离度最小的方案可能不唯一, 取其中相似度最高者作为前沿左端点
+    lexicographic = max_similarity_blend(problem, anchor @ ingredient_matrix)
+    if lexicographic is not None:
+        anchor = lexicographic
+
+    epsilon_values = np.linspace(anchor @ similarity_vector, peak @ similarity_vector, num_points + 2)[1:-1]
+    with process_pool(max_workers) as executor:
+        points = list(executor.map(_solve_epsilon_point, epsilon_values, repeat(problem)))
+
+    solutions = np.array([anchor] + [x for x in points if x is not None] + [peak])
+    solutions /= solutions.sum(axis=1, keepdims=True)
+    values = objective_values(solutions @ ingredient_matrix, solutions @ similarity_vector, problem['target_values'])
+
+    # 去除重复点与数值误差造成的被支配点, 按偏离度升序排列
+    _, unique_indices = np.unique(values.round(10), axis=0, return_index=True)
+    solutions, values = solutions[unique_indices], values[unique_indices]
+    first_front = np.array(fast_non_dominated_sort(values)[0])
+    first_front = first_front[np.argsort(values[first_front, 0])]
+    solutions, values = solutions[first_front], values[first_front]
+
+    reference_point = hypervolume_reference_point(ingredient_matrix, similarity_vector, problem['target_values'])
+    run_info.update({
+        'epsilon_values': epsilon_values.tolist(),
+        'failed_points': sum(x is None for x in points),
+        'hypervolume': hypervolume_2d(values, reference_point),
+        'elapsed': time.perf_counter() - start_time
+    })
+    return list(solutions), values, run_info
@@ -1429,12 +1429,20 @@ def create_charts_with_english_labels(df, col_map, drug_type):
 import streamlit as st
 import pandas as pd
 import numpy as np
-from scipy.optimize import minimize, Bounds, LinearConstraint
+from scipy.optimize import minimize, Bounds, LinearConstraint, OptimizeResult
 from sklearn.metrics.pairwise import cosine_similarity
 from lightgbm import LGBMRegressor
 import matplotlib.pyplot as plt
-import random
 import datetime
+from nsga2_core import fast_non_dominated_sort, run_nsga2, start_background_run, drain_progress, CHECKPOINT_DIR
+from exact_pareto import exact_pareto_front
+from blend_problem import build_blend_problem
+from blend_diagnosis import INVENTORY_LABEL, diagnose_infeasibility
+from blend_integer import solve_cardinality_blend, solve_dispensing_blend
+from blend_local_search import solve_local_search_blend
+from blend_solvers import (COST_PENALTY_COEFFICIENT, QUALITY_PENALTY_COEFFICIENT, blend_objective,
+                           check_linear_feasibility, constraint_duals, fingerprint_constraint, solve_convex_blend,
+                           solve_elastic_blend)
 # 在现有导入的基础上添加以下库
 import seaborn as sns
 import plotly.express as px
@@ -2481,7 +2489,9 @@ def export_excel_report():
                     # 检查是否是NSGA-II结果
                     if isinstance(result_obj.get('x'), np.ndarray):
                         proportions = result_obj.get('x', [])
-                        weights = proportions * total_mix_amount
+                        # 称量网格方案导出精确的称量克数
+                        weights = result_obj['dispense_grams'] if 'dispense_grams' in result_obj \
+                            else proportions * total_mix_amount
 
                         # 构建结果DataFrame
                         recipe_df = pd.DataFrame({
@@ -2499,6 +2509,15 @@ def export_excel_report():
                         # 写入Excel
                         final_recipe_df.to_excel(writer, sheet_name='Optimization_Result_Recipe', index=False)
 
+                        # 影子价格 (单目标优化结果才有)
+                        problem = st.session_state.optimization_result.get('problem')
+                        if problem is not None:
+                            sensitivity_df = build_sensitivity_table(result_obj, problem, total_mix_amount,
+                                                                     st.session_state.get('current_mode'),
+                                                                     st.session_state.get('drug_type'))
+                            if sensitivity_df is not None:
+                                sensitivity_df.to_excel(writer, sheet_name='Shadow_Prices', index=False)
+
             # Sheet 3: Statistical Analysis
             if 'df_processed' in st.session_state:
                 stats_df = st.session_state.df_processed.describe()
@@ -2516,15 +2535,15 @@ def export_excel_report():
 
 
 def update_nsga2_progress_with_visualization(generation, population, values, progress_placeholder, metrics_placeholder,
-                                             chart_placeholder):
-    """更新NSGA-II优化进度可视化 - 增强版"""
+                                             chart_placeholder, hypervolume=None):
+    """更新NSGA-II优化进度可视化 - 增强版 (hypervolume 为当前精英存档的超体积)"""
     with progress_placeholder.container():
         # 进度条
         progress_percent = (generation / st.session_state.nsga_params['num_generations']) * 100
         st.progress(progress_percent / 100)
 
         # 详细指标
-        col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3, col4, col5 = st.columns(5)
 
         with col1:
             st.metric("当前代数", f"{generation}/{st.session_state.nsga_params['num_generations']}")
@@ -2542,6 +2561,10 @@ def update_nsga2_progress_with_visualization(generation, population, values, pro
         with col4:
             st.metric("收敛进度", f"{progress_percent:.1f}%")
 
+        with col5:
+            if hypervolume is not None:
+                st.metric("超体积 (HV)", f"{hypervolume:.4f}")
+
     # 实时更新帕累托前沿图
     if len(values) > 10 and generation % 50 == 0:  # 每50代更新一次图表
         with chart_placeholder.container():
@@ -2723,103 +2746,8 @@ st.markdown("<br>", unsafe_allow_html=True)
 # --- NSGA-II 多目标优化模块 (从 NSGA-IIv2.py 移植并改造) ---
 # ##############################################################################
 
-# --- 目标函数 (NSGA-II) ---
-def nsga2_evaluate(raw_proportions, df, col_map, target_ingredients, inventory, total_mix_amount,
-                   num_batches_to_select):
-    """
-    NSGA-II 的目标评估函数
-    - 目标1: 最小化加权含量偏离度 (越小越好)
-    - 目标2: 最大化相似度 (即最小化负相似度, 越小越好)
-    """
-    final_proportions = np.zeros_like(raw_proportions)
-
-    # --- 约束1: 只选择指定数量的批次 ---
-    if num_batches_to_select > 0 and num_batches_to_select < len(raw_proportions):
-        top_k_indices = np.argsort(raw_proportions)[-num_batches_to_select:]
-        final_proportions[top_k_indices] = raw_proportions[top_k_indices]
-    else:
-        final_proportions = raw_proportions
-
-    sum_props = np.sum(final_proportions)
-    if sum_props > 0:
-        final_proportions /= sum_props  # 归一化
-    else:
-        return np.array([1e9, 1e9])  # 返回一个极差的惩罚值
-
-    # --- 约束2: 库存约束 ---
-    required_amounts = final_proportions * total_mix_amount
-    if np.any(required_amounts > inventory):
-        return np.array([1e9, 1e9])  # 超出库存，返回惩罚值
-
-    # --- 约束3: 最低含量硬约束 (来自原app.py的逻辑) ---
-    ingredient_columns = [col_map['gg_g'], col_map['ga_g']]
-    blended_ingredients = np.dot(final_proportions, df[ingredient_columns].values)
-    if blended_ingredients[0] < 4.5 or blended_ingredients[1] < 18:
-        return np.array([1e9, 1e9])  # 不满足最低标准，返回惩罚值
-
-    # --- 计算目标值 ---
-    # 目标1: 加权含量偏离度
-    # 使用 VIP 分数作为权重
-    vip_gancaogan = 1.01558
-    vip_gancaosuan = 1.05139
-    total_vip = vip_gancaogan + vip_gancaosuan
-    content_weights = np.array([vip_gancaogan / total_vip, vip_gancaosuan / total_vip])
-    weighted_deviation = np.sqrt(np.sum(content_weights * ((blended_ingredients - target_ingredients) ** 2)))
-
-    # 目标2: 相似度
-    similarity_column = col_map['sim']
-    blended_similarity = np.dot(final_proportions, df[similarity_column].values)
-
-    return np.array([weighted_deviation, -blended_similarity])
-
-
-# --- NSGA-II 核心算法函数 (保持不变) ---
-def fast_non_dominated_sort(values):
-    population_size = len(values)
-    fronts = []
-    S = [[] for _ in range(population_size)]
-    n = [0] * population_size
-    rank = [0] * population_size
-    for p in range(population_size):
-        for q in range(population_size):
-            if p == q: continue
-            if all(values[p] <= values[q]) and any(values[p] < values[q]):
-                S[p].append(q)
-            elif all(values[q] <= values[p]) and any(values[q] < values[p]):
-                n[p] += 1
-    front_0 = [p for p in range(population_size) if n[p] == 0]
-    fronts.append(front_0)
-    i = 0
-    while fronts[i]:
-        next_front = []
-        for p in fronts[i]:
-            for q in S[p]:
-                n[q] -= 1
-                if n[q] == 0:
-                    next_front.append(q)
-        i += 1
-        fronts.append(next_front)
-    return fronts[:-1]
-
-
-def crowding_distance(values, front):
-    if not front: return {}
-    num_objectives = values.shape[1]
-    num_individuals = len(front)
-    distances = {i: 0 for i in front}
-    for m in range(num_objectives):
-        sorted_front = sorted(front, key=lambda i: values[i, m])
-        distances[sorted_front[0]] = float('inf')
-        distances[sorted_front[-1]] = float('inf')
-        if num_individuals > 2:
-            min_val = values[sorted_front[0], m]
-            max_val = values[sorted_front[-1], m]
-            range_val = max_val - min_val
-            if range_val == 0: continue
-            for i in range(1, num_individuals - 1):
-                distances[sorted_front[i]] += (values[sorted_front[i + 1], m] - values[
-                    sorted_front[i - 1], m]) / range_val
-    return distances
+# --- NSGA-II 核心算法函数 ---
+# 目标评估、非支配排序、拥挤距离、交叉与变异已迁移至 nsga2_core (向量化实现)
 
 
 def create_chinese_figure(nrows=1, ncols=1, figsize=None, title=None):
@@ -2858,43 +2786,6 @@ def set_chinese_labels(ax, title="", xlabel="", ylabel="", legend_labels=None):
     return ax
 
 
-def selection(population, values, population_size):
-    fronts = fast_non_dominated_sort(values)
-    new_population = []
-    front_idx = 0
-    # ############### BUG FIX ###############
-    # 增加了 front_idx < len(fronts) 的边界检查，防止索引越界
-    while front_idx < len(fronts) and len(new_population) + len(fronts[front_idx]) <= population_size:
-        new_population.extend([population[i] for i in fronts[front_idx]])
-        front_idx += 1
-    # #####################################
-    if len(new_population) < population_size:
-        last_front = fronts[front_idx]
-        distances = crowding_distance(values, last_front)
-        sorted_last_front = sorted(last_front, key=lambda i: distances[i], reverse=True)
-        remaining_count = population_size - len(new_population)
-        new_population.extend([population[i] for i in sorted_last_front[:remaining_count]])
-    return new_population
-
-
-def crossover(parent1, parent2, prob):
-    child1, child2 = parent1.copy(), parent2.copy()
-    if random.random() < prob:
-        alpha = random.random()
-        child1 = alpha * parent1 + (1 - alpha) * parent2
-        child2 = (1 - alpha) * parent1 + alpha * parent2
-    return child1, child2
-
-
-def mutate(individual, prob, strength):
-    mutated_individual = individual.copy()
-    for i in range(len(mutated_individual)):
-        if random.random() < prob:
-            mutated_individual[i] += np.random.normal(0, strength)
-            mutated_individual[i] = max(0, mutated_individual[i])  # 保证比例非负
-    return mutated_individual
-
-
 def create_batch_quality_dashboard_chinese(df, col_map, drug_type):
     """
     创建批次质量仪表板 - 中文大字体版本 (已修复字体问题)
@@ -3730,17 +3621,22 @@ def show_data_analysis_dashboard():
 
 
 # --- NSGA-II 主执行函数 ---
-def run_nsga2_optimization(selected_data, col_map, nsga_params):
+def prepare_nsga2_inputs(selected_data, col_map, nsga_params):
     """
-    执行 NSGA-II 优化 - 增加实时进度显示
+    由 BlendProblem 取出评估所需的数值矩阵, 避免每次评估重复进行 pandas 索引
+    返回: (ingredient_matrix, similarity_vector, inventory)
     """
-    num_individuals = len(selected_data)
-    inventory = selected_data['库存量 (克)'].fillna(nsga_params['total_mix_amount'] * num_individuals * 10).values
+    problem = build_blend_problem(selected_data, col_map, nsga_params['total_mix_amount'])
+    return problem.ingredient_matrix, problem.similarity_vector, problem.inventory
 
-    # 初始化种群
-    population = [np.random.dirichlet(np.ones(num_individuals), size=1).flatten() for _ in
-                  range(nsga_params['population_size'])]
 
+def run_nsga2_optimization(selected_data, col_map, nsga_params):
+    """
+    执行 NSGA-II 优化 - 增加实时进度显示 (同步执行, 计算期间页面阻塞)
+    算法本身见 nsga2_core.run_nsga2: (μ+λ) 精英策略 + 精英存档, 超体积收敛判定,
+    可选多进程岛屿模型与断点续算
+    返回: (pareto_solutions, pareto_values, run_info)
+    """
     # 创建进度显示容器
     progress_placeholder = st.empty()
     metrics_placeholder = st.empty()
@@ -3748,51 +3644,42 @@ def run_nsga2_optimization(selected_data, col_map, nsga_params):
 
     st.markdown("### 🔄 优化过程实时监控")
 
-    # 迭代
-    for gen in range(nsga_params['num_generations']):
-        # 评估
-        obj_values = np.array([nsga2_evaluate(ind, selected_data, col_map, nsga_params['target_values'], inventory,
-                                              nsga_params['total_mix_amount'], nsga_params['num_batches_to_select']) for
-                               ind in population])
-
-        # 精英选择
-        population = selection(population, obj_values, nsga_params['population_size'])
+    def report_progress(generation, archive_values, hypervolume):
+        # 每10代更新一次显示; 岛屿模型每个迁移周期才回调一次, 每次都显示
+        if generation % 10 and not nsga_params.get('island_model'):
+            return
+        values = archive_values if archive_values is not None else np.empty((0, 2))
+        update_nsga2_progress_with_visualization(generation, None, values, progress_placeholder,
+                                                 metrics_placeholder, chart_placeholder, hypervolume)
 
-        # 更新实时显示
-        if gen % 10 == 0:  # 每10代更新一次显示
-            update_nsga2_progress_with_visualization(gen + 1, population, obj_values,
-                                                     progress_placeholder, metrics_placeholder, chart_placeholder)
+    archive_solutions, archive_values, run_info = run_nsga2(*prepare_nsga2_inputs(selected_data, col_map, nsga_params),
+                                                            nsga_params, report_progress)
 
-        # 生成后代
-        offspring = []
-        while len(offspring) < nsga_params['population_size']:
-            p1, p2 = random.sample(population, 2)
-            c1, c2 = crossover(p1, p2, nsga_params['crossover_prob'])
-            offspring.append(mutate(c1, nsga_params['mutation_prob'], nsga_params['mutation_strength']))
-            if len(offspring) < nsga_params['population_size']:
-                offspring.append(mutate(c2, nsga_params['mutation_prob'], nsga_params['mutation_strength']))
+    if run_info.get('resumed_from'):
+        st.info(f"♻️ 检测到相同数据和参数的未完成计算，已从第 {run_info['resumed_from']} 代的检查点继续")
 
-        population = offspring
-
-    # 最终更新
-    final_objective_values = np.array([nsga2_evaluate(ind, selected_data, col_map, nsga_params['target_values'],
-                                                      inventory, nsga_params['total_mix_amount'],
-                                                      nsga_params['num_batches_to_select']) for ind in population])
+    if run_info['stopped_early']:
+        progress_placeholder.success(f"✅ 超体积已收敛，于第 {run_info['generations_run']} 代提前结束！正在处理结果...")
+    else:
+        progress_placeholder.success("✅ 优化完成！正在处理结果...")
 
-    progress_placeholder.success("✅ 优化完成！正在处理结果...")
+    pareto_solutions, pareto_values = finalize_nsga2_result(archive_solutions, archive_values, nsga_params)
+    return pareto_solutions, pareto_values, run_info
 
-    # 获取最终的帕累托前沿
-    final_fronts = fast_non_dominated_sort(final_objective_values)
 
-    if not final_fronts:
+def finalize_nsga2_result(archive_solutions, archive_values, nsga_params):
+    """
+    由精英存档整理最终的帕累托前沿 (即整个运行过程中找到的所有可行非支配解)
+    返回: (pareto_solutions, pareto_values), 没有可行解时为 ([], [])
+    """
+    if archive_solutions is None:
         return [], []
 
-    pareto_front_indices = final_fronts[0]
-    pareto_solutions = [population[i] for i in pareto_front_indices]
-    pareto_values = final_objective_values[pareto_front_indices]
+    pareto_solutions = list(archive_solutions)
+    pareto_values = archive_values
 
     # 移除极端解
-    if nsga_params['remove_extremes'] and len(pareto_front_indices) > 5:
+    if nsga_params['remove_extremes'] and len(pareto_values) > 5:
         idx_min_dev = np.argmin(pareto_values[:, 0])
         idx_max_sim = np.argmin(pareto_values[:, 1])
         extreme_indices = {idx_min_dev, idx_max_sim}
@@ -3806,11 +3693,127 @@ def run_nsga2_optimization(selected_data, col_map, nsga_params):
     return pareto_solutions, pareto_values
 
 
-def display_nsga2_results(solutions, values, selected_data, col_map, total_mix_amount):
+@st.fragment(run_every=1.0)
+def monitor_nsga2_background_job():
+    """
+    后台 NSGA-II 计算的进度面板: 每秒从进度队列取出最新消息并刷新, 只重绘本片段, 不会重新执行整个页面
+    计算结束 (完成/取消/失败) 后触发整页刷新以显示结果
+    """
+    job = st.session_state.nsga2_job
+    if job['status'] != 'running':
+        st.rerun()
+
+    latest = drain_progress(job)
+    total_generations = job['total_generations']
+
+    st.markdown("### 🔄 优化过程实时监控 (后台运行)")
+    if latest is None:
+        st.info("⏳ 正在初始化种群...")
+    else:
+        generation = latest['generation']
+        front = latest['front']
+        st.progress(min(generation / total_generations, 1.0), text=f"第 {generation}/{total_generations} 代")
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("当前代数", f"{generation}/{total_generations}")
+        col2.metric("超体积 (HV)", f"{latest['hypervolume']:.4f}")
+        col3.metric("当前前沿解数", len(front))
+
+        if len(front) > 0:
+            st.scatter_chart(pd.DataFrame({'含量偏差': front[:, 0], '相似度': -front[:, 1]}),
+                             x='含量偏差', y='相似度')
+
+    if job['cancel_event'].is_set():
+        st.warning("⏹️ 已请求取消，将在当前代结束后停止")
+    elif st.button("⏹️ 取消计算", key="nsga2_cancel"):
+        job['cancel_event'].set()
+        st.warning("⏹️ 已请求取消，将在当前代结束后停止")
+
+
+def show_nsga2_background_result(col_map):
+    """显示已结束的后台 NSGA-II 计算结果, 结果保留到下一次提交计算为止"""
+    job = st.session_state.nsga2_job
+    context = st.session_state.nsga2_job_context
+
+    if job['status'] == 'failed':
+        st.error(f"🚫 NSGA-II 后台计算出错: {job['error']}")
+        return
+
+    archive_solutions, archive_values, run_info = job['result']
+    if 'outcome' not in context:
+        context['outcome'] = finalize_nsga2_result(archive_solutions, archive_values, context['nsga_params'])
+        # 结果只在计算结束后保存一次, 之后的页面刷新直接复用
+        solutions, values = context['outcome']
+        if solutions:
+            save_nsga2_result(solutions, values, run_info, context['selected_data'], context['constraints'])
+
+    if run_info.get('resumed_from'):
+        st.info(f"♻️ 检测到相同数据和参数的未完成计算，已从第 {run_info['resumed_from']} 代的检查点继续")
+
+    if job['status'] == 'cancelled':
+        st.warning(f"⏹️ 计算已在第 {run_info['generations_run']} 代取消，以下为取消前找到的方案")
+    elif run_info['stopped_early']:
+        st.success(f"✅ 超体积已收敛，于第 {run_info['generations_run']} 代提前结束！")
+    else:
+        st.success("✅ 优化完成！")
+
+    solutions, values = context['outcome']
+    show_nsga2_outcome(solutions, values, run_info, context['selected_data'], col_map,
+                       context['nsga_params']['total_mix_amount'])
+
+
+def save_nsga2_result(solutions, values, run_info, selected_data, constraints):
+    """保存NSGA-II结果以便导出 - 使用第一个解作为代表"""
+    representative_result = {
+        'x': solutions[0],
+        'fun': values[0][0],
+        'success': True  # 添加成功标志
+    }
+
+    # 保存完整的NSGA-II结果
+    st.session_state.optimization_result = {
+        'result': representative_result,
+        'selected_data': selected_data,
+        'constraints': constraints,
+        'fp_options': {},
+        'nsga_results': {  # 添加NSGA-II专有结果
+            'all_solutions': solutions,
+            'all_values': values,
+            'run_info': run_info,
+            'fronts': fast_non_dominated_sort(values)
+        }
+    }
+
+
+def show_nsga2_outcome(solutions, values, run_info, selected_data, col_map, total_mix_amount):
+    """显示NSGA-II结果; 没有找到可行解时给出失败原因和建议"""
+    if solutions:
+        display_nsga2_results(solutions, values, selected_data, col_map, total_mix_amount, run_info)
+    else:
+        st.error("🚫 NSGA-II 优化失败")
+        st.markdown("""
+        **可能的原因：**
+        - 选择的批次组合无法满足所有硬性约束
+        - 库存量设置过低
+        - 目标值设置不合理
+
+        **建议解决方案：**
+        1. 增加批次选择，特别是质量均衡的批次
+        2. 检查并调整库存量设置
+        3. 适当放宽目标含量要求
+        4. 尝试使用SLSQP引擎进行初步测试
+        """)
+
+
+def display_nsga2_results(solutions, values, selected_data, col_map, total_mix_amount, run_info=None):
     """
     为NSGA-II的结果提供定制化的、完整中文的可视化和交互功能 (已修复字体问题)
+    run_info 为 run_nsga2_optimization / exact_pareto_front 返回的运行信息 (超体积曲线等), 可选
     """
-    st.subheader("★ NSGA-II 多目标均衡方案 ★", anchor=False)
+    if run_info and run_info.get('engine') == 'epsilon_constraint':
+        st.subheader("★ 精确帕累托前沿方案 (ε-约束) ★", anchor=False)
+    else:
+        st.subheader("★ NSGA-II 多目标均衡方案 ★", anchor=False)
 
     if FONT_PROP is None:
         st.error("中文字体未成功加载，无法生成中文图表。")
@@ -4043,6 +4046,32 @@ def display_nsga2_results(solutions, values, selected_data, col_map, total_mix_a
         sim_status = "✅ 达标" if sim_content >= 0.9 else "❌ 未达标"
         st.write(sim_status)
 
+    # --- 8. 收敛过程 (超体积曲线) ---
+    if run_info and run_info.get('hypervolume_history'):
+        st.write("**收敛过程分析 (超体积)**")
+        history = run_info['hypervolume_history']
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("最终超体积 (HV)", f"{history[-1]:.4f}")
+        with col2:
+            st.metric("实际运行代数", run_info['generations_run'],
+                      delta="超体积收敛，提前停止" if run_info['stopped_early'] else None, delta_color="off")
+        generations = run_info.get('hypervolume_generations', np.arange(1, len(history) + 1))
+        st.line_chart(pd.DataFrame({'超体积 (HV)': history}, index=generations))
+        if run_info.get('polished_points'):
+            st.caption(f"🔧 局部SLSQP精修：{run_info['polished_points']} 个精修方案进入最终前沿 (已计入上方方案列表)")
+    elif run_info and run_info.get('engine') == 'epsilon_constraint':
+        st.write("**求解过程 (ε-约束法)**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("超体积 (HV)", f"{run_info['hypervolume']:.4f}")
+        with col2:
+            st.metric("前沿点数", len(values),
+                      delta=f"{run_info['failed_points']} 个ε点求解失败" if run_info['failed_points'] else None,
+                      delta_color="off")
+        with col3:
+            st.metric("计算耗时", f"{run_info['elapsed']:.2f} 秒")
+
 
 # ##############################################################################
 # --- 原 app.py 核心功能函数区 (部分有微调) ---
@@ -4493,12 +4522,58 @@ def create_optimization_visualization_chinese(result, selected_data, col_map, dr
     st.pyplot(fig)
     plt.close(fig)
 
+
+def metric_display_name(key, col_name, drug_type):
+    """约束/目标指标在界面上显示的名称: 其他药物的自定义指标 (metric_i) 用用户填写的名称, 其余用数据列名"""
+    if drug_type != '甘草' and key.startswith('metric_'):
+        return st.session_state.custom_metrics_info[int(key.split('_')[1])]
+    return col_name
+
+
+def build_sensitivity_table(result, problem, total_mix_amount, mode, drug_type):
+    """
+    影子价格表: 每项最低标准、指纹相似度、比例总和及起作用的库存上界的对偶值, 以及折算到界面指标
+    (成本最优为总成本/元, 质量最优为评分) 的边际影响; 结果不含对偶值 (如弹性模式) 时返回 None
+    """
+    duals = result.get('duals')
+    if not duals:
+        return None
+    # 对偶值是目标函数 (每克混合物的成本 / 负评分) 的变化, 换算到界面上显示的指标
+    scale, unit = (total_mix_amount, "总成本 (元)") if mode == "成本最优" else (-1.0, "质量评分")
+    rows = []
+    for key, col_name, floor, dual in zip(problem.constraint_keys, problem.constraint_columns,
+                                          problem.constraint_floors, duals['floors']):
+        display_name = metric_display_name(key, col_name, drug_type)
+        rows.append(['最低标准', display_name, f"≥ {floor:g}", dual, f"标准提高 1 单位: {unit} {dual * scale:+.4f}"])
+    if 'fingerprint' in duals:
+        rows.append(['指纹图谱', '指纹图谱相似度', f"≥ {problem.min_similarity:g}", duals['fingerprint'],
+                     f"要求提高 0.01: {unit} {duals['fingerprint'] * 0.01 * scale:+.4f}"])
+    rows.append(['总量', '比例总和 Σx = 1', "= 1", duals['sum'], "总量约束的乘子 (目标函数单位)"])
+    upper = np.asarray(duals['upper'])
+    for i in sorted(np.flatnonzero(np.abs(upper) > 1e-9), key=lambda i: upper[i]):
+        # 比例上界 = 库存/总量, 库存增加 100 克即上界增加 100/总量
+        rows.append(['库存上界', f"批次 {problem.batch_index[i]}", f"{problem.inventory[i]:.1f} 克", upper[i],
+                     f"库存增加 100 克: {unit} {upper[i] * 100 / total_mix_amount * scale:+.4f}"])
+    return pd.DataFrame(rows, columns=['约束类型', '约束', '当前要求', '影子价格', '边际影响'])
+
+
 def display_successful_result_universal_enhanced(result, selected_data, total_mix_amount, col_map,
                                                  constraints_dict,
-                                                 fingerprint_options, drug_type, target_contents=None):
-    """增强版结果显示函数，使用中文标签"""
+                                                 fingerprint_options, drug_type, target_contents=None, problem=None):
+    """增强版结果显示函数，使用中文标签 (problem 为本次计算的 BlendProblem, 缺省时重新构建)"""
+    if problem is None:
+        problem = build_blend_problem(selected_data, col_map, total_mix_amount, constraints_dict,
+                                      fingerprint_options, target_contents)
     st.subheader("★ 智能混批推荐方案 ★", anchor=False)
-    st.success("成功找到最优混合方案！", icon="🎉")
+    elastic = 'shortfall' in result
+    if elastic and (result.total_shortfall > 0 or result.fingerprint_shortfall):
+        st.warning("所选批次无法同时满足全部约束，以下为弹性模式求得的总缺口最小方案，请参考各项缺口调整批次选择。",
+                   icon="⚠️")
+        if result.get('limits_relaxed'):
+            st.warning("弹性方案为连续配方，未施加批次数上限与称量网格，实际使用批次数与称量克数可能不满足这些设置。",
+                       icon="⚠️")
+    else:
+        st.success("成功找到最优混合方案！", icon="🎉")
 
     # --- 基础信息展示 ---
     col1, col2, col3 = st.columns(3)
@@ -4506,17 +4581,26 @@ def display_successful_result_universal_enhanced(result, selected_data, total_mi
         if st.session_state.current_mode == "成本最优":
             st.metric("预期总成本 (元)", f"{(result.fun * total_mix_amount):.2f}")
         else:
-            score_label = "预期最高ML Score (1-10分)" if drug_type == '甘草' else "预期质量评分"
+            # 评分标签取决于实际优化的评分: 只有 SLSQP 的 ML 模式优化 ML Score, 其余求解器都按规则评分
+            score_label = "预期最高ML Score (1-10分)" if result.get('score_name') == 'ML评分' else "预期质量评分"
             score_value = -result.fun
             st.metric(score_label, f"{score_value:.2f}")
+            if drug_type == '甘草' and result.get('score_name') != 'ML评分':
+                st.caption("按规则评分优化 (ML 评分模型只用于不限批次数的 SLSQP 质量最优模式)")
     with col2:
         st.metric("实际使用批次数", len(np.where(result.x > 0.001)[0]))
+    # 称量网格方案直接使用精确的称量克数 (步长整数倍), 不再由比例乘总量得到
+    optimal_weights = result.dispense_grams if 'dispense_grams' in result else result.x * total_mix_amount
     with col3:
-        st.metric("总原料用量 (克)", f"{np.sum(result.x * total_mix_amount):.2f}")
+        st.metric("总原料用量 (克)", f"{np.sum(optimal_weights):.2f}")
+    st.caption(f"求解器: {result.get('solver', 'SLSQP')}")
+    if 'dispense_grams' in result:
+        st.caption(f"称量网格 (步长 {result.grid_step:g} 克, 总量 {result.total_grams:g} 克): {result.message}")
+    elif 'selected' in result:
+        st.caption(f"限定批次数: {result.message}")
 
     # --- 详细配比表格 ---
     st.subheader("📋 详细配比方案")
-    optimal_weights = result.x * total_mix_amount
     recommendation_df = pd.DataFrame({
         '批次编号': selected_data.index,
         '推荐用量 (克)': optimal_weights,
@@ -4531,152 +4615,245 @@ def display_successful_result_universal_enhanced(result, selected_data, total_mi
     # --- 约束达标情况分析 ---
     st.subheader("✅ 约束指标达标情况")
     status_data = []
-    for key, min_val in constraints_dict.items():
-        col_name = col_map.get(key)
-        if col_name and col_name in selected_data.columns:
-            final_val = np.dot(result.x, selected_data[col_name].values)
-            status = "✓" if final_val >= min_val else "✗"
-            display_name = st.session_state.custom_metrics_info[int(key.split('_')[1])] if drug_type != '甘草' and key.startswith('metric_') else col_name
-            status_data.append([display_name, f"{final_val:.4f}", f"≥ {min_val}", status])
+    for key, col_name, final_val in zip(problem.constraint_keys, problem.constraint_columns,
+                                        problem.constraint_values(result.x)):
+        min_val = constraints_dict[key]
+        status = "✓" if final_val >= min_val else "✗"
+        display_name = metric_display_name(key, col_name, drug_type)
+        status_data.append([display_name, f"{final_val:.4f}", f"≥ {min_val}", status])
     st.table(pd.DataFrame(status_data, columns=['指标名称', '预期值', '标准要求', '是否达标']))
 
+    # --- 弹性模式: 各项约束缺口 ---
+    if elastic:
+        st.subheader("📉 约束缺口 (弹性模式)")
+        shortfall_data = []
+        for key, col_name, required, shortfall in zip(problem.constraint_keys, problem.constraint_columns,
+                                                      problem.constraint_floors, result.shortfall):
+            display_name = metric_display_name(key, col_name, drug_type)
+            relative = shortfall / abs(required) * 100 if required != 0 else 0
+            shortfall_data.append([display_name, f"{required:.4f}", f"{shortfall:.4f}", f"{relative:.2f}%"])
+        if result.fingerprint_similarity is not None:
+            required, shortfall = problem.min_similarity, result.fingerprint_shortfall
+            relative = shortfall / required * 100 if required else 0
+            shortfall_data.append(["指纹图谱相似度", f"{required:.4f}", f"{shortfall:.4f}", f"{relative:.2f}%"])
+        st.table(pd.DataFrame(shortfall_data, columns=['约束', '标准要求', '缺口', '相对缺口']))
+
+    # --- 影子价格 (约束灵敏度) ---
+    sensitivity_df = build_sensitivity_table(result, problem, total_mix_amount, st.session_state.current_mode,
+                                             drug_type)
+    if sensitivity_df is not None:
+        st.subheader("💰 影子价格 (约束灵敏度)")
+        st.dataframe(sensitivity_df.round(6), use_container_width=True)
+        st.caption("影子价格为约束右端项增加 1 时最优目标值的变化, 只在小幅调整 (当前起作用的约束集合不变) 时准确; "
+                   "未列出的库存上界当前不起作用, 增加库存不会改善方案。")
+
     # --- 目标达成情况分析 ---
     if target_contents:
         st.subheader("🎯 目标含量达成情况")
         target_data = []
-        for key, target_val in target_contents.items():
-            col_name = col_map.get(key)
-            if col_name and col_name in selected_data.columns:
-                final_val = np.dot(result.x, selected_data[col_name].values)
-                deviation_percent = abs(final_val - target_val) / target_val * 100 if target_val != 0 else 0
-                display_name = st.session_state.custom_metrics_info[int(key.split('_')[1])] if drug_type != '甘草' and key.startswith('metric_') else col_name
-                target_data.append([display_name, f"{final_val:.4f}", f"{target_val:.4f}", f"{deviation_percent:.2f}%"])
+        for key, col_name, target_val, final_val in zip(problem.target_keys, problem.target_columns,
+                                                        problem.target_values, problem.target_actuals(result.x)):
+            deviation_percent = abs(final_val - target_val) / target_val * 100 if target_val != 0 else 0
+            display_name = metric_display_name(key, col_name, drug_type)
+            target_data.append([display_name, f"{final_val:.4f}", f"{target_val:.4f}", f"{deviation_percent:.2f}%"])
         st.table(pd.DataFrame(target_data, columns=['指标名称', '实际值', '目标值', '偏差百分比']))
 
-def run_hybrid_optimization_universal(selected_data, total_mix_amount, col_map, constraints_dict, fingerprint_options,
-                                      drug_type, target_contents=None):
-    """通用优化函数，支持甘草和其他药物"""
-    num_batches = len(selected_data)
-    cost_col = col_map.get("cost")
 
-    if cost_col:
-        st.session_state.current_mode = "成本最优"
+def linear_blend_objective(problem):
+    """
+    凸规划、弹性模式、称量网格、限定批次数与局部搜索共用的线性目标 (objective_vector, penalty_coefficient, mode):
+    有成本列时为成本, 否则为负的规则评分 (ML 评分模型不可微, 这些求解器都不使用);
+    既无成本列也无质量评分时返回 None
+    """
+    if problem.cost_vector is not None:
+        return problem.cost_vector, COST_PENALTY_COEFFICIENT, "成本最优"
+    if problem.rubric_vector is not None:
+        return -problem.rubric_vector, QUALITY_PENALTY_COEFFICIENT, "质量最优"
+    return None
 
-        def objective_func(proportions):
-            base_cost = np.dot(proportions, selected_data[cost_col].values)
-
-            # 目标引导项
-            if target_contents:
-                content_penalty = 0
-                for key, target_val in target_contents.items():
-                    col_name = col_map.get(key)
-                    if col_name and col_name in selected_data.columns:
-                        actual_val = np.dot(proportions, selected_data[col_name].values)
-                        content_penalty += 0.1 * (actual_val - target_val) ** 2
-                return base_cost + content_penalty
-            return base_cost
+
+def run_hybrid_optimization_universal(selected_data, total_mix_amount, col_map, constraints_dict, fingerprint_options,
+                                      drug_type, target_contents=None, problem=None, elastic=False, max_batches=0,
+                                      exact_count=False, grid_step=0.0, min_draw=0.0, local_search=False):
+    """
+    通用优化函数，支持甘草和其他药物
+    所有数值数据取自 BlendProblem (problem 缺省时由 selected_data 构建), 求值过程中不再访问 pandas
+    目标函数与全部约束都提供解析梯度/雅可比矩阵 (成本、评分为线性, 含量引导项为二次,
+    指纹余弦相似度有闭式梯度), SLSQP 不再对每个函数做 n_batches+1 次差分求值;
+    只有 ML 评分模型 (树模型不可微) 仍由 SciPy 差分求梯度
+    成本最优与规则评分最优 (非 ML) 模式的问题是凸的: 线性目标 + 二次引导项, 指纹约束为二阶锥,
+    直接求全局最优解 (blend_solvers), 只有 ML 评分或求解未收敛时才使用 SLSQP
+    elastic=True 时为弹性模式: 一次线性规划求各项最低标准总缺口最小的方案, 再在不增大缺口的前提下优化
+    成本/评分 (ML 评分不可用于线性规划, 改按规则评分), 结果另含每项标准的缺口 shortfall;
+    同时给出批次数上限或称量网格时, 缺口为零 (失败只因这些限制) 则返回失败结果, 否则弹性方案不施加这些限制
+    (结果另含 limits_relaxed); 施加了批次数上限或称量网格的结果 limited 为 True
+    0 < max_batches < 批次数时限制配方批次数 (exact_count=True 时恰好使用 max_batches 个),
+    以混合整数规划求可证明最优的方案 (blend_integer, ML 评分同样改按规则评分);
+    local_search=True 时改用局部搜索 (blend_local_search), 上万个批次也能在 1 秒内给出局部最优方案
+    grid_step > 0 时按称量网格出方: 各批次用量为 grid_step 克的整数倍, 选用的批次不少于 min_draw 克
+    (可同时限制批次数), 结果另含精确的称量克数 dispense_grams
+    结果的 score_name 注明质量评分的来源 ('ML评分' 或 '规则评分'), 供结果展示选择标签
+    """
+    if problem is None:
+        problem = build_blend_problem(selected_data, col_map, total_mix_amount, constraints_dict,
+                                      fingerprint_options, target_contents)
+    use_ml_model = drug_type == '甘草' and 'ml_model' in st.session_state and st.session_state.ml_model
+    linear_objective = linear_blend_objective(problem)
+    limited = grid_step > 0 or 0 < max_batches < problem.num_batches
+    if linear_objective is None and (elastic or limited or not use_ml_model):
+        return OptimizeResult(x=None, fun=np.nan, success=False, status=2, nit=0, solver='未求解',
+                              message='数据中既无成本列也无质量评分 (Rubric_Score), 无法构建优化目标'
+                                      + ('; ML 评分模型不能用于弹性模式、称量网格与限定批次数' if use_ml_model else ''))
+    if elastic or limited:
+        objective_vector, penalty_coefficient, mode = linear_objective
+        st.session_state.current_mode = mode
+        if elastic:
+            result = solve_elastic_blend(problem, objective_vector, penalty_coefficient)
+            if limited and result.success:
+                if result.total_shortfall <= 0 and not result.fingerprint_shortfall:
+                    # 不限批次数、不取整时全部约束可以满足: 失败只因批次数上限或称量网格, 连续的弹性方案不适用
+                    return OptimizeResult(x=None, fun=np.nan, success=False, status=2, nit=result.nit,
+                                          solver=result.solver, score_name='规则评分', limited=True,
+                                          message='不限批次数、不按称量网格时全部约束可以满足, '
+                                                  '当前的批次数上限或称量网格设置下无可行方案')
+                # 弹性方案为连续配方, 不受批次数上限与称量网格限制
+                result.limits_relaxed = True
+        elif grid_step > 0:
+            result = solve_dispensing_blend(problem, objective_vector, penalty_coefficient, grid_step, min_draw,
+                                            max_batches if 0 < max_batches < problem.num_batches else 0,
+                                            exact_count)
+        elif local_search:
+            result = solve_local_search_blend(problem, objective_vector, penalty_coefficient, max_batches,
+                                              exact_count)
+        else:
+            result = solve_cardinality_blend(problem, objective_vector, penalty_coefficient, max_batches,
+                                             exact_count)
+        result.score_name = '规则评分'
+        result.limited = limited
+        return result
+    # ML 模式的质量最优需要 ML 评分, 只能用 SLSQP
+    if linear_objective is not None and not (use_ml_model and linear_objective[2] == "质量最优"):
+        objective_vector, penalty_coefficient, mode = linear_objective
+        fast_result = solve_convex_blend(problem, objective_vector, penalty_coefficient)
+        if fast_result is not None:
+            st.session_state.current_mode = mode
+            fast_result.score_name = '规则评分'
+            return fast_result
+    num_batches = problem.num_batches
+
+    # 目标函数与指纹约束的解析梯度由 blend_solvers 给出 (目标与凸规划快速通道一致)
+    objective_jac = None
+    if problem.cost_vector is not None:
+        st.session_state.current_mode = "成本最优"
+        objective_func, objective_jac = blend_objective(problem, problem.cost_vector, COST_PENALTY_COEFFICIENT)
+    elif not use_ml_model:
+        st.session_state.current_mode = "质量最优"
+        # 通用模式使用简单评分
+        objective_func, objective_jac = blend_objective(problem, -problem.rubric_vector, QUALITY_PENALTY_COEFFICIENT)
     else:
         st.session_state.current_mode = "质量最优"
+        rubric_vector = problem.rubric_vector
+        content_penalty = blend_objective(problem, np.zeros(num_batches), QUALITY_PENALTY_COEFFICIENT)[0]
+        model = st.session_state.ml_model
+        features_for_ml = st.session_state.get('features_for_ml')
+        try:
+            feature_matrix = selected_data[features_for_ml].to_numpy(dtype=float)
+        except Exception:
+            feature_matrix = None  # 特征列缺失时 ML 评分在求值时失败, 回退到规则评分
 
         def objective_func(proportions):
-            if drug_type == '甘草' and 'ml_model' in st.session_state and st.session_state.ml_model:
-                # 甘草模式使用ML评分
-                try:
-                    model = st.session_state.ml_model
-                    features_for_ml = st.session_state.features_for_ml
-                    mix_features = np.dot(proportions, selected_data[features_for_ml].values)
-                    mix_df = pd.DataFrame([mix_features], columns=features_for_ml)
-                    ml_score = model.predict(mix_df)[0]
-                    ml_score = np.clip(ml_score, 1.0, 10.0)
-                    base_score = -ml_score
-                except:
-                    rubric_score = np.dot(proportions, selected_data['Rubric_Score'].values)
-                    base_score = -(1 + (rubric_score / 5.0) * 9.0)
-            else:
-                # 通用模式使用简单评分
-                rubric_score = np.dot(proportions, selected_data['Rubric_Score'].values)
-                base_score = -rubric_score
-
-            # 目标引导项
-            if target_contents:
-                content_penalty = 0
-                for key, target_val in target_contents.items():
-                    col_name = col_map.get(key)
-                    if col_name and col_name in selected_data.columns:
-                        actual_val = np.dot(proportions, selected_data[col_name].values)
-                        content_penalty += 0.05 * (actual_val - target_val) ** 2
-                return base_score + content_penalty
-            return base_score
-
-    # 约束条件
+            # 甘草模式使用ML评分 (模型以 DataFrame 训练, 预测时仍需带列名的输入); 树模型不可微, 由 SciPy 差分求梯度
+            try:
+                mix_features = np.dot(proportions, feature_matrix)
+                mix_df = pd.DataFrame([mix_features], columns=features_for_ml)
+                ml_score = model.predict(mix_df)[0]
+                ml_score = np.clip(ml_score, 1.0, 10.0)
+                base_score = -ml_score
+            except:
+                rubric_score = np.dot(proportions, rubric_vector)
+                base_score = -(1 + (rubric_score / 5.0) * 9.0)
+            return base_score + content_penalty(proportions)
+
+    # 约束条件: 各项最低含量均为线性约束 A·x ≥ b, 雅可比矩阵即 A
     constraints = []
+    constraint_matrix, constraint_floors = problem.constraint_matrix, problem.constraint_floors
 
     def quality_constraint_func(proportions):
-        cons = []
-        for key, min_val in constraints_dict.items():
-            col_name = col_map.get(key)
-            if col_name and col_name in selected_data.columns:
-                mix_val = np.dot(proportions, selected_data[col_name].values)
-                cons.append(mix_val - min_val)
-        return np.array(cons)
+        return constraint_matrix @ proportions - constraint_floors
 
-    constraints.append({'type': 'ineq', 'fun': quality_constraint_func})
+    constraints.append({'type': 'ineq', 'fun': quality_constraint_func, 'jac': lambda proportions: constraint_matrix})
 
     # 指纹图谱约束
-    if fingerprint_options['enabled'] and fingerprint_options['target_profile'] is not None:
-        target_profile, f_cols, min_similarity = fingerprint_options['target_profile'], fingerprint_options['f_cols'], \
-                                                 fingerprint_options['min_similarity']
-
-        def fingerprint_constraint_func(proportions):
-            mix_f_profile = np.dot(proportions, selected_data[f_cols].values)
-            similarity = cosine_similarity(mix_f_profile.reshape(1, -1), target_profile.reshape(1, -1))[0, 0]
-            return similarity - min_similarity
-
-        constraints.append({'type': 'ineq', 'fun': fingerprint_constraint_func})
+    if problem.fingerprint_matrix is not None:
+        fingerprint_constraint_func, fingerprint_constraint_jac = fingerprint_constraint(problem)
+        constraints.append({'type': 'ineq', 'fun': fingerprint_constraint_func, 'jac': fingerprint_constraint_jac})
 
     # 其他约束保持不变
     proportion_sum_constraint = LinearConstraint(np.ones(num_batches), lb=1, ub=1)
     constraints.append(proportion_sum_constraint)
 
-    inventory = selected_data['库存量 (克)'].fillna(total_mix_amount * num_batches * 10).values
-    max_proportions = inventory / total_mix_amount if total_mix_amount > 0 else np.full(num_batches, 0)
-    bounds = Bounds([0] * num_batches, np.minimum(1, max_proportions))
+    bounds = Bounds(np.zeros(num_batches), problem.upper_bounds)
 
     initial_guess = np.full(num_batches, 1 / num_batches)
-    result = minimize(objective_func, initial_guess, method='SLSQP', bounds=bounds, constraints=constraints,
-                      options={'disp': False, 'ftol': 1e-9})
+    result = minimize(objective_func, initial_guess, method='SLSQP', jac=objective_jac, bounds=bounds,
+                      constraints=constraints, options={'disp': False, 'ftol': 1e-9})
+    result.score_name = 'ML评分' if use_ml_model and problem.cost_vector is None else '规则评分'
+    if result.success:
+        # 影子价格: SLSQP 的乘子按 [Σx = 1, 各项最低标准, 指纹相似度] 排列, 用拉格朗日函数梯度的定价线性规划
+        # 统一求出最低标准、总量与库存上界的乘子 (近似解, 精度取决于 SLSQP 的收敛程度)
+        lagrangian_gradient = np.asarray(result.jac, dtype=float)
+        fingerprint_multiplier = None
+        if problem.fingerprint_matrix is not None and result.get('multipliers') is not None:
+            fingerprint_multiplier = max(float(result.multipliers[1 + len(constraint_floors)]), 0.0)
+            lagrangian_gradient = lagrangian_gradient - fingerprint_multiplier * fingerprint_constraint_jac(result.x)[0]
+        result.duals = constraint_duals(problem, lagrangian_gradient)
+        if result.duals is not None and fingerprint_multiplier is not None:
+            result.duals['fingerprint'] = fingerprint_multiplier
     return result
 
 
 def provide_failure_analysis_universal_enhanced_chinese(selected_data, col_map, constraints_dict, fingerprint_options,
-                                                        drug_type):
-    """增强版失败分析 - 中文标签版本"""
+                                                        drug_type, problem=None, feasibility=None, solver_result=None):
+    """
+    增强版失败分析 - 中文标签版本
+    problem 为本次计算的 BlendProblem, feasibility 为阶段一可行性检查结果, 缺省时重新计算
+    solver_result 为失败的求解结果: 批次数上限、称量网格、局部搜索等求解器的 message 给出了具体原因, 一并展示
+    """
+    if problem is None:
+        problem = build_blend_problem(selected_data, col_map, st.session_state.get('total_mix_amount', 1000.0),
+                                      constraints_dict, fingerprint_options)
+    if feasibility is None:
+        feasibility = check_linear_feasibility(problem)
     st.warning("计算失败，正在为您进行智能诊断...", icon="💡")
+    solver_message = solver_result.get('message') if solver_result is not None else None
+    if solver_message:
+        st.info(f"求解器 ({solver_result.get('solver', 'SLSQP')}) 报告: {solver_message}")
 
     if FONT_PROP is None:
         st.error("中文字体未加载，无法生成中文诊断图表。")
         return
 
-    # 检查各项约束的可行性
-    constraint_analysis = []
-    # ... (此部分内部逻辑无需修改)
+    # 检查各项约束的可行性: 每项约束在其余约束下的最大可达值与不可约冲突子集 (一串线性规划)
+    diagnosis = diagnose_infeasibility(problem)
+    constraint_analysis = diagnosis['constraint_analysis']
 
     # 可视化约束分析
     if constraint_analysis:
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(18, 8))
         fig.suptitle("优化失败智能诊断", fontsize=22, fontproperties=FONT_PROP)
 
-        # --- 图 1: 约束可行性分析 ---
-        names = [item['constraint'] for item in constraint_analysis]
-        required_vals = [item['required'] for item in constraint_analysis]
-        max_vals = [item['max_available'] for item in constraint_analysis]
-        mean_vals = [item['mean_available'] for item in constraint_analysis]
+        # --- 图 1: 约束可行性分析 (库存总量以克计, 量纲不同, 不放入柱状图) ---
+        chart_items = [item for item in constraint_analysis if item['constraint'] != INVENTORY_LABEL]
+        names = [item['constraint'] for item in chart_items]
+        required_vals = [item['required'] for item in chart_items]
+        max_vals = [item['max_available'] for item in chart_items]
+        mean_vals = [item['mean_available'] for item in chart_items]
 
         x = np.arange(len(names))
         width = 0.25
 
         ax1.bar(x - width, required_vals, width, label='要求值', alpha=0.8, color='red', edgecolor='black')
-        ax1.bar(x, max_vals, width, label='可选最大值', alpha=0.8, color='green', edgecolor='black')
+        ax1.bar(x, max_vals, width, label='其余约束下最大值', alpha=0.8, color='green', edgecolor='black')
         ax1.bar(x + width, mean_vals, width, label='可选平均值', alpha=0.8, color='skyblue', edgecolor='black')
 
         ax1.set_xlabel('约束指标', fontsize=16, fontproperties=FONT_PROP)
@@ -4716,23 +4893,46 @@ def provide_failure_analysis_universal_enhanced_chinese(selected_data, col_map,
 
         # 详细表格分析
         st.subheader("约束详细分析")
-        analysis_df = pd.DataFrame(constraint_analysis)
+        analysis_df = pd.DataFrame(constraint_analysis).rename(columns={
+            'constraint': '约束', 'required': '要求值', 'max_available': '其余约束下最大值',
+            'max_alone': '仅受库存限制最大值', 'mean_available': '批次平均值', 'feasible': '可满足',
+            'in_conflict': '属于冲突子集'
+        })
         st.dataframe(analysis_df.round(4), use_container_width=True)
 
     # 中文诊断信息
-    for key, min_val in constraints_dict.items():
-        col_name = col_map.get(key)
-        if col_name and col_name in selected_data.columns:
-            max_in_selection = selected_data[col_name].max()
-            if max_in_selection < min_val:
-                st.error(f"**诊断结果：无法达成的硬性约束**")
-                st.write(
-                    f"您所选批次中，**'{col_name}'** 的最高含量仅为 **{max_in_selection:.4f}**，无法达到 **≥ {min_val}** 的标准。")
-                return
-
-    st.error("**诊断结果：组合无法满足所有约束**")
+    if not feasibility['inventory_sufficient']:
+        st.error(f"**诊断结果：库存不足**")
+        st.write(
+            f"您所选批次的库存合计仅为 **{problem.inventory.sum():.2f} 克**，不足目标产量 **{problem.total_mix_amount} 克**。")
+        return
+
+    for col_name, min_val, max_achievable in zip(problem.constraint_columns, problem.constraint_floors,
+                                                 feasibility['max_achievable']):
+        if max_achievable < min_val:
+            st.error(f"**诊断结果：无法达成的硬性约束**")
+            st.write(
+                f"在库存限制下，您所选批次混合后 **'{col_name}'** 最高只能达到 **{max_achievable:.4f}**，无法达到 **≥ {min_val:g}** 的标准。")
+            return
+
+    if diagnosis['conflict_set']:
+        st.error("**诊断结果：组合无法满足所有约束**")
+        st.write(
+            f"以下约束无法同时满足：**{'、'.join(diagnosis['conflict_set'])}**。"
+            "去掉其中任意一项后其余约束即可同时满足，因此放宽其中任意一项（或补充库存、增加批次）即可能恢复可行。")
+        return
+
+    if solver_result is not None and solver_result.get('limited'):
+        # 批次数上限、称量网格与局部搜索: 不加这些限制时约束可以满足, 失败原因在求解器的报告中
+        st.error("**诊断结果：批次数上限或称量网格下无可行方案**")
+        st.write(
+            f"诊断表明不加限制时全部约束可以同时满足，但{solver_message}。"
+            "可放宽批次数上限、减小最小取用量或切换求解方式后重新计算。")
+        return
+
+    st.error("**诊断结果：求解器未能收敛**")
     st.write(
-        "您选择的批次理论上可以满足各项标准，但无法找到一个具体的混合比例来同时满足所有约束。这通常发生在所选批次质量普遍偏科或库存不足的情况下。")
+        "诊断表明全部约束可以同时满足，但求解器未能找到混合比例。可尝试切换为成本最优模式或减少候选批次后重新计算。")
 
 
 def display_successful_result(result, selected_data, total_mix_amount, col_map, min_standards, fingerprint_options,
@@ -4853,6 +5053,8 @@ with st.sidebar:
         if 'optimization_mode' in st.session_state:
             if st.session_state.optimization_mode == '质量/成本最优 (SLSQP)':
                 st.info("🚀 SLSQP引擎\n单目标快速优化")
+            elif st.session_state.optimization_mode == '精确帕累托前沿 (ε-约束)':
+                st.info("📐 精确前沿引擎\nε-约束凸优化")
             else:
                 st.info("🧬 NSGA-II引擎\n多目标进化优化")
 
@@ -5692,8 +5894,8 @@ elif st.session_state.app_state == 'CONSTRAINT_SETTING':
 elif st.session_state.app_state == 'ANALYSIS_READY':
     st.header("4. 选择批次并执行优化", anchor=False)
 
-    # 创建两个引擎选择卡片
-    col1, col2 = st.columns(2)
+    # 创建三个引擎选择卡片
+    col1, col2, col3 = st.columns(3)
 
     with col1:
         st.markdown("""
@@ -5725,6 +5927,21 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
 
         nsga_selected = st.button("🧬 选择 NSGA-II", key="select_nsga2", use_container_width=True)
 
+    with col3:
+        st.markdown("""
+        <div class="metric-card" style="height: 180px; padding: 1.5rem; display: flex; flex-direction: column; justify-content: center; align-items: center;">
+            <div style="text-align: center;">
+                <div style="font-size: 3rem; margin-bottom: 0.5rem;">📐</div>
+                <div style="font-size: 1.2rem; font-weight: 700; color: #2E7D32; margin-bottom: 0.5rem;">精确前沿引擎</div>
+                <div style="font-size: 0.9rem; color: #666; line-height: 1.4;">
+                    • ε-约束凸优化逐点求解<br>• 不限批次数时几秒得到精确前沿
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        exact_selected = st.button("📐 选择精确前沿", key="select_exact", use_container_width=True)
+
     # 处理引擎选择
     if slsqp_selected:
         st.session_state.optimization_mode = '质量/成本最优 (SLSQP)'
@@ -5732,11 +5949,16 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
     elif nsga_selected:
         st.session_state.optimization_mode = '多目标均衡 (NSGA-II)'
         st.rerun()
+    elif exact_selected:
+        st.session_state.optimization_mode = '精确帕累托前沿 (ε-约束)'
+        st.rerun()
 
     # 显示当前选择的引擎状态
     if 'optimization_mode' in st.session_state:
         if st.session_state.optimization_mode == '质量/成本最优 (SLSQP)':
             st.success("✅ 已选择 SLSQP 引擎 - 单目标快速优化", icon="🚀")
+        elif st.session_state.optimization_mode == '精确帕累托前沿 (ε-约束)':
+            st.success("✅ 已选择精确前沿引擎 - ε-约束凸优化", icon="📐")
         else:
             st.success("✅ 已选择 NSGA-II 引擎 - 多目标进化优化", icon="🧬")
 
@@ -5779,6 +6001,70 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
 
             st.session_state.fingerprint_options = {'enabled': fp_enabled, 'min_similarity': min_sim}
 
+            st.session_state.elastic_mode = st.toggle(
+                "弹性模式",
+                value=st.session_state.get('elastic_mode', False),
+                key="main_slsqp_elastic",
+                help="约束无法同时满足时，不再直接报告失败，而是返回各项最低标准总缺口最小的方案及每项缺口"
+            )
+
+            col1, col2 = st.columns(2)
+            with col1:
+                slsqp_max_batches = st.number_input(
+                    "配方批次数上限 (0为不限制)",
+                    0, 100,
+                    st.session_state.get('slsqp_max_batches', 0),
+                    key="main_slsqp_max_batches",
+                    help="限制最终方案中包含的批次数量，以混合整数规划求解，结果为该批次数下的全局最优方案"
+                )
+            with col2:
+                slsqp_exact_count = st.checkbox(
+                    "恰好使用该批次数",
+                    value=st.session_state.get('slsqp_exact_count', False),
+                    disabled=slsqp_max_batches == 0,
+                    key="main_slsqp_exact_count",
+                    help="勾选后方案必须恰好使用上述数量的批次，否则为至多使用该数量"
+                )
+            st.session_state.slsqp_max_batches = int(slsqp_max_batches)
+            st.session_state.slsqp_exact_count = slsqp_exact_count
+            cardinality_engines = ["混合整数规划 (全局最优)", "局部搜索 (大规模快速)"]
+            st.session_state.cardinality_engine = st.radio(
+                "限定批次数时的求解方式",
+                cardinality_engines,
+                index=cardinality_engines.index(st.session_state.get('cardinality_engine', cardinality_engines[0])),
+                horizontal=True,
+                disabled=slsqp_max_batches == 0,
+                key="main_slsqp_cardinality_engine",
+                help="混合整数规划给出可证明的全局最优方案，批次很多时可能需要数十秒；"
+                     "局部搜索从贪心方案出发做转移/换批，上万个批次约 1 秒内给出局部最优方案"
+            )
+
+            st.session_state.dispensing_enabled = st.toggle(
+                "按称量网格出方",
+                value=st.session_state.get('dispensing_enabled', False),
+                key="main_slsqp_dispensing",
+                help="各批次用量取称量步长的整数倍，且选用的批次不少于最小取用量，直接给出可称量的克数"
+            )
+            if st.session_state.dispensing_enabled:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.session_state.grid_step = st.number_input(
+                        "称量步长 (克)",
+                        0.001, 1000.0,
+                        st.session_state.get('grid_step', 1.0),
+                        format="%.3f",
+                        key="main_slsqp_grid_step",
+                        help="天平的称量分度, 总量按步长取整"
+                    )
+                with col2:
+                    st.session_state.min_draw = st.number_input(
+                        "单批次最小取用量 (克)",
+                        0.0, 10000.0,
+                        st.session_state.get('min_draw', 0.0),
+                        key="main_slsqp_min_draw",
+                        help="选用的批次至少取用该克数，避免出现难以称量的零星用量"
+                    )
+
             # 含量目标设置
             st.markdown("#### 🎯 含量目标优化")
             enable_target_guidance = st.toggle(
@@ -5866,12 +6152,108 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
                     help="限制最终方案中包含的批次数量，0表示不限制"
                 )
 
-            remove_extremes = st.checkbox(
-                "自动移除极端方案",
-                value=st.session_state.get('nsga_remove_extremes', True),
-                help="移除帕累托前沿两端的解，保留中间的折衷方案"
+            col1, col2 = st.columns(2)
+            with col1:
+                remove_extremes = st.checkbox(
+                    "自动移除极端方案",
+                    value=st.session_state.get('nsga_remove_extremes', True),
+                    help="移除帕累托前沿两端的解，保留中间的折衷方案"
+                )
+            with col2:
+                seed = st.number_input(
+                    "随机种子 (0为不固定)",
+                    0, 2 ** 31 - 1,
+                    st.session_state.get('nsga_seed', 0),
+                    help="设置非0的随机种子后，相同数据和参数的计算结果可完全复现"
+                )
+
+            encoding = st.selectbox(
+                "基因编码",
+                ['dense', 'sparse'],
+                index=['dense', 'sparse'].index(st.session_state.get('nsga_encoding', 'dense')),
+                format_func=lambda x: {'dense': '稠密 (每个批次一个权重)', 'sparse': '稀疏 Top-K (K个批次索引 + K个权重)'}[x],
+                help="稀疏编码只对限定的K个批次进行计算，候选批次很多 (数百至上万) 时速度显著提升；批次数量不限制 (0) 时自动使用稠密编码"
+            )
+
+            feasible_init = st.checkbox(
+                "可行域内初始化种群",
+                value=st.session_state.get('nsga_feasible_init', True),
+                help="用线性规划求可行起点，再在满足最低含量与库存约束的区域内随机游走采样，第0代即全部为可行方案"
+            )
+
+            memetic = st.checkbox(
+                "混合策略 (ε-约束播种 + 前沿局部精修)",
+                value=st.session_state.get('nsga_memetic', False),
+                help="在相似度可达范围内均匀取若干下限，各自求偏离度最小的方案 (限定批次数时只用K个批次) 作为初始个体，结束后再对前沿方案做局部SLSQP精修，通常用少得多的代数即可得到更好的前沿"
+            )
+
+            early_stopping = st.checkbox(
+                "超体积收敛后提前停止",
+                value=st.session_state.get('nsga_early_stopping', True),
+                help="帕累托前沿不再改进时自动结束计算，通常可大幅缩短计算时间"
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                hv_window = st.number_input(
+                    "收敛判定窗口 (代)",
+                    5, 200,
+                    st.session_state.get('nsga_hv_window', 30),
+                    disabled=not early_stopping,
+                    help="在该代数窗口内比较超体积的提升幅度"
+                )
+            with col2:
+                hv_tolerance = st.number_input(
+                    "超体积相对提升阈值",
+                    0.0, 0.1,
+                    st.session_state.get('nsga_hv_tolerance', 0.001),
+                    format="%.4f",
+                    disabled=not early_stopping,
+                    help="窗口内超体积相对提升低于该值即视为收敛"
+                )
+
+            checkpoint_enabled = st.checkbox(
+                "启用断点续算",
+                value=st.session_state.get('nsga_checkpoint_enabled', True),
+                help="计算过程中定期保存检查点，页面刷新或服务重启后以相同数据和参数重新提交即可从中断处继续"
             )
 
+            background = st.checkbox(
+                "后台运行",
+                value=st.session_state.get('nsga_background', True),
+                help="在后台线程中计算，页面保持可操作并实时显示进度，可随时取消"
+            )
+
+            island_model = st.checkbox(
+                "启用多进程岛屿模型",
+                value=st.session_state.get('nsga_island_model', False),
+                help="多个子种群在不同CPU核心上并行演化，并定期交换精英个体，适合大批次数据"
+            )
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                num_islands = st.number_input(
+                    "岛屿数量",
+                    2, 32,
+                    st.session_state.get('nsga_num_islands', min(os.cpu_count() or 2, 8)),
+                    disabled=not island_model,
+                    help="并行演化的子种群数量，建议不超过服务器CPU核心数"
+                )
+            with col2:
+                migration_interval = st.number_input(
+                    "迁移间隔 (代)",
+                    5, 100,
+                    st.session_state.get('nsga_migration_interval', 20),
+                    disabled=not island_model,
+                    help="每隔多少代在岛屿之间交换一次精英个体"
+                )
+            with col3:
+                migration_size = st.number_input(
+                    "迁移个体数",
+                    1, 50,
+                    st.session_state.get('nsga_migration_size', 5),
+                    disabled=not island_model,
+                    help="每次迁移时各岛屿送出的精英个体数量"
+                )
+
             # 保存NSGA-II参数
             st.session_state.nsga_params = {
                 'target_values': np.array([target_gg, target_ga]),
@@ -5882,6 +6264,22 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
                 'crossover_prob': 0.7,
                 'mutation_prob': 0.3,
                 'mutation_strength': 0.1,
+                'seed': int(seed) if seed else None,
+                'encoding': encoding,
+                'feasible_init': feasible_init,
+                'memetic': memetic,
+                'memetic_seeds': 8,
+                'polish_iterations': 30,
+                'early_stopping': early_stopping,
+                'hv_window': int(hv_window),
+                'hv_tolerance': hv_tolerance,
+                'island_model': island_model,
+                'num_islands': int(num_islands),
+                'migration_interval': int(migration_interval),
+                'migration_size': int(migration_size),
+                'checkpoint_dir': CHECKPOINT_DIR if checkpoint_enabled else None,
+                'checkpoint_interval': 10,
+                'background': background,
                 'total_mix_amount': st.session_state.total_mix_amount
             }
 
@@ -5889,6 +6287,44 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
             estimated_time = (pop_size * gens) / 20000  # 粗略估算
             st.info(f"⏱️ 预计计算时间：约 {estimated_time:.1f} 分钟")
 
+        elif st.session_state.optimization_mode == '精确帕累托前沿 (ε-约束)':
+            st.markdown("#### 🎯 精确前沿目标设置")
+            st.info("不限制批次数时，含量偏差与相似度两个目标均为凸函数，可用ε-约束法逐点精确求出帕累托前沿。")
+
+            col1, col2, col3 = st.columns(3)
+            gg_g_col = st.session_state.col_map.get('gg_g', '甘草苷')
+            ga_g_col = st.session_state.col_map.get('ga_g', '甘草酸')
+
+            with col1:
+                target_gg = st.number_input(
+                    f"目标-{gg_g_col} (mg/g)",
+                    value=st.session_state.get('nsga_target_gg', 5.0),
+                    format="%.4f",
+                    key="exact_target_gg",
+                    help="甘草苷目标含量"
+                )
+            with col2:
+                target_ga = st.number_input(
+                    f"目标-{ga_g_col} (mg/g)",
+                    value=st.session_state.get('nsga_target_ga', 20.0),
+                    format="%.4f",
+                    key="exact_target_ga",
+                    help="甘草酸目标含量"
+                )
+            with col3:
+                num_points = st.number_input(
+                    "前沿点数",
+                    5, 200,
+                    st.session_state.get('exact_num_points', 20),
+                    help="在两个端点之间均匀取的ε值个数，每个ε点求解一次凸优化"
+                )
+
+            st.session_state.exact_params = {
+                'target_values': np.array([target_gg, target_ga]),
+                'num_points': int(num_points),
+                'total_mix_amount': st.session_state.total_mix_amount
+            }
+
     # 替换原有的数据可视化选项
     update_analysis_dashboard()
 
@@ -6042,6 +6478,9 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
         if st.session_state.optimization_mode == '质量/成本最优 (SLSQP)':
             button_text = "🚀 执行 SLSQP 优化计算"
             button_help = "快速单目标优化，通常几秒钟完成"
+        elif st.session_state.optimization_mode == '精确帕累托前沿 (ε-约束)':
+            button_text = "📐 计算精确帕累托前沿"
+            button_help = "并行求解一组凸优化问题，通常几秒钟完成"
         else:
             button_text = "🧬 执行 NSGA-II 多目标优化"
             button_help = "多目标进化算法，可能需要几分钟时间"
@@ -6077,109 +6516,133 @@ elif st.session_state.app_state == 'ANALYSIS_READY':
                     fingerprint_options = {**st.session_state.fingerprint_options, 'target_profile': target_profile,
                                            'f_cols': col_map.get('f_cols', [])}
 
-                    with st.spinner('🚀 正在执行SLSQP单目标优化...'):
-                        result = run_hybrid_optimization_universal(
-                            full_selected_data, st.session_state.total_mix_amount, col_map, MINIMUM_STANDARDS,
-                            fingerprint_options, st.session_state.drug_type, st.session_state.get('target_contents')
-                        )
+                    # 数值问题只构建一次, 求解、结果展示与失败诊断共用
+                    blend_problem = build_blend_problem(
+                        full_selected_data, col_map, st.session_state.total_mix_amount, MINIMUM_STANDARDS,
+                        fingerprint_options, st.session_state.get('target_contents')
+                    )
 
-                    if result.success:
+                    # 阶段一: 线性约束 (最低标准、总量、库存) 不可行时不进入非线性求解, 直接诊断
+                    feasibility = check_linear_feasibility(blend_problem)
+                    result = None
+                    if feasibility['feasible']:
+                        with st.spinner('🚀 正在执行SLSQP单目标优化...'):
+                            result = run_hybrid_optimization_universal(
+                                full_selected_data, st.session_state.total_mix_amount, col_map, MINIMUM_STANDARDS,
+                                fingerprint_options, st.session_state.drug_type,
+                                st.session_state.get('target_contents'), blend_problem,
+                                max_batches=st.session_state.get('slsqp_max_batches', 0),
+                                exact_count=st.session_state.get('slsqp_exact_count', False),
+                                grid_step=st.session_state.get('grid_step', 1.0)
+                                if st.session_state.get('dispensing_enabled') else 0.0,
+                                min_draw=st.session_state.get('min_draw', 0.0),
+                                local_search=st.session_state.get('cardinality_engine', '').startswith("局部搜索")
+                            )
+                    if st.session_state.get('elastic_mode') and (result is None or not result.success):
+                        with st.spinner('🚀 约束无法同时满足, 正在求解缺口最小的方案...'):
+                            elastic_result = run_hybrid_optimization_universal(
+                                full_selected_data, st.session_state.total_mix_amount, col_map, MINIMUM_STANDARDS,
+                                fingerprint_options, st.session_state.drug_type,
+                                st.session_state.get('target_contents'), blend_problem, elastic=True,
+                                max_batches=st.session_state.get('slsqp_max_batches', 0),
+                                grid_step=st.session_state.get('grid_step', 1.0)
+                                if st.session_state.get('dispensing_enabled') else 0.0
+                            )
+                        # 弹性求解也失败时保留原结果 (其 message 说明了批次数上限/称量网格下失败的原因)
+                        if result is None or elastic_result.success:
+                            result = elastic_result
+
+                    if result is not None and result.success:
                         st.session_state.optimization_result = {
                             'result': result,
                             'selected_data': full_selected_data,
                             'constraints': MINIMUM_STANDARDS,
-                            'fp_options': fingerprint_options
+                            'fp_options': fingerprint_options,
+                            'problem': blend_problem
                         }
                         display_successful_result_universal_enhanced(
                             result, full_selected_data, st.session_state.total_mix_amount,
                             col_map, MINIMUM_STANDARDS, fingerprint_options,
-                            st.session_state.drug_type, st.session_state.get('target_contents')
+                            st.session_state.drug_type, st.session_state.get('target_contents'), blend_problem
                         )
                     else:
                         provide_failure_analysis_universal_enhanced_chinese(
                             full_selected_data, col_map, MINIMUM_STANDARDS,
-                            fingerprint_options, st.session_state.drug_type
+                            fingerprint_options, st.session_state.drug_type, blend_problem, feasibility, result
                         )
 
 
                 elif st.session_state.optimization_mode == '多目标均衡 (NSGA-II)':
 
-                    with st.spinner('🧬 正在执行NSGA-II多目标进化计算，请稍候...'):
-
-                        solutions, values = run_nsga2_optimization(full_selected_data, col_map,
-
-                                                                   st.session_state.nsga_params)
-
-                    if solutions:
+                    nsga_params = st.session_state.nsga_params
 
-                        display_nsga2_results(solutions, values, full_selected_data, col_map,
+                    # 提交新计算前先取消仍在运行的后台计算
+                    if 'nsga2_job' in st.session_state:
+                        st.session_state.nsga2_job['cancel_event'].set()
+                        del st.session_state['nsga2_job']
 
-                                              st.session_state.total_mix_amount)
+                    if nsga_params.get('background'):
 
-                        # 保存NSGA-II结果以便导出 - 使用第一个解作为代表
+                        st.session_state.nsga2_job = start_background_run(
+                            *prepare_nsga2_inputs(full_selected_data, col_map, nsga_params), dict(nsga_params))
 
-                        representative_result_x = solutions[0]
+                        st.session_state.nsga2_job_context = {
 
-                        representative_result = {
-
-                            'x': representative_result_x,
+                            'selected_data': full_selected_data,
 
-                            'fun': values[0][0],
+                            'constraints': MINIMUM_STANDARDS,
 
-                            'success': True  # 添加成功标志
+                            'nsga_params': dict(nsga_params)
 
                         }
 
-                        # 保存完整的NSGA-II结果
+                    else:
 
-                        st.session_state.optimization_result = {
+                        with st.spinner('🧬 正在执行NSGA-II多目标进化计算，请稍候...'):
 
-                            'result': representative_result,
+                            solutions, values, run_info = run_nsga2_optimization(full_selected_data, col_map,
 
-                            'selected_data': full_selected_data,
+                                                                                 nsga_params)
 
-                            'constraints': MINIMUM_STANDARDS,
+                        if solutions:
 
-                            'fp_options': {},
+                            save_nsga2_result(solutions, values, run_info, full_selected_data, MINIMUM_STANDARDS)
 
-                            'nsga_results': {  # 添加NSGA-II专有结果
+                        show_nsga2_outcome(solutions, values, run_info, full_selected_data, col_map,
 
-                                'all_solutions': solutions,
+                                           st.session_state.total_mix_amount)
 
-                                'all_values': values,
+                elif st.session_state.optimization_mode == '精确帕累托前沿 (ε-约束)':
 
-                                'fronts': fast_non_dominated_sort(values)
+                    exact_params = st.session_state.exact_params
 
-                            }
+                    with st.spinner('📐 正在并行求解ε-约束凸优化问题...'):
 
-                        }
-
-                    else:
+                        solutions, values, run_info = exact_pareto_front(
 
-                        st.error("🚫 NSGA-II 优化失败")
+                            *prepare_nsga2_inputs(full_selected_data, col_map, exact_params), exact_params,
 
-                        st.markdown("""
+                            exact_params['num_points'])
 
-                        **可能的原因：**
-
-                        - 选择的批次组合无法满足所有硬性约束
+                    if solutions:
 
-                        - 库存量设置过低
+                        save_nsga2_result(solutions, values, run_info, full_selected_data, MINIMUM_STANDARDS)
 
-                        - 目标值设置不合理
+                    show_nsga2_outcome(solutions, values, run_info, full_selected_data, col_map,
 
+                                       st.session_state.total_mix_amount)
 
-                        **建议解决方案：**
+        # 后台计算: 运行中显示进度面板, 结束后显示结果 (直到下一次提交计算)
+        if 'nsga2_job' in st.session_state:
 
-                        1. 增加批次选择，特别是质量均衡的批次
+            if st.session_state.nsga2_job['status'] == 'running':
 
-                        2. 检查并调整库存量设置
+                monitor_nsga2_background_job()
 
-                        3. 适当放宽目标含量要求
+            else:
 
-                        4. 尝试使用SLSQP引擎进行初步测试
+                show_nsga2_background_result(col_map)
 
-                        """)
     else:
         st.info("🎯 请先选择优化引擎，然后进行批次选择和参数设置")
 
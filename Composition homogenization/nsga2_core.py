@@ -0,0 +1,1338 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import types
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linprog, minimize
+
+# ##############################################################################
+# --- NSGA-II 数值核心 (纯 NumPy 实现, 供 main_app.py / NSGA-II.py / test.py 共用) ---
+# ##############################################################################
+
+# VIP 值 (甘草苷, 甘草酸) 及由此得到的含量偏离度权重
+VIP_VALUES = np.array([1.01558, 1.05139])
+CONTENT_WEIGHTS = VIP_VALUES / VIP_VALUES.sum()
+
+# 甘草苷 ≥ 4.5 mg/g, 甘草酸 ≥ 18 mg/g
+MIN_CONTENTS = np.array([4.5, 18.0])
+
+
+# --- 批量目标评估 ---
+def decode_population(raw_population, num_batches_to_select):
+    """
+    将原始基因矩阵解码为混合比例矩阵
+    - 每行只保留数值最大的 num_batches_to_select 个批次 (0 表示不限制)
+    - 每行归一化为和为 1
+    - 返回: (proportions, valid), valid 标记行和大于 0 的个体
+    """
+    proportions = np.array(raw_population, dtype=float, ndmin=2)
+    num_batches = proportions.shape[1]
+
+    if 0 < num_batches_to_select < num_batches:
+        dropped = np.argpartition(proportions, num_batches - num_batches_to_select, axis=1)
+        np.put_along_axis(proportions, dropped[:, :num_batches - num_batches_to_select], 0.0, axis=1)
+
+    sums = proportions.sum(axis=1)
+    valid = sums > 0
+    proportions[valid] /= sums[valid, None]
+    return proportions, valid
+
+
+def evaluate_population(raw_population, ingredient_matrix, similarity_vector, target_ingredients, inventory,
+                        total_mix_amount, num_batches_to_select, min_contents=MIN_CONTENTS):
+    """
+    整个种群一次性评估
+    - ingredient_matrix: (n_batches, 2) 甘草苷/甘草酸含量矩阵
+    - similarity_vector: (n_batches,) 相似度
+    - 目标1: 最小化加权含量偏离度; 目标2: 最小化负相似度
+    - 返回: (values, violations, proportions)
+      values 为真实目标值 (不可行个体不再被压成同一个惩罚点)
+      violations 为约束违反度, 0 表示可行, 供约束支配排序使用
+    """
+    proportions, valid = decode_population(raw_population, num_batches_to_select)
+
+    blended_ingredients = proportions @ ingredient_matrix
+    blended_similarity = proportions @ similarity_vector
+
+    values = objective_values(blended_ingredients, blended_similarity, target_ingredients)
+    violations = constraint_violation(proportions, valid, blended_ingredients, inventory, total_mix_amount,
+                                      min_contents)
+    return values, violations, proportions
+
+
+def objective_values(blended_ingredients, blended_similarity, target_ingredients):
+    """由混合后的含量与相似度计算目标值矩阵 [加权含量偏离度, -相似度]"""
+    weighted_deviation = np.sqrt(((blended_ingredients - target_ingredients) ** 2) @ CONTENT_WEIGHTS)
+    return np.column_stack([weighted_deviation, -blended_similarity])
+
+
+def constraint_violation(proportions, valid, blended_ingredients, inventory, total_mix_amount,
+                         min_contents=MIN_CONTENTS):
+    """
+    分级约束违反度 (越大越不可行)
+    - 最低含量: 低于下限的相对缺口 (min - 实际) / min
+    - 库存: 超出库存的总克数占混合总量的比例
+    - 比例全为 0 的个体无法构成配方, 违反度为无穷大
+    稀疏编码时 proportions / inventory 为与 K 个批次索引对齐的 (N, K) 矩阵
+    """
+    shortfall = np.maximum(min_contents - blended_ingredients, 0) / min_contents
+    excess = np.maximum(proportions * total_mix_amount - inventory, 0).sum(axis=1) / total_mix_amount
+    violations = shortfall.sum(axis=1) + excess
+    violations[~valid] = np.inf
+    return violations
+
+
+# --- 稀疏 Top-K 基因编码 ---
+# 每个个体只保存 K 个批次索引和 K 个权重 (结构化数组, 字段 indices / weights),
+# 评估复杂度为 O(K·d) 而不是 O(n_batches·d), 适合数千乃至上万个候选批次
+def sparse_genome_dtype(k):
+    """K 个批次的稀疏基因类型"""
+    return np.dtype([('indices', np.int64, (k,)), ('weights', float, (k,))])
+
+
+def is_sparse_population(population):
+    """种群是否为稀疏编码 (结构化数组)"""
+    return np.asarray(population).dtype.names is not None
+
+
+def random_sparse_population(rng, num_batches, k, size):
+    """随机初始化稀疏种群: 每个个体不放回地抽取 K 个批次, 权重服从 Dirichlet(1)"""
+    genomes = np.empty(size, dtype=sparse_genome_dtype(k))
+    genomes['indices'] = np.argpartition(rng.random((size, num_batches)), k, axis=1)[:, :k]
+    genomes['weights'] = rng.dirichlet(np.ones(k), size=size)
+    return genomes
+
+
+def initial_population(rng, ingredient_matrix, inventory, params):
+    """
+    初始种群
+    - params['encoding'] == 'sparse' 且 0 < num_batches_to_select < num_batches 时使用稀疏编码,
+      否则为 (population_size, num_batches) 的稠密矩阵
+    - params['feasible_init'] 为 True 时在可行域内均匀采样 (见 sample_feasible_population),
+      无法找到可行点的个体以及未启用时, 权重服从 Dirichlet(1)
+    """
+    num_batches = len(inventory)
+    k = params['num_batches_to_select']
+    sparse_encoding = params.get('encoding') == 'sparse' and 0 < k < num_batches
+
+    if params.get('feasible_init'):
+        genomes = sample_feasible_population(rng, ingredient_matrix, inventory, params['total_mix_amount'],
+                                             params['population_size'], k)
+        if sparse_encoding:
+            return genomes
+        # 稠密基因解码时会重新归一化, 放大 K 倍使非零基因平均为 1, 不至于被高斯变异的噪声淹没
+        return densify_genomes(genomes, num_batches) * genomes['indices'].shape[1]
+    if sparse_encoding:
+        return random_sparse_population(rng, num_batches, k, params['population_size'])
+    return rng.dirichlet(np.ones(num_batches), size=params['population_size'])
+
+
+def evaluate_sparse_population(genomes, ingredient_matrix, similarity_vector, target_ingredients, inventory,
+                               total_mix_amount, min_contents=MIN_CONTENTS):
+    """
+    稀疏种群的批量评估, 只读取每个个体的 K 个批次
+    - 返回: (values, violations, proportions), proportions 为权重归一化后的稀疏基因
+    """
+    indices = genomes['indices']
+    weights = _normalize_rows(genomes['weights'])
+    valid = weights.sum(axis=1) > 0
+
+    blended_ingredients = np.einsum('nk,nkd->nd', weights, ingredient_matrix[indices])
+    blended_similarity = np.einsum('nk,nk->n', weights, similarity_vector[indices])
+
+    values = objective_values(blended_ingredients, blended_similarity, target_ingredients)
+    violations = constraint_violation(weights, valid, blended_ingredients, inventory[indices], total_mix_amount,
+                                      min_contents)
+
+    proportions = genomes.copy()
+    proportions['weights'] = weights
+    return values, violations, proportions
+
+
+def evaluate_genomes(population, ingredient_matrix, similarity_vector, inventory, params):
+    """按种群的编码方式 (稠密 / 稀疏) 调用对应的批量评估函数"""
+    if is_sparse_population(population):
+        return evaluate_sparse_population(population, ingredient_matrix, similarity_vector, params['target_values'],
+                                          inventory, params['total_mix_amount'])
+    return evaluate_population(population, ingredient_matrix, similarity_vector, params['target_values'],
+                               inventory, params['total_mix_amount'], params['num_batches_to_select'])
+
+
+def densify_genomes(genomes, num_batches):
+    """稀疏基因 → (N, num_batches) 稠密比例矩阵; 稠密矩阵或 None 原样返回"""
+    if genomes is None or not is_sparse_population(genomes):
+        return genomes
+    dense = np.zeros((len(genomes), num_batches))
+    np.put_along_axis(dense, genomes['indices'], _normalize_rows(genomes['weights']), axis=1)
+    return dense
+
+
+def sparsify_proportions(proportions, k):
+    """(N, num_batches) 混合比例 → 稀疏基因, 每行保留比例最大的 K 个批次"""
+    proportions = np.asarray(proportions, dtype=float)
+    genomes = np.empty(len(proportions), dtype=sparse_genome_dtype(k))
+    genomes['indices'] = np.argpartition(-proportions, k - 1, axis=1)[:, :k]
+    genomes['weights'] = np.take_along_axis(proportions, genomes['indices'], axis=1)
+    return genomes
+
+
+def _normalize_rows(weights):
+    """每行归一化为和为 1, 全为 0 的行保持不变"""
+    weights = np.array(weights, dtype=float)
+    sums = weights.sum(axis=1)
+    positive = sums > 0
+    weights[positive] /= sums[positive, None]
+    return weights
+
+
+# --- 可行域采样 (初始化种群) ---
+# 可行域为多面体 {x ≥ 0, Σx = 1, x ≤ 库存/总量, Mᵀx ≥ 最低含量}
+def sample_feasible_population(rng, ingredient_matrix, inventory, total_mix_amount, size, k=0,
+                               min_contents=MIN_CONTENTS, num_steps=50):
+    """
+    在可行域内近似均匀地采样初始种群
+    - 限定 K 个批次 (0 < k < 批次数) 时, 每个个体先用随机目标的线性规划求一个可行顶点,
+      以其非零批次为基础随机补足 K 个批次; 不限定时所有个体使用全部批次
+    - 以线性规划求得的内点为起点, 各个体并行做 num_steps 步 hit-and-run 随机游走
+    - 返回: 稀疏基因数组 (不限定批次数时 K 为全部批次);
+      无法找到可行点的个体 (约束本身不可行、或 K 个批次无法满足) 权重服从 Dirichlet(1)
+    """
+    num_batches = len(inventory)
+    upper_bounds = np.minimum(1.0, np.asarray(inventory, dtype=float) / total_mix_amount)
+    limited = 0 < k < num_batches
+    k = k if limited else num_batches
+
+    if limited:
+        genomes = random_sparse_population(rng, num_batches, k, size)
+    else:
+        genomes = np.empty(size, dtype=sparse_genome_dtype(k))
+        genomes['indices'] = np.arange(num_batches)
+        genomes['weights'] = rng.dirichlet(np.ones(k), size=size)
+
+    starts = np.zeros((size, k))
+    found = np.zeros(size, dtype=bool)
+    if limited:
+        for i in range(size):
+            vertex = _random_vertex(rng, ingredient_matrix, upper_bounds, min_contents)
+            if vertex is None:
+                break  # 随机目标下不可行即整个可行域为空
+            support = np.flatnonzero(vertex > 1e-12)
+            if support.size > k:
+                continue
+            others = np.setdiff1d(np.arange(num_batches), support)
+            indices = np.r_[support, rng.choice(others, k - support.size, replace=False)]
+            point = _interior_point(ingredient_matrix[indices], upper_bounds[indices], min_contents)
+            if point is not None:
+                genomes['indices'][i], starts[i], found[i] = indices, point, True
+    else:
+        point = _interior_point(ingredient_matrix, upper_bounds, min_contents)
+        if point is not None:
+            starts[:], found[:] = point, True
+
+    if found.any():
+        indices = genomes['indices'][found]
+        genomes['weights'][found] = hit_and_run(rng, starts[found], upper_bounds[indices],
+                                                ingredient_matrix[indices], min_contents, num_steps)
+    return genomes
+
+
+def hit_and_run(rng, start, upper_bounds, support_matrices, min_contents=MIN_CONTENTS, num_steps=50):
+    """
+    并行 hit-and-run: 每条链在 {x ≥ 0, Σx = 1, x ≤ u, Mᵀx ≥ b} 内随机游走, 平稳分布为可行域上的均匀分布
+    每步在 Σx = 1 的平面内取随机方向, 求出该方向上仍可行的步长区间 [t_min, t_max], 再均匀抽取步长
+    - start / upper_bounds: (N, K); support_matrices: (N, K, d) 各条链候选批次的含量矩阵
+    - 返回: (N, K) 采样点
+    """
+    x = np.array(start, dtype=float)
+    for _ in range(num_steps):
+        direction = rng.normal(size=x.shape)
+        direction -= direction.mean(axis=1, keepdims=True)
+        direction /= np.maximum(np.linalg.norm(direction, axis=1, keepdims=True), 1e-12)
+
+        slack = np.einsum('nk,nkd->nd', x, support_matrices) - min_contents
+        rate = np.einsum('nk,nkd->nd', direction, support_matrices)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 比例上下界 0 ≤ x + t·d ≤ u
+            to_lower = np.where(direction != 0, -x / direction, np.nan)
+            to_upper = np.where(direction != 0, (upper_bounds - x) / direction, np.nan)
+            # 最低含量 slack + t·rate ≥ 0
+            to_floor = np.where(rate != 0, -slack / rate, np.nan)
+
+        positive, negative = direction > 0, direction < 0
+        t_min = np.max(np.where(positive, to_lower, np.where(negative, to_upper, -np.inf)), axis=1)
+        t_max = np.min(np.where(positive, to_upper, np.where(negative, to_lower, np.inf)), axis=1)
+        t_min = np.maximum(t_min, np.max(np.where(rate > 0, to_floor, -np.inf), axis=1))
+        t_max = np.minimum(t_max, np.min(np.where(rate < 0, to_floor, np.inf), axis=1))
+
+        # 数值误差可能使区间略微不含 0, 此时原地不动
+        t = rng.uniform(np.minimum(t_min, 0), np.maximum(t_max, 0))
+        t[~(t_min <= t_max)] = 0.0
+        x += t[:, None] * direction
+        np.clip(x, 0, upper_bounds, out=x)
+
+    return _normalize_rows(x)
+
+
+def _random_vertex(rng, ingredient_matrix, upper_bounds, min_contents):
+    """随机目标的线性规划, 返回可行域的一个顶点 (非零批次很少); 不可行时返回 None"""
+    result = linprog(rng.random(len(upper_bounds)), A_ub=-ingredient_matrix.T, b_ub=-min_contents,
+                     A_eq=np.ones((1, len(upper_bounds))), b_eq=[1.0],
+                     bounds=np.column_stack([np.zeros(len(upper_bounds)), upper_bounds]), method='highs')
+    return result.x if result.status == 0 else None
+
+
+def _interior_point(ingredient_matrix, upper_bounds, min_contents):
+    """
+    线性规划求可行域的内点: 最大化 s, 使各比例到上下界的距离、各含量相对最低含量的余量都不小于 s
+    不可行时返回 None
+    """
+    num_batches, num_contents = ingredient_matrix.shape
+    eye = sparse.identity(num_batches, format='csr')
+    slack_column = sparse.csr_matrix(np.ones((2 * num_batches + num_contents, 1)))
+    a_ub = sparse.hstack([sparse.vstack([-eye, eye, sparse.csr_matrix(-(ingredient_matrix / min_contents).T)]),
+                          slack_column], format='csr')
+    b_ub = np.r_[np.zeros(num_batches), upper_bounds, -np.ones(num_contents)]
+
+    result = linprog(np.r_[np.zeros(num_batches), -1.0], A_ub=a_ub, b_ub=b_ub,
+                     A_eq=np.r_[np.ones(num_batches), 0.0][None, :], b_eq=[1.0],
+                     bounds=(0, None), method='highs')
+    return result.x[:num_batches] if result.status == 0 else None
+
+
+# --- 快速非支配排序 ---
+def fast_non_dominated_sort(values, violations=None):
+    """
+    向量化的快速非支配排序
+    - values: (N, M) 目标值矩阵 (所有目标均为越小越好)
+    - violations: 可选, (N,) 约束违反度; 给出时按 Deb 约束支配规则排序:
+      可行解支配不可行解, 不可行解之间违反度小者占优, 可行解之间按普通 Pareto 支配
+    - 返回: 前沿列表, 每个前沿是个体索引的升序列表 (与原双重循环实现的输出格式一致)
+    双目标时走 O(N log N) 的快速路径, 其它情况用广播一次性构造支配矩阵
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or len(values) == 0:
+        return []
+    if violations is not None:
+        return _constrained_non_dominated_sort(values, np.asarray(violations, dtype=float))
+    if values.shape[1] == 2:
+        return _non_dominated_sort_2d(values)
+    return _non_dominated_sort_nd(values)
+
+
+def _constrained_non_dominated_sort(values, violations):
+    """约束支配排序: 可行解的各层前沿在前, 其后每个违反度取值单独构成一层 (违反度相同者互不支配)"""
+    feasible = np.flatnonzero(violations <= 0)
+    infeasible = np.flatnonzero(violations > 0)
+
+    fronts = []
+    if feasible.size > 0:
+        fronts.extend(feasible[front].tolist() for front in fast_non_dominated_sort(values[feasible]))
+    if infeasible.size > 0:
+        _, level = np.unique(violations[infeasible], return_inverse=True)
+        order = np.argsort(level, kind='stable')
+        boundaries = np.flatnonzero(np.diff(level[order])) + 1
+        fronts.extend(group.tolist() for group in np.split(infeasible[order], boundaries))
+    return fronts
+
+
+def _dominance_matrix(values):
+    """dominates[p, q] 为 True 表示个体 p 支配个体 q"""
+    less_equal = np.all(values[:, None, :] <= values[None, :, :], axis=2)
+    strictly_less = np.any(values[:, None, :] < values[None, :, :], axis=2)
+    return less_equal & strictly_less
+
+
+def _non_dominated_sort_nd(values):
+    """通用 M 目标版本: 支配矩阵 + 逐层剥离"""
+    dominates = _dominance_matrix(values)
+    dominated_count = dominates.sum(axis=0)
+    remaining = np.ones(len(values), dtype=bool)
+
+    fronts = []
+    current = np.flatnonzero(dominated_count == 0)
+    while current.size > 0:
+        fronts.append(current.tolist())
+        remaining[current] = False
+        dominated_count = dominated_count - dominates[current].sum(axis=0)
+        current = np.flatnonzero(remaining & (dominated_count == 0))
+    return fronts
+
+
+def _non_dominated_sort_2d(values):
+    """
+    双目标 O(N log N) 版本
+    按 (f1, f2) 字典序排序后依次插入: 同一前沿内 f2 单调不增, 因此只需记录每个前沿
+    最后加入的点, 再用二分查找定位第一个不支配当前点的前沿
+    """
+    order = np.lexsort((values[:, 1], values[:, 0]))
+    last_f1, last_f2 = [], []
+    members = []
+
+    for idx in order:
+        f1, f2 = values[idx, 0], values[idx, 1]
+        lo, hi = 0, len(members)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            # 前沿 mid 的最后一个点支配当前点 (完全相同的点互不支配)
+            if last_f2[mid] < f2 or (last_f2[mid] == f2 and last_f1[mid] < f1):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(members):
+            members.append([idx])
+            last_f1.append(f1)
+            last_f2.append(f2)
+        else:
+            members[lo].append(idx)
+            last_f1[lo] = f1
+            last_f2[lo] = f2
+
+    return [sorted(int(i) for i in front) for front in members]
+
+
+# --- 拥挤距离与环境选择 ---
+def fronts_to_ranks(fronts, population_size):
+    """将前沿列表转换为等级数组, ranks[i] 为个体 i 所在前沿的序号 (0 为第一前沿)"""
+    ranks = np.zeros(population_size, dtype=int)
+    for rank, front in enumerate(fronts):
+        ranks[front] = rank
+    return ranks
+
+
+def crowding_distance(values, ranks):
+    """
+    一次性计算所有前沿的拥挤距离
+    - 对每个目标按 (等级, 目标值) 排序, 同一前沿内相邻差分并按该前沿的目标值跨度归一化
+    - 每个前沿在每个目标上的两端个体距离为无穷大
+    - 返回: (N,) 拥挤距离数组
+    """
+    values = np.asarray(values, dtype=float)
+    ranks = np.asarray(ranks)
+    population_size, num_objectives = values.shape
+    distances = np.zeros(population_size)
+    if population_size == 0:
+        return distances
+
+    for m in range(num_objectives):
+        order = np.lexsort((values[:, m], ranks))
+        sorted_ranks = ranks[order]
+        sorted_values = values[order, m]
+
+        is_first = np.r_[True, sorted_ranks[1:] != sorted_ranks[:-1]]
+        is_last = np.r_[sorted_ranks[1:] != sorted_ranks[:-1], True]
+        group = np.cumsum(is_first) - 1
+        span = (sorted_values[is_last] - sorted_values[is_first])[group]
+
+        gap = np.zeros(population_size)
+        gap[1:-1] = sorted_values[2:] - sorted_values[:-2]
+        interior = ~(is_first | is_last) & (span > 0)
+
+        contribution = np.zeros(population_size)
+        contribution[interior] = gap[interior] / span[interior]
+        contribution[is_first | is_last] = np.inf
+        distances[order] += contribution
+
+    return distances
+
+
+def select_survivors(values, population_size, violations=None):
+    """
+    NSGA-II 环境选择
+    按 (非支配等级升序, 拥挤距离降序) 做 lexsort, 取前 population_size 个个体
+    - violations: 可选, 给出时等级按约束支配规则计算
+    - 返回: 幸存者索引数组
+    """
+    values = np.asarray(values, dtype=float)
+    ranks = fronts_to_ranks(fast_non_dominated_sort(values, violations), len(values))
+    distances = crowding_distance(values, ranks)
+    order = np.lexsort((-distances, ranks))
+    return order[:population_size]
+
+
+def update_archive(archive_solutions, archive_values, solutions, values, violations, max_size):
+    """
+    精英存档: 合并已有存档与新解, 仅保留可行且互不支配的解 (目标值相同者只保留一个)
+    数量超过 max_size 时按拥挤距离截断, 以保持前沿分布均匀
+    - archive_solutions / archive_values 为 None 时表示空存档
+    - 返回: (archive_solutions, archive_values)
+    """
+    feasible = violations <= 0
+    solutions, values = solutions[feasible], values[feasible]
+    if archive_solutions is not None:
+        solutions = np.concatenate([archive_solutions, solutions])
+        values = np.vstack([archive_values, values])
+    if len(values) == 0:
+        return archive_solutions, archive_values
+
+    _, unique_indices = np.unique(values, axis=0, return_index=True)
+    solutions, values = solutions[unique_indices], values[unique_indices]
+
+    first_front = fast_non_dominated_sort(values)[0]
+    solutions, values = solutions[first_front], values[first_front]
+
+    if len(values) > max_size:
+        distances = crowding_distance(values, np.zeros(len(values), dtype=int))
+        kept = np.argsort(-distances, kind='stable')[:max_size]
+        solutions, values = solutions[kept], values[kept]
+    return solutions, values
+
+
+# --- 超体积指标与收敛判定 ---
+def hypervolume_reference_point(ingredient_matrix, similarity_vector, target_ingredients):
+    """
+    固定的超体积参考点 (目标空间的最差角点), 使各代的超体积可以直接比较
+    - 加权偏离度是混合比例的凸函数, 其最大值在单一批次处取得
+    - 负相似度是线性函数, 其最大值为 -min(相似度)
+    """
+    batch_deviations = np.sqrt(((ingredient_matrix - target_ingredients) ** 2) @ CONTENT_WEIGHTS)
+    return np.array([batch_deviations.max(), -similarity_vector.min()])
+
+
+def hypervolume_2d(values, reference_point):
+    """
+    双目标精确超体积 (最小化问题), 按目标1排序后一次扫描求矩形面积之和
+    参考点之外的点不贡献面积, 被支配的点由目标2的前缀最小值自动剔除
+    """
+    values = np.asarray(values, dtype=float).reshape(-1, 2)
+    values = values[np.all(values < reference_point, axis=1)]
+    if len(values) == 0:
+        return 0.0
+
+    values = values[np.lexsort((values[:, 1], values[:, 0]))]
+    best_f2 = np.minimum.accumulate(values[:, 1])
+    widths = np.diff(np.r_[values[:, 0], reference_point[0]])
+    return float(np.sum(widths * (reference_point[1] - best_f2)))
+
+
+def hypervolume_converged(history, window, tolerance):
+    """
+    收敛判定: 最近 window 代的超体积相对提升小于 tolerance 时返回 True
+    超体积仍为 0 (尚未找到可行解) 时不判定为收敛
+    """
+    if window <= 0 or len(history) <= window:
+        return False
+    previous, current = history[-window - 1], history[-1]
+    if previous <= 0:
+        return False
+    return (current - previous) < tolerance * previous
+
+
+# --- 变异算子 (整体种群的掩码数组运算, 统一由一个 np.random.Generator 驱动) ---
+def crossover(parents1, parents2, rng, prob):
+    """
+    算术交叉: 每对父代以概率 prob 进行交叉, alpha ~ U(0, 1)
+    未发生交叉的父代对直接复制 (alpha = 1)
+    """
+    num_pairs = len(parents1)
+    alpha = np.where(rng.random(num_pairs) < prob, rng.random(num_pairs), 1.0)[:, None]
+    child1 = alpha * parents1 + (1 - alpha) * parents2
+    child2 = (1 - alpha) * parents1 + alpha * parents2
+    return child1, child2
+
+
+def mutate(population, rng, prob, strength):
+    """高斯变异: 每个基因以概率 prob 加上 N(0, strength) 扰动, 并保证比例非负"""
+    mutated = np.array(population, dtype=float)
+    mask = rng.random(mutated.shape) < prob
+    mutated[mask] += rng.normal(0, strength, size=np.count_nonzero(mask))
+    np.maximum(mutated, 0, out=mutated)
+    return mutated
+
+
+def make_offspring(population, rng, crossover_prob, mutation_prob, mutation_strength, num_offspring=None):
+    """
+    随机配对 (两个父代互不相同) → 算术交叉 → 高斯变异
+    - population: (N, n_batches) 矩阵, N ≥ 2
+    - 返回: (num_offspring, n_batches) 子代矩阵, 默认与种群规模相同
+    """
+    num_offspring = len(population) if num_offspring is None else num_offspring
+    first, second = _mating_pairs(rng, len(population), (num_offspring + 1) // 2)
+
+    child1, child2 = crossover(population[first], population[second], rng, crossover_prob)
+    children = _interleave(child1, child2)
+    return mutate(children[:num_offspring], rng, mutation_prob, mutation_strength)
+
+
+def _mating_pairs(rng, population_size, num_pairs):
+    """随机配对, 每对中的两个父代互不相同"""
+    first = rng.integers(population_size, size=num_pairs)
+    second = (first + rng.integers(1, population_size, size=num_pairs)) % population_size
+    return first, second
+
+
+def _interleave(child1, child2):
+    """子代按 [c1_0, c2_0, c1_1, c2_1, ...] 交错排列"""
+    children = np.empty((2 * len(child1),) + child1.shape[1:], dtype=child1.dtype)
+    children[0::2] = child1
+    children[1::2] = child2
+    return children
+
+
+def sparse_crossover(parents1, parents2, rng, prob):
+    """
+    稀疏基因的集合感知交叉: 每对父代以概率 prob 重组, alpha ~ U(0, 1)
+    未发生交叉的父代对直接复制
+    """
+    child1, child2 = parents1.copy(), parents2.copy()
+    crossed = rng.random(len(parents1)) < prob
+    if crossed.any():
+        alpha = rng.random(np.count_nonzero(crossed))[:, None]
+        child1[crossed] = _recombine_sets(parents1[crossed], parents2[crossed], alpha, rng)
+        child2[crossed] = _recombine_sets(parents1[crossed], parents2[crossed], 1 - alpha, rng)
+    return child1, child2
+
+
+def _recombine_sets(parents1, parents2, alpha, rng):
+    """
+    两个父代共有的批次全部保留, 权重为 alpha·w1 + (1-alpha)·w2;
+    剩余名额从只属于一个父代的批次中随机抽取, 沿用该父代按 alpha (或 1-alpha) 缩放后的权重
+    """
+    k = parents1['indices'].shape[1]
+    indices = np.hstack([parents1['indices'], parents2['indices']])
+    weights = np.hstack([alpha * _normalize_rows(parents1['weights']),
+                         (1 - alpha) * _normalize_rows(parents2['weights'])])
+
+    # 按批次索引排序后, 共有批次在相邻位置成对出现; 合并权重到前一个位置
+    order = np.argsort(indices, axis=1)
+    indices = np.take_along_axis(indices, order, axis=1)
+    weights = np.take_along_axis(weights, order, axis=1)
+    duplicate = indices[:, 1:] == indices[:, :-1]
+    weights[:, :-1] += np.where(duplicate, weights[:, 1:], 0.0)
+
+    # 共有批次优先 (-1), 重复位置永不选中 (inf), 其余随机排序
+    keys = rng.random(indices.shape)
+    keys[:, :-1][duplicate] = -1.0
+    keys[:, 1:][duplicate] = np.inf
+    chosen = np.argpartition(keys, k - 1, axis=1)[:, :k]
+
+    children = np.empty(len(indices), dtype=parents1.dtype)
+    children['indices'] = np.take_along_axis(indices, chosen, axis=1)
+    children['weights'] = np.take_along_axis(weights, chosen, axis=1)
+    return children
+
+
+def sparse_mutate(genomes, rng, prob, strength, num_batches):
+    """
+    稀疏基因变异
+    - 换入: 每个个体以概率 prob 将随机一个位置的批次换成组合外的批次 (保留该位置的权重)
+    - 重新分配权重: 每个权重以概率 prob 加上 N(0, strength) 扰动, 并保证非负
+    """
+    mutated = genomes.copy()
+    indices, weights = mutated['indices'], mutated['weights']
+
+    rows = np.flatnonzero(rng.random(len(mutated)) < prob)
+    slots = rng.integers(indices.shape[1], size=rows.size)
+    # 候选批次与组合内批次重复时重抽, 最多尝试 3 次 (K 远小于批次数时几乎总是一次成功)
+    for _ in range(3):
+        if rows.size == 0:
+            break
+        candidates = rng.integers(num_batches, size=rows.size)
+        fresh = ~np.any(indices[rows] == candidates[:, None], axis=1)
+        indices[rows[fresh], slots[fresh]] = candidates[fresh]
+        rows, slots = rows[~fresh], slots[~fresh]
+
+    mask = rng.random(weights.shape) < prob
+    weights[mask] += rng.normal(0, strength, size=np.count_nonzero(mask))
+    np.maximum(weights, 0, out=weights)
+    return mutated
+
+
+def make_sparse_offspring(population, rng, crossover_prob, mutation_prob, mutation_strength, num_batches,
+                          num_offspring=None):
+    """
+    稀疏种群的子代生成: 随机配对 → 集合感知交叉 → 换入/权重变异
+    子代权重归一化为和为 1, 使变异强度始终相对于单位总量
+    """
+    num_offspring = len(population) if num_offspring is None else num_offspring
+    first, second = _mating_pairs(rng, len(population), (num_offspring + 1) // 2)
+
+    child1, child2 = sparse_crossover(population[first], population[second], rng, crossover_prob)
+    children = sparse_mutate(_interleave(child1, child2)[:num_offspring], rng, mutation_prob, mutation_strength,
+                             num_batches)
+    children['weights'] = _normalize_rows(children['weights'])
+    return children
+
+
+# --- 断点续算 ---
+# 默认检查点目录 (相对于当前工作目录)
+CHECKPOINT_DIR = 'nsga2_checkpoints'
+
+# 决定演化轨迹的参数; 迭代代数与收敛判定参数不参与哈希, 以便调整后仍可续算
+CHECKPOINT_PARAM_KEYS = ('target_values', 'population_size', 'num_batches_to_select', 'crossover_prob',
+                         'mutation_prob', 'mutation_strength', 'seed', 'total_mix_amount', 'encoding', 'feasible_init',
+                         'memetic', 'island_model', 'num_islands', 'migration_interval', 'migration_size')
+
+
+def run_fingerprint(batch_arrays, params):
+    """由批次数据与关键参数计算运行指纹 (sha256), 相同数据和参数再次提交时指纹一致"""
+    digest = hashlib.sha256()
+    for array in batch_arrays:
+        array = np.ascontiguousarray(array, dtype=float)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.tobytes())
+    for key in CHECKPOINT_PARAM_KEYS:
+        value = params.get(key)
+        value = np.asarray(value).tolist() if isinstance(value, np.ndarray) else value
+        digest.update(f"{key}={value!r};".encode())
+    return digest.hexdigest()
+
+
+def _checkpoint_path(checkpoint_dir, params_hash):
+    return os.path.join(checkpoint_dir, f"nsga2_{params_hash[:16]}.npz")
+
+
+def save_checkpoint(checkpoint_dir, params_hash, generation, rng_states, hypervolume_history, **arrays):
+    """
+    写入压缩检查点 (.npz): 种群、目标值、约束违反度、精英存档等数组, 以及 RNG 状态、代数和参数指纹
+    先写临时文件再原子替换, 进程中途被终止也不会留下损坏的检查点
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = _checkpoint_path(checkpoint_dir, params_hash)
+    arrays = {key: value for key, value in arrays.items() if value is not None}
+    # 临时文件名唯一, 同一参数的两个并发运行不会互相覆盖或删除对方写了一半的文件
+    fd, temp_path = tempfile.mkstemp(dir=checkpoint_dir, suffix='.npz')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            np.savez_compressed(file, params_hash=params_hash, generation=generation,
+                                rng_states=json.dumps(rng_states),
+                                hypervolume_history=np.asarray(hypervolume_history), **arrays)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def load_checkpoint(checkpoint_dir, params_hash):
+    """读取检查点; 文件不存在、已损坏或参数指纹不一致时返回 None"""
+    path = _checkpoint_path(checkpoint_dir, params_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            checkpoint = {key: data[key] for key in data.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+    if str(checkpoint.pop('params_hash')) != params_hash:
+        return None
+
+    checkpoint['generation'] = int(checkpoint['generation'])
+    checkpoint['rng_states'] = json.loads(str(checkpoint['rng_states']))
+    checkpoint['hypervolume_history'] = checkpoint['hypervolume_history'].tolist()
+    return checkpoint
+
+
+def clear_checkpoint(checkpoint_dir, params_hash):
+    """运行正常结束后删除检查点"""
+    try:
+        os.remove(_checkpoint_path(checkpoint_dir, params_hash))
+    except FileNotFoundError:
+        pass
+
+
+def restore_rng(state):
+    """由保存的 bit_generator 状态恢复 Generator"""
+    rng = np.random.default_rng()
+    rng.bit_generator.state = state
+    return rng
+
+
+# --- 一代演化 ---
+def evolve_generation(population, values, violations, evaluate, rng, params, num_batches=None):
+    """
+    (μ+λ) 精英策略的一代演化: 生成子代 → 评估 → 父代与子代合并后按约束支配做环境选择
+    - evaluate: 种群评估函数, 返回 (values, violations, proportions)
+    - params: 需包含 population_size / crossover_prob / mutation_prob / mutation_strength
+    - num_batches: 候选批次总数, 稀疏编码的换入变异需要
+    - 返回: (population, values, violations, offspring_result), offspring_result 为子代评估结果, 用于更新精英存档
+    """
+    if is_sparse_population(population):
+        offspring = make_sparse_offspring(population, rng, params['crossover_prob'], params['mutation_prob'],
+                                          params['mutation_strength'], num_batches, params['population_size'])
+    else:
+        offspring = make_offspring(population, rng, params['crossover_prob'], params['mutation_prob'],
+                                   params['mutation_strength'], params['population_size'])
+    offspring_result = evaluate(offspring)
+    offspring_values, offspring_violations, _ = offspring_result
+
+    combined_population = np.concatenate([population, offspring])
+    combined_values = np.vstack([values, offspring_values])
+    combined_violations = np.concatenate([violations, offspring_violations])
+    survivors = select_survivors(combined_values, params['population_size'], combined_violations)
+    return (combined_population[survivors], combined_values[survivors], combined_violations[survivors],
+            offspring_result)
+
+
+# --- NSGA-II 主流程 ---
+def run_nsga2(ingredient_matrix, similarity_vector, inventory, params, progress_callback=None, should_stop=None):
+    """
+    执行 NSGA-II 优化 (不依赖 Streamlit, 可在后台线程中运行)
+    - 采用 (μ+λ) 精英策略, 并用精英存档保存运行中找到的全部非支配可行解
+    - 每代记录精英存档的超体积, 启用 early_stopping 时超体积在 hv_window 代内的相对提升
+      小于 hv_tolerance 即提前停止
+    - 启用 island_model 时改为多进程岛屿模型 (见 run_island_model)
+    - 设置 checkpoint_dir 时定期写入检查点, 相同数据和参数再次提交即可续算
+    - 启用 memetic 时初始种群混入 ε-约束种子, 结束后用局部 SLSQP 精修前沿 (见 epsilon_seeds / polish_front)
+    - progress_callback(generation, archive_values, hypervolume): 每代结束时调用
+    - should_stop(): 可选, 返回 True 时在当前代结束后停止
+    - 返回: (archive_solutions, archive_values, run_info)
+    """
+    if params.get('island_model'):
+        archive_solutions, archive_values, run_info = run_island_model(
+            ingredient_matrix, similarity_vector, inventory, params, progress_callback, should_stop)
+    else:
+        archive_solutions, archive_values, run_info = _run_single_population(
+            ingredient_matrix, similarity_vector, inventory, params, progress_callback, should_stop)
+
+    if params.get('memetic') and archive_solutions is not None and not run_info['cancelled']:
+        archive_solutions, archive_values, run_info['polished_points'] = polish_front(
+            archive_solutions, archive_values, ingredient_matrix, similarity_vector, inventory, params)
+    return archive_solutions, archive_values, run_info
+
+
+def _run_single_population(ingredient_matrix, similarity_vector, inventory, params, progress_callback, should_stop):
+    """单种群 NSGA-II 主循环 (参数与返回值同 run_nsga2)"""
+    num_batches = len(similarity_vector)
+
+    def evaluate(population):
+        return evaluate_genomes(population, ingredient_matrix, similarity_vector, inventory, params)
+
+    # 断点续算: 相同数据和参数再次提交时, 从上次写入的检查点继续
+    checkpoint_dir = params.get('checkpoint_dir')
+    params_hash = run_fingerprint((ingredient_matrix, similarity_vector, inventory), params)
+    checkpoint = load_checkpoint(checkpoint_dir, params_hash) if checkpoint_dir else None
+
+    if checkpoint is not None:
+        population = checkpoint['population']
+        values, violations = checkpoint['values'], checkpoint['violations']
+        archive_solutions = checkpoint.get('archive_solutions')
+        archive_values = checkpoint.get('archive_values')
+        rng = restore_rng(checkpoint['rng_states'][0])
+        start_generation = resumed_from = checkpoint['generation']
+        hypervolume_history = checkpoint['hypervolume_history']
+    else:
+        # 所有随机性统一由一个 Generator 驱动, 指定 seed 时结果可复现
+        rng = np.random.default_rng(params.get('seed'))
+
+        # 初始化种群 (稠密编码为 pop_size × n_batches 矩阵, 稀疏编码为 pop_size 个 K 批次基因)
+        population = initial_population(rng, ingredient_matrix, inventory, params)
+        if params.get('memetic'):
+            population = seed_population(population, epsilon_seeds(ingredient_matrix, similarity_vector, inventory,
+                                                                    params), params['num_batches_to_select'])
+
+        values, violations, proportions = evaluate(population)
+        archive_solutions, archive_values = update_archive(None, None, proportions, values, violations,
+                                                           params['population_size'])
+        start_generation, resumed_from = 0, None
+        hypervolume_history = []
+
+    # 超体积参考点固定为目标空间的最差角点, 各代数值可直接比较
+    reference_point = hypervolume_reference_point(ingredient_matrix, similarity_vector, params['target_values'])
+    stopped_early = cancelled = False
+
+    for generation in range(start_generation + 1, params['num_generations'] + 1):
+        population, values, violations, offspring_result = evolve_generation(population, values, violations,
+                                                                             evaluate, rng, params, num_batches)
+
+        # 更新精英存档 (存储解码后的实际混合比例)
+        offspring_values, offspring_violations, offspring_proportions = offspring_result
+        archive_solutions, archive_values = update_archive(archive_solutions, archive_values, offspring_proportions,
+                                                           offspring_values, offspring_violations,
+                                                           params['population_size'])
+
+        hypervolume = hypervolume_2d(archive_values, reference_point) if archive_values is not None else 0.0
+        hypervolume_history.append(hypervolume)
+        if progress_callback is not None:
+            progress_callback(generation, archive_values, hypervolume)
+
+        # 定期写入检查点; 收到取消请求时也写入, 续算从取消时的这一代开始
+        stop_requested = should_stop is not None and should_stop()
+        if checkpoint_dir and (generation % params.get('checkpoint_interval', 10) == 0 or stop_requested):
+            save_checkpoint(checkpoint_dir, params_hash, generation, [rng.bit_generator.state], hypervolume_history,
+                            population=population, values=values, violations=violations,
+                            archive_solutions=archive_solutions, archive_values=archive_values)
+
+        # 收敛判定: 前沿不再移动时提前结束
+        if params.get('early_stopping') and hypervolume_converged(hypervolume_history, params['hv_window'],
+                                                                  params['hv_tolerance']):
+            stopped_early = generation < params['num_generations']
+            break
+
+        if stop_requested:
+            cancelled = generation < params['num_generations']
+            break
+
+    # 取消的计算保留检查点, 之后可以继续
+    if checkpoint_dir and not cancelled:
+        clear_checkpoint(checkpoint_dir, params_hash)
+
+    run_info = {
+        'hypervolume_history': hypervolume_history,
+        'reference_point': reference_point,
+        'generations_run': len(hypervolume_history),
+        'stopped_early': stopped_early,
+        'cancelled': cancelled,
+        'resumed_from': resumed_from
+    }
+    return densify_genomes(archive_solutions, num_batches), archive_values, run_info
+
+
+# ##############################################################################
+# --- 岛屿模型 (多进程并行 NSGA-II) ---
+# ##############################################################################
+
+# 工作进程内挂载的批次数据 (由进程池初始化函数写入, 每个工作进程只挂载一次)
+_SHARED_BATCH_DATA = {}
+
+
+# 启动工作进程时临时替换 __main__ 的互斥锁 (见 _detached_main)
+_MAIN_MODULE_LOCK = threading.Lock()
+
+
+@contextmanager
+def _detached_main():
+    """
+    启动工作进程期间把 sys.modules['__main__'] 换成空模块
+    spawn/forkserver 的子进程会按 __main__ 的 __file__ 重新执行主脚本, 而 Streamlit 把 main_app.py 注册为
+    __main__, 子进程会把整个页面重新跑一遍; 空模块没有 __file__, 子进程不再执行主脚本.
+    工作进程只调用本模块 (及 exact_pareto) 的顶层函数, 按模块名导入即可, 不依赖 __main__.
+    恢复时若 __main__ 已被其他线程 (如 Streamlit 开始新一轮页面执行) 改写, 则保留其改写
+    """
+    with _MAIN_MODULE_LOCK:
+        original = sys.modules.get('__main__')
+        placeholder = types.ModuleType('__main__')
+        sys.modules['__main__'] = placeholder
+        try:
+            yield
+        finally:
+            if sys.modules.get('__main__') is placeholder:
+                sys.modules['__main__'] = original
+
+
+class _WorkerPool(ProcessPoolExecutor):
+    """进程池: 工作进程在 submit (map 也经由 submit) 中按需启动, 启动期间隐藏 __main__"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        with _detached_main():
+            return super().submit(fn, *args, **kwargs)
+
+
+def _worker_context():
+    """
+    工作进程的启动方式: 优先 forkserver, 不支持 forkserver 的平台 (Windows) 用 spawn
+    不使用 fork: Streamlit 在 ScriptRunner 线程中执行页面, 后台计算又在另一个线程中,
+    从多线程进程 fork 会把其他线程持有的锁原样复制到子进程, 子进程可能死锁.
+    forkserver 的服务进程是单线程的干净解释器, 预先导入本模块 (numpy/scipy) 后,
+    每个工作进程都从它 fork 出来, 启动只需几十毫秒
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def process_pool(max_workers, initializer=None, initargs=()):
+    """
+    创建进程池 (forkserver/spawn 启动, 主线程与后台线程中调用都安全, 见 _worker_context 与 _detached_main)
+    提交给进程池的函数与初始化函数须为模块顶层函数
+    """
+    return _WorkerPool(max_workers=max_workers, mp_context=_worker_context(), initializer=initializer,
+                       initargs=initargs)
+
+
+def _attach_batch_data(shm_name, shape):
+    """进程池初始化: 挂载共享内存中的批次数据矩阵 [甘草苷, 甘草酸, 相似度, 库存]"""
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:  # Python < 3.13 没有 track 参数
+        shm = shared_memory.SharedMemory(name=shm_name)
+    batch_data = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    _SHARED_BATCH_DATA.update({
+        'shm': shm,
+        'ingredient_matrix': batch_data[:, :2],
+        'similarity_vector': batch_data[:, 2],
+        'inventory': batch_data[:, 3]
+    })
+
+
+def _evolve_island(state, params, generations):
+    """工作进程: 将单个岛屿演化 generations 代, 返回更新后的岛屿状态"""
+    data = _SHARED_BATCH_DATA
+
+    num_batches = len(data['similarity_vector'])
+
+    def evaluate(population):
+        return evaluate_genomes(population, data['ingredient_matrix'], data['similarity_vector'], data['inventory'],
+                                params)
+
+    population, rng = state['population'], state['rng']
+    archive_solutions, archive_values = state['archive_solutions'], state['archive_values']
+    if state['values'] is None:
+        values, violations, proportions = evaluate(population)
+        archive_solutions, archive_values = update_archive(archive_solutions, archive_values, proportions, values,
+                                                           violations, params['population_size'])
+    else:
+        values, violations = state['values'], state['violations']
+
+    for _ in range(generations):
+        population, values, violations, offspring_result = evolve_generation(population, values, violations,
+                                                                             evaluate, rng, params, num_batches)
+        offspring_values, offspring_violations, offspring_proportions = offspring_result
+        archive_solutions, archive_values = update_archive(archive_solutions, archive_values, offspring_proportions,
+                                                           offspring_values, offspring_violations,
+                                                           params['population_size'])
+
+    return {'population': population, 'values': values, 'violations': violations, 'rng': rng,
+            'archive_solutions': archive_solutions, 'archive_values': archive_values}
+
+
+def migrate(states, migration_size):
+    """环形拓扑迁移: 每个岛屿最优的 migration_size 个个体替换下一个岛屿中最差的个体"""
+    rankings = [select_survivors(state['values'], len(state['values']), state['violations']) for state in states]
+    emigrants = []
+    for state, ranking in zip(states, rankings):
+        best = ranking[:migration_size]
+        emigrants.append((state['population'][best], state['values'][best], state['violations'][best]))
+
+    for i, (state, ranking) in enumerate(zip(states, rankings)):
+        worst = ranking[-migration_size:]
+        state['population'][worst], state['values'][worst], state['violations'][worst] = emigrants[i - 1]
+
+
+def run_island_model(ingredient_matrix, similarity_vector, inventory, params, progress_callback=None,
+                     should_stop=None):
+    """
+    岛屿模型 NSGA-II: 多个子种群在进程池中并行演化, 每 migration_interval 代做一次环形精英迁移
+    - 批次数据只写入一次共享内存, 工作进程在初始化时挂载, 之后每个迁移周期只传输岛屿种群
+    - params: nsga_params, 另需 num_islands / migration_interval / migration_size
+    - progress_callback(generation, archive_values, hypervolume): 每个迁移周期结束时调用
+    - params['checkpoint_dir'] 非空时每个迁移周期写入检查点, 相同数据和参数再次提交时从检查点继续
+    - should_stop(): 可选, 返回 True 时在当前迁移周期结束后停止 (用于取消后台计算)
+    - 返回: (archive_solutions, archive_values, run_info), 存档为所有岛屿合并后的非支配可行解
+    """
+    num_islands = params['num_islands']
+    interval = max(1, params['migration_interval'])
+    migration_size = min(params['migration_size'], params['population_size'] // 2)
+    total_generations = params['num_generations']
+    num_batches = len(similarity_vector)
+
+    reference_point = hypervolume_reference_point(ingredient_matrix, similarity_vector, params['target_values'])
+    checkpoint_dir = params.get('checkpoint_dir')
+    params_hash = run_fingerprint((ingredient_matrix, similarity_vector, inventory), params)
+    checkpoint = load_checkpoint(checkpoint_dir, params_hash) if checkpoint_dir else None
+
+    if checkpoint is not None:
+        # 从检查点恢复各岛屿种群与随机数状态 (岛屿存档已并入全局存档, 不单独保存)
+        states = [{'population': population, 'values': values, 'violations': violations,
+                   'rng': restore_rng(rng_state), 'archive_solutions': None, 'archive_values': None}
+                  for population, values, violations, rng_state in
+                  zip(checkpoint['population'], checkpoint['values'], checkpoint['violations'],
+                      checkpoint['rng_states'])]
+        archive_solutions = checkpoint.get('archive_solutions')
+        archive_values = checkpoint.get('archive_values')
+        generation = resumed_from = checkpoint['generation']
+        hypervolume_history = checkpoint['hypervolume_history']
+        history_generations = checkpoint['hypervolume_generations'].tolist()
+    else:
+        states = []
+        for seed_sequence in np.random.SeedSequence(params.get('seed')).spawn(num_islands):
+            rng = np.random.default_rng(seed_sequence)
+            states.append({'population': initial_population(rng, ingredient_matrix, inventory, params),
+                           'values': None, 'violations': None, 'rng': rng,
+                           'archive_solutions': None, 'archive_values': None})
+        if params.get('memetic'):
+            # 种子轮流分配给各岛屿
+            seeds = epsilon_seeds(ingredient_matrix, similarity_vector, inventory, params)
+            for i, state in enumerate(states):
+                state['population'] = seed_population(state['population'], seeds[i::num_islands],
+                                                      params['num_batches_to_select'])
+        archive_solutions, archive_values = None, None
+        generation, resumed_from = 0, None
+        hypervolume_history, history_generations = [], []
+    window_epochs = math.ceil(params.get('hv_window', 0) / interval)
+    stopped_early = cancelled = False
+
+    batch_data = np.column_stack([ingredient_matrix, similarity_vector, inventory]).astype(float)
+    shm = shared_memory.SharedMemory(create=True, size=batch_data.nbytes)
+    try:
+        shared_view = np.ndarray(batch_data.shape, dtype=float, buffer=shm.buf)
+        shared_view[:] = batch_data
+        del shared_view
+
+        max_workers = min(num_islands, os.cpu_count() or 1)
+        with process_pool(max_workers, _attach_batch_data, (shm.name, batch_data.shape)) as executor:
+            while generation < total_generations:
+                step = min(interval, total_generations - generation)
+                states = list(executor.map(_evolve_island, states, repeat(params), repeat(step)))
+                generation += step
+
+                for state in states:
+                    if state['archive_solutions'] is not None:
+                        archive_solutions, archive_values = update_archive(
+                            archive_solutions, archive_values, state['archive_solutions'], state['archive_values'],
+                            np.zeros(len(state['archive_values'])), params['population_size'])
+
+                hypervolume = hypervolume_2d(archive_values, reference_point) if archive_values is not None else 0.0
+                hypervolume_history.append(hypervolume)
+                history_generations.append(generation)
+                if progress_callback is not None:
+                    progress_callback(generation, archive_values, hypervolume)
+
+                if migration_size > 0 and num_islands > 1:
+                    migrate(states, migration_size)
+
+                # 先写检查点再判断是否停止, 取消的计算从本迁移周期结束处继续
+                if checkpoint_dir:
+                    save_checkpoint(checkpoint_dir, params_hash, generation,
+                                    [state['rng'].bit_generator.state for state in states], hypervolume_history,
+                                    population=np.stack([state['population'] for state in states]),
+                                    values=np.stack([state['values'] for state in states]),
+                                    violations=np.stack([state['violations'] for state in states]),
+                                    archive_solutions=archive_solutions, archive_values=archive_values,
+                                    hypervolume_generations=np.asarray(history_generations))
+
+                if params.get('early_stopping') and hypervolume_converged(
+                        hypervolume_history, window_epochs, params['hv_tolerance']):
+                    stopped_early = generation < total_generations
+                    break
+
+                if should_stop is not None and should_stop():
+                    cancelled = generation < total_generations
+                    break
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # 取消的计算保留检查点, 之后可以继续
+    if checkpoint_dir and not cancelled:
+        clear_checkpoint(checkpoint_dir, params_hash)
+
+    run_info = {
+        'hypervolume_history': hypervolume_history,
+        'hypervolume_generations': history_generations,
+        'reference_point': reference_point,
+        'generations_run': history_generations[-1] if history_generations else 0,
+        'stopped_early': stopped_early,
+        'cancelled': cancelled,
+        'resumed_from': resumed_from,
+        'num_islands': num_islands
+    }
+    return densify_genomes(archive_solutions, num_batches), archive_values, run_info
+
+
+# ##############################################################################
+# --- 混合策略 (memetic): ε-约束播种与前沿局部精修 ---
+# ##############################################################################
+
+# SLSQP 每次迭代为 O(n³), 精修只在比例最大的这么多个批次上进行
+MEMETIC_MAX_BATCHES = 500
+
+
+def _squared_deviation(x, ingredient_matrix, target_ingredients):
+    """加权含量偏离度的平方及其解析梯度"""
+    residual = x @ ingredient_matrix - target_ingredients
+    weighted = CONTENT_WEIGHTS * residual
+    return weighted @ residual, 2 * ingredient_matrix @ weighted
+
+
+def _slsqp_blend(objective, x0, ingredient_matrix, similarity_vector, upper_bounds, min_similarity=None,
+                 max_iterations=100):
+    """
+    SLSQP 求解一个混合比例问题: Σx = 1, 0 ≤ x ≤ upper_bounds, 含量不低于 MIN_CONTENTS,
+    可选相似度 ≥ min_similarity; objective(x) 返回 (目标值, 梯度). 失败时返回 None
+    """
+    constraints = [LinearConstraint(np.ones((1, len(x0))), 1.0, 1.0),
+                   LinearConstraint(ingredient_matrix.T, MIN_CONTENTS, np.inf)]
+    if min_similarity is not None:
+        constraints.append(LinearConstraint(similarity_vector[None, :], min_similarity, np.inf))
+    result = minimize(objective, x0, jac=True, method='SLSQP', bounds=Bounds(0, upper_bounds),
+                      constraints=constraints, options={'maxiter': max_iterations})
+    if not result.success:
+        return None
+    return np.clip(result.x, 0, upper_bounds)
+
+
+def _epsilon_seed(epsilon, problem):
+    """
+    进程池任务: 相似度 ≥ epsilon 时加权偏离度最小的方案 (exact_pareto.closest_blend);
+    限定批次数 K 时保留比例最大的 K 个批次并在其上重新求解, K 个批次达不到 epsilon 时取其中偏离度最小的方案.
+    不可行时返回 None
+    """
+    from exact_pareto import closest_blend  # exact_pareto 导入本模块, 在函数内导入以免循环导入
+
+    x = closest_blend(problem, epsilon)
+    k = problem['num_batches_to_select']
+    if x is None or not 0 < k < np.count_nonzero(x > 1e-12):
+        return x
+    support = np.argpartition(-x, k - 1)[:k]
+    restricted = {**problem, 'upper_bounds': np.zeros_like(x)}
+    restricted['upper_bounds'][support] = problem['upper_bounds'][support]
+    projected = closest_blend(restricted, epsilon)
+    return projected if projected is not None else closest_blend(restricted)
+
+
+def epsilon_seeds(ingredient_matrix, similarity_vector, inventory, params, num_seeds=None):
+    """
+    ε-约束播种: 相似度下限 ε 在两个单目标最优方案 (偏离度最小 / 相似度最高) 的相似度之间均匀取 num_seeds 个值,
+    各自求偏离度最小的方案, 种子按相似度的实际可达范围均匀分布在前沿上
+    (加权和法的权重对两个目标的量纲敏感, 多数种子会挤到同一个端点)
+    - 每个种子只需一串 HiGHS 线性规划 (最小范数点迭代, 见 exact_pareto), 上千个批次也只需几十毫秒;
+      各 ε 在进程池中并行求解
+    - 限定批次数时种子已投影到 K 个批次, 按稀疏或稠密编码插入种群都不会因截断而变差
+    - num_seeds 默认为 params['memetic_seeds'] (缺省 8)
+    - 返回: (n_seeds, num_batches) 混合比例矩阵 (只含可行的种子)
+    """
+    from exact_pareto import closest_blend, max_similarity_blend  # 见 _epsilon_seed
+
+    num_batches = len(similarity_vector)
+    num_seeds = params.get('memetic_seeds', 8) if num_seeds is None else num_seeds
+    problem = {
+        'ingredient_matrix': np.asarray(ingredient_matrix, dtype=float),
+        'similarity_vector': np.asarray(similarity_vector, dtype=float),
+        'upper_bounds': np.minimum(1.0, np.asarray(inventory, dtype=float) / params['total_mix_amount']),
+        'target_values': np.asarray(params['target_values'], dtype=float),
+        'min_contents': MIN_CONTENTS,
+        'num_batches_to_select': params['num_batches_to_select']
+    }
+    peak = max_similarity_blend(problem) if num_seeds > 0 else None
+    anchor = closest_blend(problem) if peak is not None else None
+    if anchor is None:
+        return np.empty((0, num_batches))
+    # 偏离度最小的方案可能不唯一, 取其中相似度最高者, ε 范围才是前沿的实际范围
+    lexicographic = max_similarity_blend(problem, anchor @ problem['ingredient_matrix'])
+    if lexicographic is not None:
+        anchor = lexicographic
+
+    epsilon_values = np.linspace(anchor @ problem['similarity_vector'], peak @ problem['similarity_vector'],
+                                 num_seeds)
+    with process_pool(min(num_seeds, os.cpu_count() or 1)) as executor:
+        seeds = [x for x in executor.map(_epsilon_seed, epsilon_values, repeat(problem)) if x is not None]
+    return np.array(seeds) if seeds else np.empty((0, num_batches))
+
+
+def seed_population(population, seeds, k):
+    """
+    用种子替换种群的前 len(seeds) 个个体, 种子按种群的编码方式转换:
+    稀疏编码取比例最大的 K 个批次, 稠密编码缩放到与现有个体相同的基因总量
+    """
+    seeds = seeds[:len(population)]
+    if len(seeds) == 0:
+        return population
+    population = population.copy()
+    if is_sparse_population(population):
+        population[:len(seeds)] = sparsify_proportions(seeds, k)
+    else:
+        population[:len(seeds)] = seeds * population.sum(axis=1).mean()
+    return population
+
+
+def _polish_point(x, problem):
+    """
+    进程池任务: 局部 ε-约束精修, 在方案现有批次上保持相似度不降低的同时最小化偏离度
+    (不引入新批次, 因此批次数限制仍然满足); 失败时返回 None
+    """
+    support = np.argsort(-x)[:MEMETIC_MAX_BATCHES]
+    support = support[x[support] > 0]
+    ingredient_matrix = problem['ingredient_matrix'][support]
+    similarity_vector = problem['similarity_vector'][support]
+    x0 = x[support] / x[support].sum()
+
+    polished = _slsqp_blend(lambda y: _squared_deviation(y, ingredient_matrix, problem['target_values']), x0,
+                            ingredient_matrix, similarity_vector, problem['upper_bounds'][support],
+                            x0 @ similarity_vector, problem['max_iterations'])
+    if polished is None:
+        return None
+    result = np.zeros_like(x)
+    result[support] = polished
+    return result
+
+
+def polish_front(solutions, values, ingredient_matrix, similarity_vector, inventory, params):
+    """
+    前沿局部精修: 每个前沿方案在进程池中做一次短 SLSQP (最多 params['polish_iterations'] 次迭代, 缺省 30)
+    精修结果与原前沿合并, 重新筛选非支配可行解
+    - 返回: (solutions, values, polished_points), polished_points 为进入最终前沿的精修方案数
+    """
+    problem = {
+        'ingredient_matrix': ingredient_matrix,
+        'similarity_vector': similarity_vector,
+        'upper_bounds': np.minimum(1.0, inventory / params['total_mix_amount']),
+        'target_values': np.asarray(params['target_values'], dtype=float),
+        'max_iterations': params.get('polish_iterations', 30)
+    }
+    with process_pool(min(len(solutions), os.cpu_count() or 1)) as executor:
+        polished = [x for x in executor.map(_polish_point, solutions, repeat(problem)) if x is not None]
+    if not polished:
+        return solutions, values, 0
+
+    polished_values, polished_violations, polished = evaluate_population(
+        np.array(polished), ingredient_matrix, similarity_vector, problem['target_values'], inventory,
+        params['total_mix_amount'], params['num_batches_to_select'])
+    merged_solutions, merged_values = update_archive(solutions, values, polished, polished_values,
+                                                     polished_violations, params['population_size'])
+    is_original = (merged_values[:, None, :] == values[None, :, :]).all(axis=2).any(axis=1)
+    return merged_solutions, merged_values, int(np.count_nonzero(~is_original))
+
+
+# ##############################################################################
+# --- 后台计算任务 (线程 + 进度队列) ---
+# ##############################################################################
+
+def start_background_run(ingredient_matrix, similarity_vector, inventory, params):
+    """
+    在后台线程中执行 run_nsga2, 页面脚本不再被阻塞
+    - 返回任务字典: status 为 running / finished / cancelled / failed; 计算结束后 result 为 run_nsga2 的返回值
+    - 进度消息 {'generation', 'hypervolume', 'front'} 写入 job['queue'], 由页面轮询取出
+    - 设置 job['cancel_event'] 即可在当前代 (岛屿模型为当前迁移周期) 结束后停止
+    """
+    job = {
+        'queue': queue.Queue(),
+        'cancel_event': threading.Event(),
+        'status': 'running',
+        'result': None,
+        'error': None,
+        'latest': None,
+        'total_generations': params['num_generations']
+    }
+
+    def report_progress(generation, archive_values, hypervolume):
+        front = archive_values.copy() if archive_values is not None else np.empty((0, 2))
+        job['queue'].put({'generation': generation, 'hypervolume': hypervolume, 'front': front})
+
+    def worker():
+        try:
+            job['result'] = run_nsga2(ingredient_matrix, similarity_vector, inventory, params, report_progress,
+                                      job['cancel_event'].is_set)
+            job['status'] = 'cancelled' if job['result'][2]['cancelled'] else 'finished'
+        except Exception as e:
+            job['error'] = e
+            job['status'] = 'failed'
+
+    job['thread'] = threading.Thread(target=worker, name='nsga2-background', daemon=True)
+    job['thread'].start()
+    return job
+
+
+def drain_progress(job):
+    """取出队列中积压的全部进度消息, 保留最新一条到 job['latest'] 并返回"""
+    while True:
+        try:
+            job['latest'] = job['queue'].get_nowait()
+        except queue.Empty:
+            return job['latest']
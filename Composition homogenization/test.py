@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import random
 import matplotlib.pyplot as plt
+from nsga2_core import fast_non_dominated_sort
 
 
 def run_final_optimization_with_constraints():
@@ -41,29 +42,7 @@ def run_final_optimization_with_constraints():
         blended_similarity = np.dot(proportions, df[similarity_column].values)
         return np.array([weighted_deviation, -blended_similarity])
 
-    # --- 步骤4：NSGA-II 核心函数 ---
-    def fast_non_dominated_sort(objectives):
-        pop_size = len(objectives)
-        S, n = [[] for _ in range(pop_size)], [0] * pop_size
-        fronts = [[]]
-        for p in range(pop_size):
-            for q in range(pop_size):
-                if np.all(objectives[p] <= objectives[q]) and np.any(objectives[p] < objectives[q]):
-                    S[p].append(q)
-                elif np.all(objectives[q] <= objectives[p]) and np.any(objectives[q] < objectives[p]):
-                    n[p] += 1
-            if n[p] == 0: fronts[0].append(p)
-        i = 0
-        while i < len(fronts) and fronts[i]:
-            next_front = []
-            for p in fronts[i]:
-                for q in S[p]:
-                    n[q] -= 1
-                    if n[q] == 0: next_front.append(q)
-            i += 1
-            if next_front: fronts.append(next_front)
-        return fronts
-
+    # --- 步骤4：NSGA-II 核心函数 (非支配排序使用 nsga2_core 的向量化实现) ---
     def calculate_crowding_distance(indices, objectives):
         distances = {i: 0 for i in indices}
         if not indices: return distances
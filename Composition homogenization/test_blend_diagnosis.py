@@ -0,0 +1,44 @@
+from dataclasses import replace
+
+import numpy as np
+
+from blend_diagnosis import (FINGERPRINT_LABEL, INVENTORY_LABEL, _is_feasible, _subproblem, diagnose_infeasibility,
+                             irreducible_infeasible_subset)
+
+
+def test_feasible_problem_has_empty_conflict_set(make_problem):
+    problem, _ = make_problem(min_similarity=0.9)
+    diagnosis = diagnose_infeasibility(problem)
+    assert diagnosis['feasible']
+    assert diagnosis['conflict_set'] == []
+    assert all(row['feasible'] for row in diagnosis['constraint_analysis'])
+
+
+def test_unreachable_floor_is_reported_alone(make_problem):
+    problem, _ = make_problem()
+    problem = replace(problem, constraint_floors=np.array([5.0, 30.0, 0.88]))  # 甘草酸最高 25
+    diagnosis = diagnose_infeasibility(problem)
+    assert not diagnosis['feasible']
+    assert diagnosis['conflict_set'] == ['甘草酸']
+    by_name = {row['constraint']: row for row in diagnosis['constraint_analysis']}
+    assert not by_name['甘草酸']['feasible'] and by_name['甘草酸']['in_conflict']
+    assert by_name['甘草酸']['max_alone'] < 30.0
+
+
+def test_conflict_set_is_irreducible(make_problem):
+    # 每项标准单独都能达到, 同时提高到接近各自最大值时互相冲突
+    problem, _ = make_problem(min_similarity=0.95, floors=(6.5, 24.0, 0.97))
+    diagnosis = diagnose_infeasibility(problem)
+    subset = irreducible_infeasible_subset(problem)
+    assert not diagnosis['feasible'] and subset == diagnosis['conflict_set']
+    assert len(subset) >= 2
+
+    rows = [i for i, name in enumerate(problem.constraint_columns) if name in subset]
+    use_inventory, use_fingerprint = INVENTORY_LABEL in subset, FINGERPRINT_LABEL in subset
+    assert not _is_feasible(_subproblem(problem, rows, use_inventory, use_fingerprint))
+    for row in rows:
+        assert _is_feasible(_subproblem(problem, [i for i in rows if i != row], use_inventory, use_fingerprint))
+    if use_inventory:
+        assert _is_feasible(_subproblem(problem, rows, False, use_fingerprint))
+    if use_fingerprint:
+        assert _is_feasible(_subproblem(problem, rows, use_inventory, False))
@@ -0,0 +1,90 @@
+import itertools
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from blend_integer import solve_cardinality_blend, solve_dispensing_blend
+from blend_solvers import COST_PENALTY_COEFFICIENT, solve_convex_blend
+from conftest import assert_feasible, cosine
+
+PROBLEM_KINDS = {'linear': {}, 'targets': {'targets': (5.5, 19.5)}, 'fingerprint': {'min_similarity': 0.9}}
+
+
+def brute_force_cardinality(problem, cost, penalty_coefficient, max_batches):
+    """枚举全部 K 批次组合, 在每个组合上精确求解连续问题; 全部不可行时返回 inf"""
+    best = np.inf
+    for subset in itertools.combinations(range(problem.num_batches), max_batches):
+        mask = np.zeros(problem.num_batches, dtype=bool)
+        mask[list(subset)] = True
+        result = solve_convex_blend(replace(problem, upper_bounds=np.where(mask, problem.upper_bounds, 0.0)), cost,
+                                    penalty_coefficient)
+        if result is not None and result.success:
+            best = min(best, result.fun)
+    return best
+
+
+def grid_compositions(units, num_batches):
+    """把 units 个称量单位分给 num_batches 个批次的全部方式 (隔板法), 返回 (组合数, num_batches) 数组"""
+    rows = []
+    for bars in itertools.combinations(range(units + num_batches - 1), num_batches - 1):
+        edges = np.r_[-1, bars, units + num_batches - 1]
+        rows.append(np.diff(edges) - 1)
+    return np.array(rows, dtype=float)
+
+
+@pytest.mark.parametrize('kind', PROBLEM_KINDS)
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_cardinality_blend_matches_brute_force(make_problem, seed, kind):
+    problem, cost = make_problem(num_batches=10, seed=seed, inventory_range=(150.0, 600.0), **PROBLEM_KINDS[kind])
+    penalty_coefficient = COST_PENALTY_COEFFICIENT if kind == 'targets' else 0.0
+    result = solve_cardinality_blend(problem, cost, penalty_coefficient, 3)
+    expected = brute_force_cardinality(problem, cost, penalty_coefficient, 3)
+    if np.isinf(expected):
+        assert not result.success
+        assert result.message.startswith('3 个批次内')
+        return
+    assert result.success
+    assert len(result.selected) <= 3
+    assert_feasible(problem, result.x)
+    assert result.fun == pytest.approx(expected, rel=1e-6)
+
+
+def test_cardinality_blend_exact_count(make_problem):
+    problem, cost = make_problem(num_batches=10, seed=1, inventory_range=(150.0, 600.0))
+    at_most = solve_cardinality_blend(problem, cost, 0.0, 5)
+    exactly = solve_cardinality_blend(problem, cost, 0.0, 5, exact_count=True)
+    assert exactly.success
+    assert len(exactly.selected) == 5
+    assert_feasible(problem, exactly.x)
+    assert exactly.fun >= at_most.fun - 1e-9
+
+
+@pytest.mark.parametrize('min_draw', [0.0, 150.0])
+@pytest.mark.parametrize('min_similarity', [None, 0.97])
+@pytest.mark.parametrize('seed', [0, 1, 3, 4])
+def test_dispensing_blend_matches_enumeration(make_problem, seed, min_similarity, min_draw):
+    # 6 个批次、20 个 50 克单位的全部网格配方可以直接枚举
+    problem, cost = make_problem(num_batches=6, seed=seed, floors=(4.5, 17.0, 0.8), min_similarity=min_similarity,
+                                 inventory_range=(150.0, 600.0))
+    grid_step, units = 50.0, 20
+    unit_counts = grid_compositions(units, problem.num_batches)
+    proportions = unit_counts / units
+    feasible = (unit_counts <= np.floor(problem.inventory / grid_step + 1e-9)).all(axis=1)
+    feasible &= (proportions @ problem.constraint_matrix.T >= problem.constraint_floors).all(axis=1)
+    feasible &= ~((unit_counts > 0) & (unit_counts < min_draw / grid_step)).any(axis=1)
+    if min_similarity is not None:
+        feasible &= np.array([cosine(problem, x) for x in proportions]) >= min_similarity
+
+    result = solve_dispensing_blend(problem, cost, 0.0, grid_step, min_draw=min_draw)
+    if not feasible.any():
+        assert not result.success
+        assert result.message.startswith('称量网格')
+        return
+    assert result.success
+    assert_feasible(problem, result.x)
+    assert np.allclose(result.dispense_grams / grid_step, np.round(result.dispense_grams / grid_step))
+    assert result.dispense_grams.sum() == pytest.approx(result.total_grams)
+    used = result.dispense_grams[result.dispense_grams > 0]
+    assert np.all(used >= min_draw - 1e-9)
+    assert result.fun == pytest.approx((proportions[feasible] @ cost).min(), rel=1e-6)
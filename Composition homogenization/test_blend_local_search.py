@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from blend_integer import solve_cardinality_blend
+from blend_local_search import solve_local_search_blend
+from blend_solvers import COST_PENALTY_COEFFICIENT
+from conftest import assert_feasible
+
+
+@pytest.mark.parametrize('kind', [{}, {'targets': (5.5, 19.5)}, {'min_similarity': 0.9}])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_local_search_is_feasible_and_bounded_by_milp(make_problem, seed, kind):
+    # 局部搜索不证明最优, 但结果须满足全部约束, 且不会优于 MILP 证明的全局最优值
+    problem, cost = make_problem(num_batches=10, seed=seed, inventory_range=(150.0, 600.0), **kind)
+    penalty_coefficient = COST_PENALTY_COEFFICIENT if 'targets' in kind else 0.0
+    result = solve_local_search_blend(problem, cost, penalty_coefficient, 4, time_limit=0.3)
+    optimum = solve_cardinality_blend(problem, cost, penalty_coefficient, 4)
+    assert optimum.success and result.success
+    assert len(result.selected) <= 4
+    assert_feasible(problem, result.x)
+    assert result.fun >= optimum.fun - 1e-9
+
+
+def test_local_search_exact_count_on_large_catalog(make_problem):
+    problem, cost = make_problem(num_batches=2000, seed=5)
+    result = solve_local_search_blend(problem, cost, 0.0, 8, exact_count=True, time_limit=1.0)
+    assert result.success
+    assert len(result.selected) == 8
+    assert_feasible(problem, result.x)
+
+
+def test_local_search_reports_insufficient_inventory(make_problem):
+    # 每个批次至多 30 克, 任意 3 个批次凑不够 1000 克总量
+    problem, cost = make_problem(num_batches=20, inventory_range=(10.0, 30.0))
+    result = solve_local_search_blend(problem, cost, 0.0, 3)
+    assert not result.success
+    assert result.status == 2
+    assert '3 个批次' in result.message
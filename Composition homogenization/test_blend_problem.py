@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from blend_problem import build_blend_problem  # noqa: E402
+
+COL_MAP = {'gg_g': '甘草苷', 'ga_g': '甘草酸', 'sim': '相似度', 'cost': '单价', 'missing': '不存在的列'}
+
+
+def batch_data():
+    return pd.DataFrame({'甘草苷': [4.0, 6.0, 5.0], '甘草酸': [18.0, 22.0, 20.0], '相似度': [0.9, 0.95, 0.85],
+                         '单价': [1.0, 2.0, 1.5], '库存量 (克)': [300.0, np.nan, 2000.0], 'Rubric_Score': [5.0, 7.0, 6.0],
+                         'F1': [1.0, 2.0, 3.0], 'F2': [3.0, 2.0, 1.0]},
+                        index=['B1', 'B2', 'B3'])
+
+
+def test_build_blend_problem_extracts_matrices_and_bounds():
+    problem = build_blend_problem(batch_data(), COL_MAP, 1000.0,
+                                  constraints_dict={'gg_g': 4.5, 'sim': 0.88, 'missing': 1.0},
+                                  target_contents={'ga_g': 20.0})
+    assert problem.batch_index == ['B1', 'B2', 'B3'] and problem.num_batches == 3
+    # 库存缺失的批次视为库存充足 (总量 × 批次数 × 10)
+    assert np.array_equal(problem.inventory, [300.0, 30000.0, 2000.0])
+    assert np.array_equal(problem.upper_bounds, [0.3, 1.0, 1.0])
+    assert np.array_equal(problem.ingredient_matrix, [[4.0, 18.0], [6.0, 22.0], [5.0, 20.0]])
+    assert np.array_equal(problem.similarity_vector, [0.9, 0.95, 0.85])
+    assert np.array_equal(problem.cost_vector, [1.0, 2.0, 1.5])
+    assert np.array_equal(problem.rubric_vector, [5.0, 7.0, 6.0])
+
+    # 未映射到已有列的键被跳过
+    assert problem.constraint_keys == ['gg_g', 'sim'] and problem.constraint_columns == ['甘草苷', '相似度']
+    assert np.array_equal(problem.constraint_matrix, [[4.0, 6.0, 5.0], [0.9, 0.95, 0.85]])
+    assert np.array_equal(problem.constraint_floors, [4.5, 0.88])
+    assert problem.target_keys == ['ga_g'] and np.array_equal(problem.target_values, [20.0])
+    assert np.array_equal(problem.target_matrix, [[18.0, 22.0, 20.0]])
+
+    x = np.array([0.2, 0.3, 0.5])
+    assert np.allclose(problem.constraint_values(x), [5.1, 0.89])
+    assert np.allclose(problem.target_actuals(x), [20.2])
+    assert problem.fingerprint_matrix is None and problem.min_similarity is None
+
+
+def test_build_blend_problem_without_optional_columns():
+    data = batch_data()[['甘草苷', '库存量 (克)']]
+    problem = build_blend_problem(data, COL_MAP, 1000.0, fingerprint_options={'enabled': True})
+    assert problem.ingredient_matrix is None and problem.similarity_vector is None
+    assert problem.cost_vector is None and problem.rubric_vector is None
+    assert problem.constraint_keys == [] and problem.constraint_matrix.shape == (0, 3)
+    assert problem.target_matrix.shape == (0, 3) and problem.target_values.shape == (0,)
+    # 启用指纹约束但没有目标指纹时不提取指纹矩阵
+    assert problem.fingerprint_matrix is None
+
+
+def test_build_blend_problem_extracts_the_fingerprint():
+    fingerprint_options = {'enabled': True, 'f_cols': ['F1', 'F2'], 'target_profile': [2.0, 2.0],
+                           'min_similarity': 0.9}
+    problem = build_blend_problem(batch_data(), COL_MAP, 1000.0, fingerprint_options=fingerprint_options)
+    assert np.array_equal(problem.fingerprint_matrix, [[1.0, 3.0], [2.0, 2.0], [3.0, 1.0]])
+    assert problem.fingerprint_matrix.flags['C_CONTIGUOUS']
+    assert np.array_equal(problem.target_profile, [2.0, 2.0]) and problem.min_similarity == 0.9
@@ -0,0 +1,192 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from scipy.optimize import Bounds, LinearConstraint, linprog, minimize
+
+import blend_solvers
+from blend_integer import solve_cardinality_blend
+from blend_solvers import (COST_PENALTY_COEFFICIENT, QUALITY_PENALTY_COEFFICIENT, blend_objective,
+                           check_linear_feasibility, fingerprint_constraint, max_achievable_values,
+                           max_fingerprint_similarity, solve_convex_blend, solve_elastic_blend)
+from conftest import assert_feasible, cosine
+
+
+@pytest.mark.parametrize('max_iterations', [1, 2, 3, 5])
+def test_max_fingerprint_similarity_stops_at_iteration_limit(make_problem, max_iterations):
+    # 未收敛即达到迭代上限时, 返回的下界与混合比例仍须一致 (曾因重心坐标与点集长度不符而抛出 ValueError)
+    problem, _ = make_problem(num_batches=80, min_similarity=0.9)
+    converged, _ = max_fingerprint_similarity(problem)
+    value, blend = max_fingerprint_similarity(problem, max_iterations=max_iterations)
+    assert value <= converged + 1e-9
+    assert cosine(problem, blend) == pytest.approx(value, abs=1e-9)
+    assert blend.sum() == pytest.approx(1.0)
+    assert np.all(problem.constraint_values(blend) >= problem.constraint_floors - 1e-9)
+
+
+@pytest.mark.parametrize('kind', [{}, {'targets': (5.5, 19.5)}, {'min_similarity': 0.95},
+                                  {'min_similarity': 0.95, 'targets': (5.5, 19.5)}])
+def test_shadow_prices_match_finite_differences(make_problem, kind):
+    # 影子价格 = 右端项增加 1 时最优目标值的变化, 与中心差分比较
+    problem, cost = make_problem(num_batches=40, seed=3, **kind)
+    penalty_coefficient = COST_PENALTY_COEFFICIENT if 'targets' in kind else 0.0
+    result = solve_convex_blend(problem, cost, penalty_coefficient)
+    step = 1e-3
+
+    def central_difference(perturb):
+        upper = solve_convex_blend(perturb(step), cost, penalty_coefficient)
+        lower = solve_convex_blend(perturb(-step), cost, penalty_coefficient)
+        return (upper.fun - lower.fun) / (2 * step)
+
+    for row in range(len(problem.constraint_keys)):
+        expected = central_difference(
+            lambda delta: replace(problem, constraint_floors=problem.constraint_floors + delta * np.eye(3)[row]))
+        assert result.duals['floors'][row] == pytest.approx(expected, rel=2e-3, abs=1e-5)
+    upper_duals = np.asarray(result.duals['upper'])
+    batch = int(np.argmin(upper_duals))
+    assert upper_duals[batch] < 0
+    expected = central_difference(
+        lambda delta: replace(problem, upper_bounds=problem.upper_bounds + delta * np.eye(problem.num_batches)[batch]))
+    assert upper_duals[batch] == pytest.approx(expected, rel=2e-3, abs=1e-5)
+    if 'min_similarity' in kind:
+        expected = central_difference(lambda delta: replace(problem, min_similarity=problem.min_similarity + delta))
+        assert result.duals['fingerprint'] == pytest.approx(expected, rel=2e-3, abs=1e-5)
+
+
+@pytest.mark.parametrize('targets', [None, (5.5, 19.5)])
+def test_cone_multiplier_without_slsqp_multipliers(make_problem, monkeypatch, targets):
+    # SciPy < 1.15 的 SLSQP 结果没有 multipliers 属性, 乘子改由 KKT 平稳条件估计, 结果应与直接给出的一致
+    problem, cost = make_problem(num_batches=40, seed=3, min_similarity=0.95, targets=targets)
+    penalty_coefficient = COST_PENALTY_COEFFICIENT if targets else 0.0
+    expected = solve_convex_blend(problem, cost, penalty_coefficient)
+
+    def minimize_without_multipliers(*args, **kwargs):
+        result = minimize(*args, **kwargs)
+        result.pop('multipliers', None)
+        return result
+
+    minimize = blend_solvers.minimize
+    monkeypatch.setattr(blend_solvers, 'minimize', minimize_without_multipliers)
+    result = solve_convex_blend(problem, cost, penalty_coefficient)
+    assert expected.duals['fingerprint'] > 0
+    assert result.duals['fingerprint'] == pytest.approx(expected.duals['fingerprint'], rel=1e-3)
+    assert result.fun == pytest.approx(expected.fun, rel=1e-8)
+
+
+def test_linear_feasibility_of_a_feasible_problem(make_problem):
+    problem, _ = make_problem()
+    check = check_linear_feasibility(problem)
+    assert check['feasible'] and check['inventory_sufficient']
+    assert np.all(check['max_achievable'] >= problem.constraint_floors)
+
+
+def test_linear_feasibility_with_an_unreachable_floor(make_problem):
+    problem, _ = make_problem()
+    reachable = max_achievable_values(problem, problem.constraint_matrix)
+    # 单项标准超过库存限制下的最大可达值
+    check = check_linear_feasibility(replace(problem, constraint_floors=np.r_[reachable[0] + 0.01,
+                                                                              problem.constraint_floors[1:]]))
+    assert not check['feasible'] and check['inventory_sufficient']
+    assert check['max_achievable'][0] == pytest.approx(reachable[0])
+    # 各项单独可达、同时不可达: 由线性规划判定
+    floors = reachable - 1e-3
+    assert np.all(max_achievable_values(problem, problem.constraint_matrix) >= floors)
+    assert not check_linear_feasibility(replace(problem, constraint_floors=floors))['feasible']
+
+
+def test_linear_feasibility_with_too_little_inventory(make_problem):
+    problem, _ = make_problem(num_batches=10, inventory_range=(20.0, 80.0))
+    assert problem.upper_bounds.sum() < 1.0
+    check = check_linear_feasibility(replace(problem, constraint_floors=np.zeros(3)))
+    assert not check['feasible'] and not check['inventory_sufficient']
+
+
+def jointly_infeasible(problem):
+    """各项最低标准取单独可达的最大值: 每项单独可达, 同时不可达"""
+    return replace(problem, constraint_floors=max_achievable_values(problem, problem.constraint_matrix) - 1e-3)
+
+
+def min_weighted_shortfall(problem, weights):
+    """参考值: min Σ w_i·max(b_i - a_iᵀx, 0), 以上境图形式 t_i ≥ b_i - a_iᵀx, t_i ≥ 0 求解"""
+    num_batches, num_floors = problem.num_batches, len(problem.constraint_floors)
+    result = linprog(np.r_[np.zeros(num_batches), weights],
+                     A_ub=np.hstack([-problem.constraint_matrix, -np.eye(num_floors)]), b_ub=-problem.constraint_floors,
+                     A_eq=np.r_[np.ones(num_batches), np.zeros(num_floors)][None, :], b_eq=[1.0],
+                     bounds=[(0, u) for u in problem.upper_bounds] + [(0, None)] * num_floors, method='highs')
+    return result.fun
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_elastic_shortfall_is_the_minimum(make_problem, seed):
+    problem = jointly_infeasible(make_problem(seed=seed)[0])
+    result = solve_elastic_blend(problem)
+    weights = 1.0 / problem.constraint_floors
+    assert result.success and result.total_shortfall > 0
+    assert result.total_shortfall == pytest.approx(min_weighted_shortfall(problem, weights), rel=1e-7, abs=1e-10)
+    assert np.allclose(result.shortfall, np.maximum(problem.constraint_floors - problem.constraint_values(result.x), 0),
+                       atol=1e-9)
+    # 只有一项标准不可达时, 该项缺口等于它超出最大可达值的部分
+    reachable = max_achievable_values(problem, problem.constraint_matrix)
+    single = replace(problem, constraint_floors=np.r_[reachable[0] + 0.5, 0.0, 0.0])
+    assert solve_elastic_blend(single).shortfall == pytest.approx([0.5, 0.0, 0.0], abs=1e-9)
+
+
+@pytest.mark.parametrize('kind', [{}, {'targets': (5.5, 19.5)}, {'min_similarity': 0.9}])
+def test_elastic_second_stage_does_not_increase_shortfall(make_problem, kind):
+    problem, cost = make_problem(seed=1, **kind)
+    problem = jointly_infeasible(problem)
+    penalty_coefficient = COST_PENALTY_COEFFICIENT if 'targets' in kind else 0.0
+    first = solve_elastic_blend(problem)
+    second = solve_elastic_blend(problem, cost, penalty_coefficient)
+    assert second.success
+    assert np.all(second.shortfall <= first.shortfall + 1e-9)
+    assert second.total_shortfall == pytest.approx(first.total_shortfall, rel=1e-7, abs=1e-10)
+    first_objective = blend_solvers._blend_objective(problem, cost, penalty_coefficient)(
+        np.arange(problem.num_batches))[0](first.x)
+    assert second.fun <= first_objective + 1e-9
+
+
+def test_elastic_reports_no_shortfall_when_only_the_batch_limit_fails(make_problem):
+    # 主程序据此区分: 连续问题可行 (缺口恰为 0) 时失败只因批次数上限/称量网格, 不返回忽略这些限制的弹性方案
+    problem, cost = make_problem(num_batches=30, min_similarity=0.9)
+    assert not solve_cardinality_blend(problem, cost, 0.0, 1).success
+    result = solve_elastic_blend(problem, cost)
+    assert result.total_shortfall == 0.0 and result.fingerprint_shortfall == 0.0
+    assert np.all(result.shortfall == 0.0)
+
+
+def central_gradient(fun, x, step=1e-6):
+    return np.array([(fun(x + step * e) - fun(x - step * e)) / (2 * step) for e in np.eye(len(x))])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_slsqp_gradients_match_finite_differences(make_problem, seed):
+    problem, cost = make_problem(num_batches=30, seed=seed, targets=(5.5, 19.5), min_similarity=0.9)
+    points = np.random.default_rng(seed).dirichlet(np.ones(problem.num_batches), size=5)
+    for objective_vector, penalty_coefficient in [(cost, COST_PENALTY_COEFFICIENT),
+                                                  (-problem.rubric_vector, QUALITY_PENALTY_COEFFICIENT)]:
+        fun, jac = blend_objective(problem, objective_vector, penalty_coefficient)
+        for x in points:
+            assert np.allclose(jac(x), central_gradient(fun, x), rtol=1e-6, atol=1e-7)
+    fun, jac = fingerprint_constraint(problem)
+    for x in points:
+        assert fun(x) == pytest.approx(cosine(problem, x) - problem.min_similarity)
+        assert np.allclose(jac(x), central_gradient(fun, x)[None, :], rtol=1e-6, atol=1e-7)
+    assert np.array_equal(jac(np.zeros(problem.num_batches)), np.zeros((1, problem.num_batches)))
+
+
+def test_slsqp_with_analytic_gradients_reaches_the_convex_optimum(make_problem):
+    # 主程序的 SLSQP 回退路径 (凸规划未收敛或 ML 评分时) 使用同样的目标与约束
+    problem, cost = make_problem(num_batches=20, seed=2, targets=(5.5, 19.5), min_similarity=0.9)
+    fun, jac = blend_objective(problem, cost, COST_PENALTY_COEFFICIENT)
+    fingerprint_fun, fingerprint_jac = fingerprint_constraint(problem)
+    constraints = [{'type': 'ineq', 'fun': lambda x: problem.constraint_values(x) - problem.constraint_floors,
+                    'jac': lambda x: problem.constraint_matrix},
+                   {'type': 'ineq', 'fun': fingerprint_fun, 'jac': fingerprint_jac},
+                   LinearConstraint(np.ones(problem.num_batches), lb=1, ub=1)]
+    result = minimize(fun, np.full(problem.num_batches, 1 / problem.num_batches), method='SLSQP', jac=jac,
+                      bounds=Bounds(np.zeros(problem.num_batches), problem.upper_bounds), constraints=constraints,
+                      options={'disp': False, 'ftol': 1e-9, 'maxiter': 500})
+    assert result.success
+    assert_feasible(problem, result.x, tolerance=1e-6)
+    assert result.fun == pytest.approx(solve_convex_blend(problem, cost, COST_PENALTY_COEFFICIENT).fun, rel=1e-5)
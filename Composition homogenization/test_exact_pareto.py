@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+from exact_pareto import closest_blend, exact_pareto_front, max_similarity_blend
+from nsga2_core import CONTENT_WEIGHTS, MIN_CONTENTS
+
+
+def pareto_problem(num_batches=40, seed=0):
+    rng = np.random.default_rng(seed)
+    ingredient_matrix = np.column_stack([rng.uniform(3, 8, num_batches), rng.uniform(12, 30, num_batches)])
+    similarity_vector = rng.uniform(0.8, 0.99, num_batches)
+    inventory = rng.uniform(50, 400, num_batches)
+    params = {'target_values': np.array([5.0, 19.0]), 'total_mix_amount': 1000.0}
+    return ingredient_matrix, similarity_vector, inventory, params
+
+
+def weighted_deviation(x, ingredient_matrix, target_values):
+    """加权含量偏离度的平方 (与 objective_values 的第一列只差一个单调的开方)"""
+    return float(CONTENT_WEIGHTS @ (x @ ingredient_matrix - target_values) ** 2)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_closest_blend_matches_slsqp(seed):
+    ingredient_matrix, similarity_vector, inventory, params = pareto_problem(num_batches=15, seed=seed)
+    upper_bounds = np.minimum(1.0, inventory / params['total_mix_amount'])
+    problem = {'ingredient_matrix': ingredient_matrix, 'similarity_vector': similarity_vector,
+               'upper_bounds': upper_bounds, 'target_values': params['target_values'], 'min_contents': MIN_CONTENTS}
+    min_similarity = max_similarity_blend(problem) @ similarity_vector - 0.005  # 接近可达的最高相似度
+    x = closest_blend(problem, min_similarity)
+    assert x.sum() == pytest.approx(1.0)
+    assert x @ similarity_vector >= min_similarity - 1e-9
+    assert np.all(x @ ingredient_matrix >= MIN_CONTENTS - 1e-9)
+
+    constraints = [{'type': 'eq', 'fun': lambda y: y.sum() - 1},
+                   {'type': 'ineq', 'fun': lambda y: y @ similarity_vector - min_similarity},
+                   {'type': 'ineq', 'fun': lambda y: y @ ingredient_matrix - MIN_CONTENTS}]
+    reference = minimize(weighted_deviation, np.full(15, 1 / 15), args=(ingredient_matrix, params['target_values']),
+                         method='SLSQP', bounds=list(zip(np.zeros(15), upper_bounds)), constraints=constraints,
+                         options={'ftol': 1e-12, 'maxiter': 500})
+    # SLSQP 只是局部近似解 (可能略微越出约束), 精确解不应比它差
+    assert weighted_deviation(x, ingredient_matrix, params['target_values']) <= reference.fun * (1 + 1e-6)
+
+
+def test_exact_front_is_feasible_and_non_dominated():
+    ingredient_matrix, similarity_vector, inventory, params = pareto_problem()
+    solutions, values, run_info = exact_pareto_front(ingredient_matrix, similarity_vector, inventory, params,
+                                                     num_points=10, max_workers=2)
+    solutions = np.array(solutions)
+    assert len(solutions) >= 3 and run_info['failed_points'] == 0
+    assert np.allclose(solutions.sum(axis=1), 1.0)
+    assert np.all(solutions <= np.minimum(1.0, inventory / params['total_mix_amount']) + 1e-9)
+    assert np.all(solutions @ ingredient_matrix >= MIN_CONTENTS - 1e-9)
+    deviations = [weighted_deviation(x, ingredient_matrix, params['target_values']) for x in solutions]
+    assert np.allclose(values[:, 0], np.sqrt(deviations))
+    assert np.allclose(values[:, 1], -(solutions @ similarity_vector))
+    # 按偏离度升序排列时相似度严格下降, 即两两互不支配
+    assert np.all(np.diff(values[:, 0]) > 0) and np.all(np.diff(values[:, 1]) < 0)
+    assert run_info['hypervolume'] > 0
+
+
+def test_exact_front_is_empty_when_infeasible():
+    ingredient_matrix, similarity_vector, inventory, params = pareto_problem()
+    # 甘草苷含量减半后最高 4 mg/g, 达不到 4.5 mg/g 的最低标准
+    solutions, values, _ = exact_pareto_front(ingredient_matrix * 0.5, similarity_vector, inventory, params,
+                                              num_points=5)
+    assert solutions == [] and values == []
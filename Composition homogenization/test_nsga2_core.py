@@ -0,0 +1,314 @@
+import numpy as np
+import pytest
+
+from nsga2_core import (MIN_CONTENTS, crowding_distance, decode_population, densify_genomes, epsilon_seeds,
+                        fast_non_dominated_sort, fronts_to_ranks, hypervolume_2d, hypervolume_converged,
+                        hit_and_run, make_offspring, make_sparse_offspring, migrate, objective_values,
+                        random_sparse_population, run_nsga2, sample_feasible_population, select_survivors, sparse_crossover, sparse_mutate,
+                        sparsify_proportions)
+
+
+def nsga_data(num_batches=60, seed=0):
+    """随机批次数据: (ingredient_matrix, similarity_vector, inventory)"""
+    rng = np.random.default_rng(seed)
+    ingredient_matrix = np.column_stack([rng.uniform(3, 8, num_batches), rng.uniform(12, 30, num_batches)])
+    return ingredient_matrix, rng.uniform(0.8, 0.99, num_batches), rng.uniform(50, 300, num_batches)
+
+
+def nsga_params(**overrides):
+    params = {'target_values': np.array([5.0, 19.0]), 'population_size': 40, 'num_generations': 20,
+              'num_batches_to_select': 6, 'remove_extremes': False, 'crossover_prob': 0.7, 'mutation_prob': 0.3,
+              'mutation_strength': 0.1, 'seed': 1, 'encoding': 'dense', 'feasible_init': False, 'memetic': False,
+              'memetic_seeds': 8, 'polish_iterations': 10, 'early_stopping': False, 'hv_window': 10,
+              'hv_tolerance': 1e-4, 'island_model': False, 'num_islands': 3, 'migration_interval': 5,
+              'migration_size': 2, 'checkpoint_dir': None, 'checkpoint_interval': 5, 'total_mix_amount': 1000.0}
+    params.update(overrides)
+    return params
+
+
+
+def pareto_dominates(values, q, p):
+    return np.all(values[q] <= values[p]) and np.any(values[q] < values[p])
+
+
+def brute_force_fronts(values, dominates=pareto_dominates):
+    """逐层剥离的参考实现: 每层取剩余个体中不被任何剩余个体支配者"""
+    remaining = list(range(len(values)))
+    fronts = []
+    while remaining:
+        front = [p for p in remaining if not any(dominates(values, q, p) for q in remaining)]
+        fronts.append(front)
+        remaining = [p for p in remaining if p not in front]
+    return fronts
+
+
+@pytest.mark.parametrize('num_objectives', [2, 3])
+@pytest.mark.parametrize('seed', range(5))
+def test_non_dominated_sort_matches_brute_force(num_objectives, seed):
+    # 取值范围很小的整数目标值, 保证有大量并列与完全重复的点
+    values = np.random.default_rng(seed).integers(0, 6, size=(60, num_objectives)).astype(float)
+    assert fast_non_dominated_sort(values) == brute_force_fronts(values)
+
+
+def test_non_dominated_sort_keeps_duplicates_in_the_same_front():
+    values = np.array([[1.0, 2.0], [1.0, 2.0], [2.0, 1.0], [1.0, 3.0], [2.0, 2.0], [2.0, 2.0]])
+    assert fast_non_dominated_sort(values) == [[0, 1, 2], [3, 4, 5]]
+    assert fast_non_dominated_sort(np.empty((0, 2))) == []
+
+
+def reference_crowding_distance(values, front):
+    """原逐前沿实现的拥挤距离 (返回 {个体索引: 距离})"""
+    distances = {i: 0 for i in front}
+    for m in range(values.shape[1]):
+        sorted_front = sorted(front, key=lambda i: values[i, m])
+        distances[sorted_front[0]] = distances[sorted_front[-1]] = float('inf')
+        range_val = values[sorted_front[-1], m] - values[sorted_front[0], m]
+        if len(front) > 2 and range_val != 0:
+            for i in range(1, len(front) - 1):
+                distances[sorted_front[i]] += (values[sorted_front[i + 1], m]
+                                               - values[sorted_front[i - 1], m]) / range_val
+    return distances
+
+
+@pytest.mark.parametrize('num_objectives', [2, 3])
+@pytest.mark.parametrize('seed', range(3))
+def test_crowding_distance_matches_the_per_front_implementation(num_objectives, seed):
+    rng = np.random.default_rng(seed)
+    values = rng.random((50, num_objectives))
+    values[::7] = np.round(values[::7], 1)  # 部分并列的目标值
+    fronts = fast_non_dominated_sort(values)
+    distances = crowding_distance(values, fronts_to_ranks(fronts, len(values)))
+    for front in fronts:
+        expected = reference_crowding_distance(values, front)
+        assert np.allclose(distances[front], [expected[i] for i in front])
+
+
+def test_select_survivors_fills_by_rank_then_crowding():
+    values = np.random.default_rng(0).random((40, 2))
+    fronts = fast_non_dominated_sort(values)
+    ranks = fronts_to_ranks(fronts, len(values))
+    distances = crowding_distance(values, ranks)
+    survivors = select_survivors(values, 20)
+
+    cutoff = ranks[survivors].max()
+    assert len(survivors) == 20
+    assert np.all(np.isin(np.flatnonzero(ranks < cutoff), survivors))
+    # 临界前沿中保留拥挤距离最大的个体
+    boundary = np.array(fronts[cutoff])
+    kept = boundary[np.isin(boundary, survivors)]
+    dropped = boundary[~np.isin(boundary, survivors)]
+    assert distances[kept].min() >= distances[dropped].max()
+
+
+def test_offspring_are_reproducible_from_the_generator_seed():
+    population = np.random.default_rng(0).random((11, 8))
+    children = [make_offspring(population, np.random.default_rng(5), 0.7, 0.3, 0.1) for _ in range(2)]
+    assert children[0].shape == population.shape
+    assert np.array_equal(children[0], children[1])
+    assert np.all(children[0] >= 0)
+    assert not np.array_equal(children[0], make_offspring(population, np.random.default_rng(6), 0.7, 0.3, 0.1))
+
+
+@pytest.mark.parametrize('encoding', ['dense', 'sparse'])
+def test_same_seed_gives_the_same_run(encoding):
+    data = nsga_data()
+    first = run_nsga2(*data, nsga_params(encoding=encoding))
+    second = run_nsga2(*data, nsga_params(encoding=encoding))
+    assert np.array_equal(first[0], second[0]) and np.array_equal(first[1], second[1])
+    assert first[2]['hypervolume_history'] == second[2]['hypervolume_history']
+    other = run_nsga2(*data, nsga_params(encoding=encoding, seed=2))
+    assert not np.array_equal(first[1], other[1])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_constrained_sort_follows_deb_rules(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 5, size=(50, 2)).astype(float)
+    violations = np.where(rng.random(50) < 0.5, 0.0, rng.integers(1, 4, 50).astype(float))
+
+    def deb_dominates(_, q, p):
+        if violations[q] <= 0 < violations[p]:
+            return True
+        if violations[q] > 0 and violations[p] > 0:
+            return violations[q] < violations[p]
+        return violations[q] <= 0 and violations[p] <= 0 and pareto_dominates(values, q, p)
+
+    fronts = fast_non_dominated_sort(values, violations)
+    assert [sorted(front) for front in fronts] == brute_force_fronts(values, deb_dominates)
+
+
+def test_feasible_points_survive_before_better_scoring_infeasible_ones():
+    values = np.array([[5.0, 5.0], [4.0, 6.0], [0.0, 0.0], [0.1, 0.1], [0.2, 0.2]])
+    violations = np.array([0.0, 0.0, 2.0, 0.5, 0.5])
+    assert fast_non_dominated_sort(values, violations) == [[0, 1], [3, 4], [2]]
+    survivors = select_survivors(values, 3, violations)
+    assert sorted(survivors[:2]) == [0, 1] and survivors[2] in (3, 4)
+
+
+def test_hypervolume_of_known_fronts():
+    reference_point = np.array([4.0, 4.0])
+    assert hypervolume_2d(np.array([[1.0, 1.0]]), reference_point) == pytest.approx(9.0)
+    # 阶梯前沿: 3·1 + 2·1 + 1·1 (按目标1划分的三条竖带)
+    staircase = np.array([[1.0, 3.0], [2.0, 2.0], [3.0, 1.0]])
+    assert hypervolume_2d(staircase, reference_point) == pytest.approx(6.0)
+    # 被支配的点、重复点与参考点之外的点不改变超体积
+    padded = np.vstack([staircase, [[2.5, 2.5], [2.0, 2.0], [0.5, 4.0], [5.0, 0.0]]])
+    assert hypervolume_2d(padded[::-1], reference_point) == pytest.approx(6.0)
+    assert hypervolume_2d(np.empty((0, 2)), reference_point) == 0.0
+
+
+def test_hypervolume_matches_a_grid_count():
+    values = np.random.default_rng(0).random((15, 2))
+    reference_point = np.array([1.0, 1.0])
+    grid = (np.arange(400) + 0.5) / 400
+    points = np.stack(np.meshgrid(grid, grid), axis=-1).reshape(-1, 2)
+    covered = np.any(np.all(values[None, :, :] <= points[:, None, :], axis=2), axis=1)
+    assert hypervolume_2d(values, reference_point) == pytest.approx(covered.mean(), abs=5e-3)
+
+
+def test_hypervolume_convergence_window():
+    assert not hypervolume_converged([0.0, 0.0, 0.0, 0.0], 2, 1e-3)
+    assert not hypervolume_converged([1.0, 1.0], 2, 1e-3)
+    assert hypervolume_converged([1.0, 1.5, 1.5005, 1.5006], 2, 1e-3)
+    assert not hypervolume_converged([1.0, 1.5, 1.6, 1.7], 2, 1e-3)
+
+
+def test_early_stopping_ends_a_converged_run():
+    params = nsga_params(num_generations=200, early_stopping=True, hv_window=5, hv_tolerance=1e-3)
+    _, _, info = run_nsga2(*nsga_data(), params)
+    assert info['stopped_early'] and info['generations_run'] < 200
+    assert len(info['hypervolume_history']) == info['generations_run']
+
+
+def assert_k_unique_indices(genomes, k, num_batches):
+    indices = genomes['indices']
+    assert indices.shape == (len(genomes), k)
+    assert np.all((indices >= 0) & (indices < num_batches))
+    assert all(len(set(row)) == k for row in indices.tolist())
+
+
+@pytest.mark.parametrize('num_batches, k', [(8, 5), (40, 6), (7, 6)])
+def test_sparse_operators_keep_k_distinct_batches(num_batches, k):
+    rng = np.random.default_rng(0)
+    parents1, parents2 = (random_sparse_population(rng, num_batches, k, 200) for _ in range(2))
+    for child in sparse_crossover(parents1, parents2, rng, 1.0):
+        assert_k_unique_indices(child, k, num_batches)
+    assert_k_unique_indices(sparse_mutate(parents1, rng, 1.0, 0.1, num_batches), k, num_batches)
+
+    children = make_sparse_offspring(parents1, rng, 0.9, 0.5, 0.1, num_batches, num_offspring=51)
+    assert_k_unique_indices(children, k, num_batches)
+    assert np.allclose(children['weights'].sum(axis=1), 1.0) and np.all(children['weights'] >= 0)
+
+
+def test_sparse_crossover_keeps_shared_batches():
+    rng = np.random.default_rng(1)
+    parents1 = random_sparse_population(rng, 15, 4, 100)
+    parents2 = random_sparse_population(rng, 15, 4, 100)
+    parents2['indices'] += 15
+    parents2['indices'][:, 0] = parents1['indices'][:, 0]  # 两个父代只共享一个批次
+    for child in sparse_crossover(parents1, parents2, rng, 1.0):
+        assert_k_unique_indices(child, 4, 30)
+        assert np.all(np.any(child['indices'] == parents1['indices'][:, :1], axis=1))
+
+
+def test_sparse_and_dense_proportions_round_trip():
+    proportions = np.random.default_rng(2).dirichlet(np.ones(12), size=10)
+    proportions[proportions < np.sort(proportions, axis=1)[:, [-4]]] = 0.0  # 每行只留 4 个批次
+    proportions /= proportions.sum(axis=1, keepdims=True)
+    assert np.allclose(densify_genomes(sparsify_proportions(proportions, 4), 12), proportions)
+
+
+@pytest.mark.parametrize('k', [0, 6])
+def test_feasible_samples_meet_floors_sum_and_inventory(k):
+    ingredient_matrix, _, inventory = nsga_data()
+    # 库存充足时可行顶点只含少数几个批次, 限定 K 个批次的每个个体都能找到可行起点
+    inventory = inventory * 3
+    genomes = sample_feasible_population(np.random.default_rng(0), ingredient_matrix, inventory, 1000.0, 30, k)
+    proportions = densify_genomes(genomes, len(inventory))
+    assert np.allclose(proportions.sum(axis=1), 1.0)
+    assert np.all(proportions <= inventory / 1000.0 + 1e-9)
+    assert np.all(proportions @ ingredient_matrix >= MIN_CONTENTS - 1e-9)
+    if k:
+        assert_k_unique_indices(genomes, k, len(inventory))
+    # 各个体互不相同 (随机游走确实离开了起点)
+    assert len(np.unique(proportions.round(9), axis=0)) == 30
+
+
+def test_hit_and_run_stays_inside_the_polytope():
+    rng = np.random.default_rng(3)
+    support_matrices = np.stack([nsga_data(num_batches=5, seed=i)[0] for i in range(20)])
+    upper_bounds = np.full((20, 5), 0.5)
+    # 起点: 含量最高的两个批次各占一半, 满足最低含量
+    start = np.zeros((20, 5))
+    np.put_along_axis(start, np.argsort(-support_matrices[:, :, 1], axis=1)[:, :2], 0.5, axis=1)
+    feasible_start = np.all(np.einsum('nk,nkd->nd', start, support_matrices) >= MIN_CONTENTS, axis=1)
+
+    samples = hit_and_run(rng, start[feasible_start], upper_bounds[feasible_start],
+                          support_matrices[feasible_start], num_steps=100)
+    assert len(samples) > 0
+    assert np.allclose(samples.sum(axis=1), 1.0)
+    assert np.all((samples >= 0) & (samples <= 0.5 + 1e-9))
+    assert np.all(np.einsum('nk,nkd->nd', samples, support_matrices[feasible_start]) >= MIN_CONTENTS - 1e-9)
+
+
+def test_migration_replaces_the_worst_of_the_next_island():
+    states = []
+    for offset in (0.0, 10.0, 20.0):
+        values = offset + np.column_stack([np.arange(5.0), np.arange(5.0)])  # 每个岛屿内逐个被支配
+        states.append({'population': values.copy(), 'values': values, 'violations': np.zeros(5)})
+    migrate(states, 2)
+    # 岛屿 i 最差的 2 个个体换成岛屿 i-1 最好的 2 个 (环形)
+    assert np.array_equal(states[1]['values'][:, 0], [10, 11, 12, 0, 1])
+    assert np.array_equal(states[0]['values'][:, 0], [0, 1, 2, 20, 21])
+    assert np.array_equal(states[0]['population'], states[0]['values'])
+
+
+def test_island_model_is_reproducible_and_reports_islands():
+    data = nsga_data()
+    params = nsga_params(island_model=True, num_generations=10)
+    first, second = run_nsga2(*data, params), run_nsga2(*data, params)
+    assert np.array_equal(first[1], second[1])
+    assert first[2]['num_islands'] == 3 and first[2]['hypervolume_generations'] == [5, 10]
+
+@pytest.mark.parametrize('k', [0, 20])
+def test_epsilon_seeds_span_the_front_within_k_batches(k):
+    ingredient_matrix, similarity_vector, inventory = nsga_data(num_batches=300)
+    params = nsga_params(num_batches_to_select=k)
+    seeds = epsilon_seeds(ingredient_matrix, similarity_vector, inventory, params)
+    assert len(seeds) == params['memetic_seeds']
+    assert np.allclose(seeds.sum(axis=1), 1.0)
+    assert np.all(seeds <= inventory / params['total_mix_amount'] + 1e-9)
+    assert np.all(seeds @ ingredient_matrix >= MIN_CONTENTS - 1e-9)
+    if k:
+        assert np.all(np.count_nonzero(seeds > 1e-12, axis=1) <= k)
+    # 按前沿的实际范围分布: 相似度递增、偏离度递增, 两端各有一个种子
+    proportions, _ = decode_population(seeds, k)
+    values = objective_values(proportions @ ingredient_matrix, proportions @ similarity_vector,
+                              params['target_values'])
+    assert np.all(np.diff(values[:, 1]) < 0) and np.all(np.diff(values[:, 0]) > 0)
+    assert values[0, 0] == pytest.approx(0.0, abs=1e-6)
+
+
+def stop_after(calls):
+    """should_stop 回调: 第 calls 次询问时请求取消"""
+    counter = iter(range(calls, 0, -1))
+    return lambda: next(counter, 0) <= 1
+
+
+@pytest.mark.parametrize('overrides', [{'encoding': 'dense'}, {'encoding': 'sparse'},
+                                       {'island_model': True, 'num_generations': 15}])
+def test_cancelled_run_resumes_to_the_uninterrupted_result(tmp_path, overrides):
+    data = nsga_data()
+    solutions, values, info = run_nsga2(*data, nsga_params(**overrides))
+
+    params = nsga_params(checkpoint_dir=str(tmp_path), **overrides)
+    # 取消时刻不与检查点间隔对齐: 单种群在第 7 代取消, 岛屿模型在第 2 个迁移周期后取消
+    _, _, cancelled_info = run_nsga2(*data, params, should_stop=stop_after(2 if overrides.get('island_model') else 7))
+    assert cancelled_info['cancelled']
+    resumed_solutions, resumed_values, resumed_info = run_nsga2(*data, params)
+
+    assert resumed_info['resumed_from'] == cancelled_info['generations_run']
+    assert np.array_equal(resumed_values, values)
+    assert np.array_equal(resumed_solutions, solutions)
+    assert resumed_info['hypervolume_history'] == info['hypervolume_history']
+    assert not list(tmp_path.iterdir())